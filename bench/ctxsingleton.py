@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+'''benchmark of context singleton state
+
+   times attribute access and pushing of a context singleton, followed
+   by the two main users of it in the runtime: copying nested structures
+   with copy.make_copy and reading source with the reader.
+
+   usage: python bench/ctxsingleton.py [scale]
+'''
+
+from __future__ import with_statement
+
+import sys
+from time import time as clock
+
+from jamenson.runtime.ctxsingleton import CtxSingleton
+from jamenson.runtime.copy import make_copy
+from jamenson.runtime.read import iter_forms
+
+
+class BenchState(CtxSingleton):
+
+    def _cxs_setup_top(self):
+        self.a = 1
+        self.b = None
+        self.c = {}
+        self.d = []
+
+def best_time(func, runs=5):
+    times = []
+    for i in xrange(runs):
+        start = clock()
+        func()
+        times.append(clock() - start)
+    return min(times)
+
+def bench_attribute(n):
+    state = BenchState()
+    def run():
+        for i in xrange(n):
+            state.a; state.b; state.c; state.d
+    return best_time(run) / (4 * n)
+
+def bench_push(n):
+    state = BenchState()
+    def run():
+        for i in xrange(n):
+            with state.top(a=i):
+                pass
+    return best_time(run) / n
+
+def make_tree(depth, width):
+    if not depth:
+        return 'leaf'
+    return [dict(key=make_tree(depth-1, width), value=(depth, width))
+            for i in xrange(width)]
+
+def bench_copy(tree, recursions=None):
+    return best_time(lambda : make_copy(tree, recursions))
+
+def make_source(n):
+    return '\n'.join('(defun f%d (x y &optional (z %d)) "doc" (+ x y z 1.5 \'sym :key))'
+                     % (i, i) for i in xrange(n))
+
+def bench_read(source):
+    return best_time(lambda : list(iter_forms(source)))
+
+def main(argv=sys.argv[1:]):
+    scale = int(argv[0]) if argv else 1
+    n = 100000 * scale
+    print '%-24s %10.3fus' % ('attribute read', 1e6 * bench_attribute(n))
+    print '%-24s %10.3fus' % ('push/pop', 1e6 * bench_push(n // 4))
+    tree = make_tree(5, 4 + scale)
+    for recursions in None, 100:
+        print '%-24s %10.3fms' % ('make_copy recursions=%s' % (recursions,),
+                                  1e3 * bench_copy(tree, recursions))
+    source = make_source(500 * scale)
+    elapsed = bench_read(source)
+    print '%-24s %10.3fms %8.1f KB/s' % ('read %d forms' % (500 * scale,), 1e3 * elapsed,
+                                          len(source) / elapsed / 1024)
+
+__name__ == '__main__' and main()
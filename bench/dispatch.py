@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+'''micro-benchmark of multimethod call overhead
+
+   compares the generic dispatch path with generated dispatch functions
+   for a few common multimethod shapes.  reports the time per call, less
+   the cost of calling the method function directly.  single argument
+   dispatch is also compared with a minimal functools.singledispatch
+   style class lookup.
+
+   usage: python bench/dispatch.py [calls]
+'''
+
+import sys
+from time import time as clock
+
+from jamenson.runtime.multimethod import MultiMethod, defmethod
+
+
+def make_single():
+    mm = MultiMethod('single')
+    @defmethod(mm, 'int')
+    def meth(op):
+        return op
+    @defmethod(mm, 'str')
+    def meth(op):
+        return op
+    @defmethod(mm, 'object')
+    def meth(op):
+        return op
+    return mm, meth, (1,)
+
+def make_double():
+    mm = MultiMethod('double')
+    @defmethod(mm, '(int,long),(int,long)')
+    def meth(a, b):
+        return a
+    @defmethod(mm, 'object,object')
+    def meth(a, b):
+        return a
+    return mm, meth, (1, 2)
+
+def make_keywords():
+    mm = MultiMethod('keywords')
+    @defmethod(mm, 'int,b=int')
+    def meth(a, b=0):
+        return a
+    @defmethod(mm, 'object,b=object')
+    def meth(a, b=0):
+        return a
+    return mm, meth, (1,)
+
+def make_reference(func):
+    '''class keyed registry lookup as done by functools.singledispatch
+    '''
+    registry = {object: func}
+    cache = {}
+    def dispatch(cls):
+        try:
+            return cache[cls]
+        except KeyError:
+            for base in cls.__mro__:
+                if base in registry:
+                    impl = cache[cls] = registry[base]
+                    return impl
+    def wrapper(*args, **kwds):
+        return dispatch(args[0].__class__)(*args, **kwds)
+    return wrapper
+
+def time_calls(func, args, n):
+    loop = xrange(n)
+    start = clock()
+    for i in loop:
+        func(*args)
+    return (clock() - start) / n
+
+def main(argv=sys.argv[1:]):
+    n = int(argv[0]) if argv else 200000
+    print '%-10s %12s %12s %8s %12s' % ('shape', 'generic', 'compiled', 'speedup',
+                                        'reference')
+    for make in make_single, make_double, make_keywords:
+        mm, func, args = make()
+        base = time_calls(func, args, n)
+        acc = []
+        for compiled in False, True:
+            mm.compiled_dispatch = compiled
+            mm.invalidate()
+            mm(*args)
+            acc.append(time_calls(mm, args, n) - base)
+        generic, compiled = acc
+        line = '%-10s %10.3fus %10.3fus %7.2fx' % (mm.name, generic*1e6, compiled*1e6,
+                                                  generic / compiled)
+        if make is make_single:
+            reference = time_calls(make_reference(func), args, n) - base
+            line += ' %10.3fus' % (reference*1e6,)
+        print line
+
+__name__ == '__main__' and main()
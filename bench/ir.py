@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+'''benchmark of intermediate representation nodes
+
+   times translation of generated forms to ir, copying, walking and
+   replacing children of the resulting nodes, along with the number and
+   size of objects held by the translated ir.  the ir backend is selected
+   before the ir module is imported.
+
+   usage: python bench/ir.py [-b compact|ports] [-n forms]
+'''
+
+import sys
+import gc
+from optparse import OptionParser
+from time import time as clock
+
+
+def make_source(n):
+    return '\n'.join('(setq f%d (function (let ((z (getattrq x foo)))'
+                     ' (if z (progn (setq y (getitem x %d)) (function (return (getitem y z))))'
+                     ' (return (tagbody a (f a 1 2 3) (go a))))) "f" nil (x y)))'
+                     % (i, i) for i in xrange(n))
+
+def timed(func):
+    start = clock()
+    value = func()
+    return clock() - start, value
+
+def held_objects(func):
+    gc.collect()
+    before = gc.get_objects()
+    ids = set(map(id, before))
+    value = func()
+    gc.collect()
+    new = [op for op in gc.get_objects() if id(op) not in ids]
+    del before
+    return value, len(new), sum(map(sys.getsizeof, new))
+
+def main(argv=sys.argv[1:]):
+    parser = OptionParser(usage='%prog [-b compact|ports] [-n forms]')
+    parser.add_option('-b', '--backend', dest='backend', default='compact')
+    parser.add_option('-n', '--forms', dest='forms', type='int', default=500)
+    options, args = parser.parse_args(argv)
+
+    from jamenson.compiler import irbase
+    irbase.default_backend = options.backend
+    from jamenson.compiler import ir as I
+    from jamenson.compiler.translate import translate_top_level_form
+    from jamenson.compiler.walk import IRWalker
+    from jamenson.runtime.read import iter_forms
+    from jamenson.runtime.copy import make_copy
+
+    forms = list(iter_forms(make_source(options.forms), record_forms=True))
+    translate = lambda : [translate_top_level_form(form, form_locations=locs)
+                          for form,locs in forms]
+    elapsed, irs = timed(translate)
+    print '%-12s %10.3fms' % ('translate', 1e3 * elapsed)
+    (irs, n_objects, n_bytes) = held_objects(translate)
+    n_nodes = []
+    class Counter(IRWalker):
+        descend_into_functions = True
+        def visit_node(self, node):
+            n_nodes.append(node)
+            self.visit_children(node)
+    elapsed,_ = timed(lambda : map(Counter().visit, irs))
+    print '%-12s %10.3fms' % ('walk', 1e3 * elapsed)
+    print '%-12s %10d nodes %8d objects %10.1f KB' % ('held', len(n_nodes), n_objects,
+                                                      n_bytes / 1024.0)
+    elapsed, copies = timed(lambda : map(make_copy, irs))
+    print '%-12s %10.3fms' % ('copy', 1e3 * elapsed)
+    def replace():
+        for node in n_nodes:
+            if node.continuation is not None:
+                nop = I.make_nop()
+                I.replace_child(node, nop)
+                I.replace_child(nop, node)
+    elapsed,_ = timed(replace)
+    print '%-12s %10.3fms' % ('replace', 1e3 * elapsed)
+
+__name__ == '__main__' and main()
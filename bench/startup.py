@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+'''startup benchmark of the runtime
+
+   reports the wall time of importing a module, by default
+   jamenson.runtime.read, in fresh interpreters, followed by a breakdown
+   of the time spent importing each module.  self time excludes the
+   modules imported in turn.
+
+   usage: python bench/startup.py [-n runs] [-l limit] [module]
+'''
+
+import sys
+import os
+import imp
+from subprocess import call
+from optparse import OptionParser
+from time import time as clock
+
+
+def time_fresh_imports(module, n):
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+    times = []
+    for i in xrange(n):
+        start = clock()
+        if call([sys.executable, '-c', 'import ' + module], env=env):
+            raise RuntimeError('failed to import %s' % (module,))
+        times.append(clock() - start)
+    return times
+
+def time_interpreter(n):
+    times = []
+    for i in xrange(n):
+        start = clock()
+        call([sys.executable, '-c', 'pass'])
+        times.append(clock() - start)
+    return times
+
+class TimingImporter(object):
+    '''meta path importer that loads modules as the default import
+       machinery would, timing each
+    '''
+
+    def __init__(self):
+        self.found = {}
+        self.times = {}
+        self.stack = []
+
+    def find_module(self, fullname, path=None):
+        try:
+            self.found[fullname] = imp.find_module(fullname.rpartition('.')[2], path)
+        except ImportError:
+            return None
+        return self
+
+    def load_module(self, fullname):
+        if fullname in sys.modules:
+            return sys.modules[fullname]
+        fp, pathname, description = self.found.pop(fullname)
+        self.stack.append(0.0)
+        start = clock()
+        try:
+            return imp.load_module(fullname, fp, pathname, description)
+        finally:
+            if fp is not None:
+                fp.close()
+            elapsed = clock() - start
+            inner = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            self.times[fullname] = elapsed, elapsed - inner
+
+def import_breakdown(module):
+    '''cumulative and self time of each module first imported by
+       importing module
+    '''
+    importer = TimingImporter()
+    sys.meta_path.insert(0, importer)
+    try:
+        __import__(module)
+    finally:
+        sys.meta_path.remove(importer)
+    return importer.times
+
+def main():
+    parser = OptionParser(usage='%prog [-n runs] [-l limit] [module]')
+    parser.add_option('-n', dest='runs', type='int', default=10)
+    parser.add_option('-l', dest='limit', type='int', default=25)
+    options, args = parser.parse_args()
+    module = args[0] if args else 'jamenson.runtime.read'
+    base = min(time_interpreter(options.runs))
+    times = time_fresh_imports(module, options.runs)
+    print 'import %s: best %.1fms, median %.1fms (interpreter %.1fms)' % (
+        module, 1e3 * (min(times) - base),
+        1e3 * (sorted(times)[len(times) // 2] - base), 1e3 * base)
+    print
+    print '%-50s %10s %10s' % ('module', 'self', 'cumulative')
+    breakdown = import_breakdown(module)
+    for mod,(total,own) in sorted(breakdown.iteritems(), key=lambda (mod,(total,own)): own,
+                                  reverse=True)[:options.limit]:
+        print '%-50s %8.2fms %8.2fms' % (mod, 1e3 * own, 1e3 * total)
+
+__name__ == '__main__' and main()
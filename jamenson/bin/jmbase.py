@@ -13,6 +13,7 @@ from ..runtime.filepath import FilePath
 from ..runtime.require import files_search_path
 from ..runtime import state as runtime_state
 from ..runtime.symbol import get_package, use_package, all_used_packages
+from ..runtime.multimethod import load_dispatch_snapshot, save_dispatch_snapshot
 from ..core import install as install_core
 
 class JMBase(object):
@@ -21,6 +22,18 @@ class JMBase(object):
         self.configure()
         if not self.nocore:
             install_core()
+        if self.dispatch_snapshot:
+            self.vmsg(1, 'restored %d dispatch entries from %s',
+                      load_dispatch_snapshot(self.dispatch_snapshot),
+                      self.dispatch_snapshot)
+        self.process_targets()
+        if self.dispatch_snapshot:
+            self.vmsg(1, 'saved %d dispatch entries to %s',
+                      save_dispatch_snapshot(self.dispatch_snapshot,
+                                             merge=self.worker_dispatch_snapshots),
+                      self.dispatch_snapshot)
+
+    def process_targets(self):
         for target in self.targets:
             self.process_target(target)
 
@@ -82,16 +95,33 @@ class JMBase(object):
                           default=False,
                           action='store_true',
                           help="don't load core language functionality")
+        parser.add_option('--dispatch-snapshot',
+                          dest='dispatch_snapshot',
+                          default=None,
+                          action='store',
+                          metavar='PATH',
+                          help='restore resolved multimethod dispatch from PATH when it '
+                               'exists and save it there when done')
         return parser
 
     @staticmethod
     def get_prog_name():
         return os.path.basename(sys.argv[0])
 
-    @staticmethod
-    def emit(bytes):
-        sys.stderr.write(bytes)
-        sys.stderr.flush()
+    #when a list, messages are collected in it rather than written
+    log = None
+
+    dispatch_snapshot = None
+    #snapshots of dispatch resolved in worker processes, which are
+    #merged into the snapshot saved by this process
+    worker_dispatch_snapshots = ()
+
+    def emit(self, bytes):
+        if self.log is not None:
+            self.log.append(bytes)
+        else:
+            sys.stderr.write(bytes)
+            sys.stderr.flush()
 
     def msg(self, msg='', *args):
         self.emit('%s: %s\n' % (self.get_prog_name(), msg%args if args else msg))
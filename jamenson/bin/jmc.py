@@ -5,11 +5,15 @@ from __future__ import absolute_import
 from __future__ import with_statement
 
 import sys
+import traceback
+from multiprocessing import Pool
 
 from ..runtime.filepath import FilePath
 from ..compiler.util import timing
 from ..compiler.block import BlockCompiler
 from ..runtime.compiled import write_code, dump_code
+from ..runtime.multimethod import (start_dispatch_profiling, report_dispatch_profile,
+                                   collect_dispatch_snapshot)
 from .jmbase import JMBase
 
 
@@ -20,6 +24,64 @@ def main():
 
 class JMC(JMBase):
 
+    profile_dispatch = False
+    jobs = 1
+
+    def main(self):
+        try:
+            super(JMC, self).main()
+        finally:
+            if self.profile_dispatch:
+                report_dispatch_profile(sys.stderr)
+
+    def configure(self):
+        super(JMC, self).configure()
+        if self.profile_dispatch:
+            start_dispatch_profiling()
+
+    def get_opt_parser(self):
+        parser = super(JMC, self).get_opt_parser()
+        parser.add_option('--profile-dispatch',
+                          dest='profile_dispatch',
+                          default=False,
+                          action='store_true',
+                          help='report multimethods by cumulative dispatch time')
+        parser.add_option('-j','--jobs',
+                          dest='jobs',
+                          default=1,
+                          type='int',
+                          metavar='N',
+                          help='compile up to N targets at once in worker processes')
+        return parser
+
+    def process_targets(self):
+        if self.jobs <= 1 or len(self.targets) <= 1:
+            return super(JMC, self).process_targets()
+        #workers are forked after loading core and each compiles a single
+        #target, such that every target starts from the same runtime state
+        #as it would when compiled alone
+        pool = Pool(min(self.jobs, len(self.targets)), maxtasksperchild=1)
+        failures = 0
+        self.worker_dispatch_snapshots = []
+        try:
+            #messages of each target are emitted together in order of targets,
+            #independent of the order in which workers finish
+            for target,log,error,snapshot in pool.imap(process_target_in_worker, self.targets):
+                self.emit(log)
+                if snapshot is not None:
+                    self.worker_dispatch_snapshots.append(snapshot)
+                if error is not None:
+                    failures += 1
+                    self.msg('failed compiling %s\n%s', target, error.rstrip())
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        if failures:
+            self.err('%d of %d targets failed', failures, len(self.targets))
+
     def process_target_in_package(self, target):
         dest = self.get_dest_path(target)
         compiler = self.create_compiler(target)
@@ -51,6 +113,22 @@ class JMC(JMBase):
             write_code(code, dest)
 
 
+def process_target_in_worker(target):
+    jmc.log = []
+    try:
+        jmc.process_target(target)
+    except BaseException:
+        #including exits, which would otherwise end the worker
+        #without a result and leave the pool waiting for it
+        error = traceback.format_exc()
+    else:
+        error = None
+    log, jmc.log = ''.join(jmc.log), None
+    #dispatch resolved by the worker is lost when it exits
+    snapshot = collect_dispatch_snapshot() if jmc.dispatch_snapshot else None
+    return target, log, error, snapshot
+
+
 class vtiming(timing):
 
     def __init__(self, v, name):
@@ -71,10 +149,10 @@ class FrontEndCompiler(BlockCompiler):
         jmc.vmsg(1, 'loaded forms in %s', time.strtime)
         return op
 
-    def read_and_translate_form(self):
-        self.stream.strip_whitespace()
-        with vtiming(2, 'load %s.%d' % (self.stream.filename.basename(), self.stream.lineno)):
-            return super(FrontEndCompiler, self).read_and_translate_form()
+    def translate_form(self, expr, locs):
+        lineno = (locs.get(expr) or (self.stream.lineno,))[0]
+        with vtiming(2, 'load %s.%d' % (self.stream.filename.basename(), lineno)):
+            return super(FrontEndCompiler, self).translate_form(expr, locs)
 
     def block_transform(self, top_expr):
         with vtiming(1, 'transforming top level expressions'):
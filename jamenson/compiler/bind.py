@@ -7,9 +7,7 @@ if __name__ == '__main__':
     exit()
 
 
-from ..runtime.ports import (Port, PortList, connect, disconnect, disconnect_all, replace_connection,
-                             count_connections, get_cell, get_cells, DanglingPort,
-                             AttrPortList, AttrPortMapping)
+from ..runtime.ports import Port, DanglingPort, AttrPortList, AttrPortMapping
 from ..runtime.ctxsingleton import CtxSingleton
 from ..runtime.multimethod import defmethod
 from ..runtime.copy import copy_obj, copy, get_copy, set_copy
@@ -29,12 +27,15 @@ class ScopableBase(StringingMixin):
     @property
     def scope(self):
         try:
-            return get_cell(self.scope_port)
+            return self.scope_port.get_cell()
         except DanglingPort:
             return None
 
 class BindingUseMixin(object):
 
+    #node using this binding, when held directly by a compact node
+    user_node = None
+
     def __init__(self):
         self.user_port = Port(self)
 
@@ -49,7 +50,7 @@ class BindingUse(ScopableBase, BindingUseMixin):
     def binding():
         def get(self):
             try:
-                return get_cell(self.binding_port)
+                return self.binding_port.get_cell()
             except DanglingPort:
                 return None
         def set(self, binding):
@@ -67,8 +68,10 @@ class BindingUse(ScopableBase, BindingUseMixin):
 
     @property
     def user(self):
+        if self.user_node is not None:
+            return self.user_node
         try:
-            return get_cell(self.user_port)
+            return self.user_port.get_cell()
         except DanglingPort:
             return None
 
@@ -168,7 +171,7 @@ class Scope(StringingMixin):
     def parent():
         def get(self):
             try:
-                return get_cell(self.parent_port)
+                return self.parent_port.get_cell()
             except DanglingPort:
                 return None
         def set(self, parent):
@@ -176,7 +179,7 @@ class Scope(StringingMixin):
             if parent is not None:
                 parent.child_scopes_port.append(self)
         def del_(self):
-            disconnect_all(self.parent_port)
+            self.parent_port.disconnect_all()
         return property(get, set, del_)
     parent = parent()
 
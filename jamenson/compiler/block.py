@@ -4,7 +4,7 @@
 from __future__ import absolute_import
 from __future__ import with_statement
 
-from ..runtime.read import read, readstate, Stream
+from ..runtime.read import iter_forms, BufferedStream
 from ..runtime.copy import make_copy
 from . import ir as I
 from . import bind
@@ -32,7 +32,7 @@ class BlockCompiler(object):
             if filename is None:
                 raise RuntimeError('no byte source')
             bytes = open(filename)
-        return cls(Stream(bytes, filename=filename, start_lineno=start_lineno),
+        return cls(BufferedStream(bytes, filename=filename, start_lineno=start_lineno),
                    tradeoffs or OptimizationTradeoffs())
 
     def construct_code(self):
@@ -55,21 +55,13 @@ class BlockCompiler(object):
         self.top_level_forms = None
 
     def read_all_top_level_forms(self):
-        while True:
-            ir = self.read_and_translate_form()
-            if ir is None:
-                break
+        for expr,locs in iter_forms(self.stream, record_forms=True, inherit_state=False):
+            ir = self.translate_form(expr, locs)
             if ir is False:
                 continue
             self.top_level_forms.append(ir)
 
-    def read_and_translate_form(self):
-        eof = object()
-        with readstate(stream=self.stream, record_forms=True):
-            expr = read(eofp=eof)
-            if expr is eof:
-                return None
-            locs = readstate.form_locations
+    def translate_form(self, expr, locs):
         ir = translate_top_level_form(expr, form_locations=locs, filename=self.stream.filename)
         ir = self.eval_when_check(ir)
         return ir
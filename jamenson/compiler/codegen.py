@@ -14,7 +14,7 @@ from ..runtime.multimethod import MultiMethod, defmethod
 
 from . import ir as I
 from . import bind
-from .walk import IRWalker
+from .walk import StackWalker
 from .util import flatten_lists_and_generators
 from .asm import first_lineno, finalize_instructions, optimize_instructions
 from .validate import validate
@@ -29,6 +29,7 @@ class CodeGenState(CtxSingleton):
     def _cxs_setup_top(self):
         self.tag_labels = None
         self.name_translations = None
+        self.local_use_types = None
         self.tradeoffs = None
         self._cxs_setup_aux()
 
@@ -40,6 +41,7 @@ class CodeGenState(CtxSingleton):
     def _cxs_setup_aux(self):
         self.tag_labels = self.tag_labels or {}
         self.name_translations = self.name_translations or {}
+        self.local_use_types = self.local_use_types or {}
         self.tradeoffs = self.tradeoffs or OptimizationTradeoffs()
 
 state = CodeGenState()
@@ -59,12 +61,12 @@ def construct_compilation_ir(ir):
     validate(ir)
     annotate(ir)
     ir = optimize(ir, level=state.tradeoffs.speed)
-    ir = translate_bindings(ir)
+    #translates names and caches the bindings of each function for codegen
+    analyze_bindings(ir)
     return ir
 
 def construct_code(ir):
-    free_bindings, cell_bindings = find_non_local_bindings(ir)
-    free_bindings -= cell_bindings
+    free_bindings = get_function_bindings(ir).free_bindings
     if free_bindings:
         compilation_error(ir, "can't construct_code for ir with free bindings %s",
                           ','.join(sorted(binding.symbol for binding in free_bindings)))
@@ -75,8 +77,10 @@ def construct_code(ir):
                         None)
 
 def compile_operations(ir):
-    ops = list(flatten_lists_and_generators(genops(ir)))
-    ops = finalize_instructions(ops)
+    emitter = OperationEmitter()
+    with state.top(emitter=emitter):
+        emitter.emit_node(ir)
+    ops = finalize_instructions(emitter.ops)
     if state.tradeoffs.speed >= 1:
         ops = optimize_instructions(ops)
     return ops
@@ -86,11 +90,57 @@ def compile_operations(ir):
 # # # # # # # # # # # # #
 # Operation Generation  #
 # # # # # # # # # # # # #
+# generate_operations methods emit (opcode, arg) pairs, in order, into the
+# emitter of the code object being compiled, using emit and emit_node.
+# methods can instead yield operations, along with nested lists and
+# generators of operations (such as those of genops), which are flattened
+# into the emitter after the method returns
+
+class OperationEmitter(object):
+    '''buffer of the operations of a code object
+    '''
+
+    def __init__(self):
+        self.ops = []
+
+    def emit(self, op, arg=None):
+        self.ops.append((op, arg))
+
+    def emit_node(self, ir):
+        if ir.lineno is not None:
+            self.ops.append((B.SetLineno, ir.lineno))
+        ops = generate_operations(ir)
+        if ops is not None:
+            self.emit_all(ops)
+
+    def emit_all(self, ops):
+        append = self.ops.append
+        for op in flatten_lists_and_generators(ops):
+            if op is not None:
+                append(op)
+
+def emit(op, arg=None):
+    state.emitter.emit(op, arg)
+
+def emit_node(ir):
+    state.emitter.emit_node(ir)
 
-def genops(ir):
-    if ir.lineno is not None:
-        yield B.SetLineno, ir.lineno
-    yield generate_operations(ir)
+def emit_all(ops):
+    state.emitter.emit_all(ops)
+
+def yielding(emit_func):
+    '''adapt an emitting function for generate_operations methods that yield.
+       operations are emitted as the returned generator is flattened, in order
+       with the other operations yielded by the method
+    '''
+    def wrap(*args):
+        emit_func(*args)
+        if False:
+            yield
+    wrap.__name__ = emit_func.__name__
+    return wrap
+
+genops = yielding(emit_node)
 
 generate_operations = MultiMethod('generate_operations',
                                   signature='node',
@@ -100,12 +150,12 @@ generate_operations = MultiMethod('generate_operations',
 @defmethod(generate_operations, [I.nop])
 def meth(n):
     if not n.result_ignored:
-        yield B.LOAD_CONST, None
+        emit(B.LOAD_CONST, None)
 
 @defmethod(generate_operations, [I.constant])
 def meth(c):
     if not c.result_ignored:
-        yield B.LOAD_CONST, c.value
+        emit(B.LOAD_CONST, c.value)
 
 
 # # # # # # #
@@ -118,48 +168,64 @@ def get_name_translation(binding):
 def get_use_translation(bu):
     return state.name_translations[bu.binding]
 
-def binding_op(bu, loc_op, cell_op, free_op):
-    ut = bind.get_binding_use_type(bu)
+def get_binding_use_type(bu):
+    '''bind.get_binding_use_type, using the types of local and cell
+       bindings found when analyzing bindings
+    '''
+    if (bu.scope and
+        bu.scope.get_locals_scope() is bu.binding.scope.get_locals_scope()):
+        try:
+            return state.local_use_types[bu.binding]
+        except KeyError:
+            pass
+    return bind.get_binding_use_type(bu)
+
+def emit_binding_op(bu, loc_op, cell_op, free_op):
+    ut = get_binding_use_type(bu)
     if ut == bind.BND_GLOBAL:
         compilation_error(None, 'global binding %r not translated', bu.symbol.print_form)
     name = get_use_translation(bu)
     if ut == bind.BND_LOCAL:
-        yield loc_op, name
+        emit(loc_op, name)
     elif ut == bind.BND_CELL:
-        yield cell_op, name
+        emit(cell_op, name)
     elif ut == bind.BND_FREE:
-        yield free_op, name
+        emit(free_op, name)
     else:
         raise RuntimeError("unkown binding %s" % (bu,))
 
-def generate_read_binding(binding):
-    yield binding_op(binding, B.LOAD_FAST, B.LOAD_DEREF, B.LOAD_DEREF)
+def emit_read_binding(binding):
+    emit_binding_op(binding, B.LOAD_FAST, B.LOAD_DEREF, B.LOAD_DEREF)
 
-def generate_write_binding(binding):
-    yield binding_op(binding, B.STORE_FAST, B.STORE_DEREF, B.STORE_DEREF)
+def emit_write_binding(binding):
+    emit_binding_op(binding, B.STORE_FAST, B.STORE_DEREF, B.STORE_DEREF)
 
-def generate_delete_binding(binding):
-    if bind.get_binding_use_type(binding) is not bind.BND_LOCAL:
+def emit_delete_binding(binding):
+    if get_binding_use_type(binding) != bind.BND_LOCAL:
         compilation_error(binding, 'deleting non-local binding')
-    yield binding_op(binding, B.DELETE_FAST, None, None)
+    emit_binding_op(binding, B.DELETE_FAST, None, None)
+
+generate_read_binding = yielding(emit_read_binding)
+generate_write_binding = yielding(emit_write_binding)
+generate_delete_binding = yielding(emit_delete_binding)
 
 @defmethod(generate_operations, [I.read_binding])
 def meth(rb):
     if not rb.result_ignored:
-        yield generate_read_binding(rb.binding)
+        emit_read_binding(rb.binding)
 
 @defmethod(generate_operations, [I.write_binding])
 def meth(wb):
-    yield genops(wb.value)
+    emit_node(wb.value)
     if not wb.result_ignored:
-        yield B.DUP_TOP, None
-    yield generate_write_binding(wb.binding)
+        emit(B.DUP_TOP)
+    emit_write_binding(wb.binding)
 
 @defmethod(generate_operations, [I.delete_binding])
 def meth(db):
-    yield generate_delete_binding(db.binding)
+    emit_delete_binding(db.binding)
     if not db.result_ignored:
-        yield B.LOAD_CONST, None
+        emit(B.LOAD_CONST, None)
 
 
 # # # # # # # # # # #
@@ -177,10 +243,10 @@ unary_op_map = {
 @defmethod(generate_operations, [I.unary_base])
 def meth(ub):
     if ub.result_ignored:
-        yield generate_eval_and_drop_unless_pure(ub.op)
+        emit_eval_and_drop_unless_pure(ub.op)
     else:
-        yield genops(ub.op)
-        yield unary_op_map[type(ub)], None
+        emit_node(ub.op)
+        emit(unary_op_map[type(ub)])
 
 # # # # # # # # # # #
 # Binary Operations #
@@ -228,18 +294,18 @@ cmp_op_map = {
 @defmethod(generate_operations, [I.binary_base])
 def meth(bb):
     if bb.result_ignored:
-        yield generate_eval_and_drop_unless_pure(bb.lop)
-        yield generate_eval_and_drop_unless_pure(bb.rop)
+        emit_eval_and_drop_unless_pure(bb.lop)
+        emit_eval_and_drop_unless_pure(bb.rop)
     else:
-        yield genops(bb.lop)
-        yield genops(bb.rop)
+        emit_node(bb.lop)
+        emit_node(bb.rop)
         try:
             binop = binary_op_map[type(bb)]
             value = None
         except KeyError:
             binop = B.COMPARE_OP
             value = cmp_op_map[type(bb)]
-        yield binop, value
+        emit(binop, value)
 
 # # # # # # # #
 # Attributes  #
@@ -248,25 +314,25 @@ def meth(bb):
 @defmethod(generate_operations, [I.attrget])
 def meth(ag):
     if ag.result_ignored:
-        yield generate_eval_and_drop_unless_pure(ag.obj)
+        emit_eval_and_drop_unless_pure(ag.obj)
     else:
-        yield genops(ag.obj)
-        yield B.LOAD_ATTR, ag.name
+        emit_node(ag.obj)
+        emit(B.LOAD_ATTR, ag.name)
 
 @defmethod(generate_operations, [I.attrset])
 def meth(ats):
-    yield genops(ats.value)
+    emit_node(ats.value)
     if not ats.result_ignored:
-        yield B.DUP_TOP, None
-    yield genops(ats.obj)
-    yield B.STORE_ATTR, ats.name
+        emit(B.DUP_TOP)
+    emit_node(ats.obj)
+    emit(B.STORE_ATTR, ats.name)
 
 @defmethod(generate_operations, [I.attrdel])
 def meth(ad):
-    yield genops(ats.obj)
-    yield B.DELETE_ATTR, ad.name
+    emit_node(ad.obj)
+    emit(B.DELETE_ATTR, ad.name)
     if not ad.result_ignored:
-        yield B.LOAD_CONST, None
+        emit(B.LOAD_CONST, None)
 
 # # # # #
 # Item  #
@@ -275,29 +341,29 @@ def meth(ad):
 @defmethod(generate_operations, [I.getitem])
 def meth(gi):
     if gi.result_ignored:
-        yield generate_eval_and_drop_unless_pure(gi.op)
-        yield generate_eval_and_drop_unless_pure(gi.item)
+        emit_eval_and_drop_unless_pure(gi.op)
+        emit_eval_and_drop_unless_pure(gi.item)
     else:
-        yield genops(gi.op)
-        yield genops(gi.item)
-        yield B.BINARY_SUBSCR, None
+        emit_node(gi.op)
+        emit_node(gi.item)
+        emit(B.BINARY_SUBSCR)
 
 @defmethod(generate_operations, [I.setitem])
 def meth(si):
-    yield genops(si.value)
+    emit_node(si.value)
     if not si.result_ignored:
-        yield B.DUP_TOP, None
-    yield genops(si.op)
-    yield genops(si.item)
-    yield B.STORE_SUBSCR, None
+        emit(B.DUP_TOP)
+    emit_node(si.op)
+    emit_node(si.item)
+    emit(B.STORE_SUBSCR)
 
 @defmethod(generate_operations, [I.delitem])
 def meth(di):
-    yield genops(di.op)
-    yield genops(di.item)
-    yield B.DELETE_SUBSCR, None
+    emit_node(di.op)
+    emit_node(di.item)
+    emit(B.DELETE_SUBSCR)
     if not di.result_ignored:
-        yield B.LOAD_CONST, None
+        emit(B.LOAD_CONST, None)
 
 # # # # #
 # Slice #
@@ -306,22 +372,22 @@ def meth(di):
 @defmethod(generate_operations, [I.buildslice])
 def meth(bs):
     if bs.result_ignored:
-        for child in iter_children(bs):
-            yield generate_eval_and_drop_unless_pure(child)
+        for child in I.iter_children(bs):
+            emit_eval_and_drop_unless_pure(child)
     else:
-        yield genops(bs.start)
-        yield genops(bs.stop)
-        yield genops(bs.step)
-        yield B.BUILD_SLICE, 3
+        emit_node(bs.start)
+        emit_node(bs.stop)
+        emit_node(bs.step)
+        emit(B.BUILD_SLICE, 3)
 
 @defmethod(generate_operations, [I.unpack_seq])
 def meth(us):
-    yield genops(us.seq)
+    emit_node(us.seq)
     if not us.result_ignored:
-        yield B.DUP_TOP, None
-    yield B.UNPACK_SEQUENCE, len(us.places)
+        emit(B.DUP_TOP)
+    emit(B.UNPACK_SEQUENCE, len(us.places))
     for binding in us.places:
-        yield generate_write_binding(binding)
+        emit_write_binding(binding)
 
 
 # # # # #
@@ -333,14 +399,14 @@ def meth(p):
     exprs = list(p.exprs)
     if not exprs:
         if not p.result_ignored:
-            yield B.LOAD_CONST, None
+            emit(B.LOAD_CONST, None)
     else:
         return_index = len(exprs) - 1
         if p.result_ignored:
             return_index += 1
         for index,expr in enumerate(exprs):
             assert expr.result_ignored == (index < return_index)
-            yield genops(expr)
+            emit_node(expr)
 
 # # # # #
 # Call  #
@@ -350,27 +416,27 @@ def meth(p):
 def meth(c):
     if c.result_ignored and purep(c):
         return
-    yield genops(c.callee)
+    emit_node(c.callee)
     for arg in c.args:
-        yield genops(arg)
+        emit_node(arg)
     for name,kwd in zip(c.kwd_names, c.kwd_values):
-        yield B.LOAD_CONST, name
-        yield genops(kwd)
+        emit(B.LOAD_CONST, name)
+        emit_node(kwd)
     if c.star_args:
-        yield genops(c.star_args)
+        emit_node(c.star_args)
     if c.star_kwds:
-        yield genops(c.star_kwds)
+        emit_node(c.star_kwds)
     arg_op = len(c.args) + (len(c.kwd_values)<<8)
     if c.star_args and c.star_kwds:
-        yield B.CALL_FUNCTION_VAR_KW, arg_op
+        emit(B.CALL_FUNCTION_VAR_KW, arg_op)
     elif c.star_kwds:
-        yield B.CALL_FUNCTION_KW, arg_op
+        emit(B.CALL_FUNCTION_KW, arg_op)
     elif c.star_args:
-        yield B.CALL_FUNCTION_VAR, arg_op
+        emit(B.CALL_FUNCTION_VAR, arg_op)
     else:
-        yield B.CALL_FUNCTION, arg_op
+        emit(B.CALL_FUNCTION, arg_op)
     if c.result_ignored:
-        yield B.POP_TOP, None
+        emit(B.POP_TOP)
 
 
 # # # # # # # #
@@ -383,15 +449,15 @@ def meth(c):
     assert c.else_.result_ignored == c.result_ignored
     lfalse = B.Label()
     ljoin = B.Label()
-    yield genops(c.condition)
-    yield B.JUMP_IF_FALSE, lfalse
-    yield B.POP_TOP, None
-    yield genops(c.then)
-    yield B.JUMP_FORWARD, ljoin
-    yield lfalse, None
-    yield B.POP_TOP, None
-    yield genops(c.else_)
-    yield ljoin, None
+    emit_node(c.condition)
+    emit(B.JUMP_IF_FALSE, lfalse)
+    emit(B.POP_TOP)
+    emit_node(c.then)
+    emit(B.JUMP_FORWARD, ljoin)
+    emit(lfalse)
+    emit(B.POP_TOP)
+    emit_node(c.else_)
+    emit(ljoin)
 
 
 # # # # # #
@@ -400,11 +466,11 @@ def meth(c):
 
 @defmethod(generate_operations, [I.return_])
 def meth(r):
-    yield genops(r.value)
+    emit_node(r.value)
     #really only need this for consistent stack depth
     if not r.result_ignored:
         B.DUP_TOP, None
-    yield B.RETURN_VALUE, None
+    emit(B.RETURN_VALUE)
 
 
 # # # # #
@@ -413,10 +479,10 @@ def meth(r):
 
 @defmethod(generate_operations, [I.yield_])
 def meth(y):
-    yield genops(y.value)
-    yield B.YIELD_VALUE, None
+    emit_node(y.value)
+    emit(B.YIELD_VALUE)
     if y.result_ignored:
-        yield B.POP_TOP, None
+        emit(B.POP_TOP)
 
 
 # # # # # # # # # # #
@@ -425,25 +491,25 @@ def meth(y):
 
 @defmethod(generate_operations, [I.raise0])
 def meth(r):
-    yield B.RAISE_VARARGS, 0
+    emit(B.RAISE_VARARGS, 0)
     if not r.result_ignored:
-        yield B.LOAD_CONST, None
+        emit(B.LOAD_CONST, None)
 
 @defmethod(generate_operations, [I.raise1])
 def meth(r):
-    yield genops(r.value)
+    emit_node(r.value)
     if not r.result_ignored:
-        yield B.DUP_TOP, None
-    yield B.RAISE_VARARGS, 1
+        emit(B.DUP_TOP)
+    emit(B.RAISE_VARARGS, 1)
 
 @defmethod(generate_operations, [I.raise3])
 def meth(r):
-    yield genops(r.type)
+    emit_node(r.type)
     if not r.result_ignored:
-        yield B.DUP_TOP, None
-    yield genops(r.value)
-    yield genops(r.traceback)
-    yield B.RAISE_VARARGS, 3
+        emit(B.DUP_TOP)
+    emit_node(r.value)
+    emit_node(r.traceback)
+    emit(B.RAISE_VARARGS, 3)
 
 
 # # # # # # # # # # # #
@@ -454,20 +520,20 @@ def meth(r):
 def meth(tc):
     lhandler = B.Label()
     ljoin = B.Label()
-    yield B.SETUP_EXCEPT, lhandler
-    yield genops(tc.body)
-    yield B.POP_BLOCK, None
-    yield B.JUMP_FORWARD, ljoin
-    yield lhandler, None
+    emit(B.SETUP_EXCEPT, lhandler)
+    emit_node(tc.body)
+    emit(B.POP_BLOCK)
+    emit(B.JUMP_FORWARD, ljoin)
+    emit(lhandler)
     for b in [tc.exc_type_binding, tc.exc_value_binding, tc.exc_tb_binding]:
         if b is None:
-            yield B.POP_TOP, None
+            emit(B.POP_TOP)
         else:
-            yield generate_write_binding(b)
-    yield genops(tc.catch)
-    yield ljoin, None
+            emit_write_binding(b)
+    emit_node(tc.catch)
+    emit(ljoin)
     if not tc.result_ignored:
-        yield B.LOAD_CONST, None
+        emit(B.LOAD_CONST, None)
 
 
 # # # # # # # #
@@ -477,15 +543,15 @@ def meth(tc):
 @defmethod(generate_operations, [I.tryfinally])
 def meth(tf):
     handler = B.Label()
-    yield B.SETUP_FINALLY, handler
-    yield genops(tf.body)
-    yield B.POP_BLOCK, None
-    yield B.LOAD_CONST, None
-    yield handler, None
-    yield genops(tf.finally_)
-    yield B.END_FINALLY, None
+    emit(B.SETUP_FINALLY, handler)
+    emit_node(tf.body)
+    emit(B.POP_BLOCK)
+    emit(B.LOAD_CONST, None)
+    emit(handler)
+    emit_node(tf.finally_)
+    emit(B.END_FINALLY)
     if not tf.result_ignored:
-        yield B.LOAD_CONST, None
+        emit(B.LOAD_CONST, None)
 
 # # # # # # #
 # Tag Body  #
@@ -503,30 +569,30 @@ def get_tag_label(tag):
 def meth(tb):
     for tag in tb.tags:
         if tag.symbol is not None:
-            yield get_tag_label(tag), None
-        yield genops(tag.body)
+            emit(get_tag_label(tag))
+        emit_node(tag.body)
     if not tb.result_ignored:
-        yield B.LOAD_CONST, None
+        emit(B.LOAD_CONST, None)
 
 @defmethod(generate_operations, [I.go])
 def meth(go):
-    yield B.JUMP_ABSOLUTE, get_tag_label(go.tag)
+    emit(B.JUMP_ABSOLUTE, get_tag_label(go.tag))
     if not go.result_ignored:
-        yield B.LOAD_CONST, None
+        emit(B.LOAD_CONST, None)
 
 @defmethod(generate_operations, [I.foriter])
 def meth(fi):
-    yield genops(fi.iter)
-    yield B.FOR_ITER, get_tag_label(fi.tag)
+    emit_node(fi.iter)
+    emit(B.FOR_ITER, get_tag_label(fi.tag))
     if not fi.result_ignored:
-        yield B.DUP_TOP, None
-        yield B.ROT_TWO, None
-    yield generate_write_binding(fi.binding)
-    yield B.POP_TOP, None #pop the iter
+        emit(B.DUP_TOP)
+        emit(B.ROT_TWO)
+    emit_write_binding(fi.binding)
+    emit(B.POP_TOP) #pop the iter
 
 @defmethod(generate_operations, [I.toplevel])
 def meth(top):
-    yield genops(top.expression)
+    emit_node(top.expression)
 
 # # # # # # #
 # Function  #
@@ -536,22 +602,16 @@ load_function_code = MultiMethod()
 
 get_function_free_bindings = MultiMethod()
 
-seen = set()
 @defmethod(get_function_free_bindings, [I.function])
 def meth(f):
-    free_bindings, cell_bindings = find_non_local_bindings(f.body)
-    for bu in I.iter_bindings(f):
-        if bind.get_binding_use_type(bu) == bind.BND_CELL:
-            cell_bindings.add(bu.binding)
-    free_bindings -= cell_bindings
-    return free_bindings
+    return analyze_bindings(f, for_codegen=False).free_bindings
 
 # @defmethod(get_function_free_bindings, [I.non_const_function])
 # def meth(f):
 #     return f.free_bindings
 
 def get_canonical_free_bindings(f):
-    return sorted(get_function_free_bindings(f),
+    return sorted(get_function_bindings(f).free_bindings,
                   key=get_name_translation)
 
 @defmethod(load_function_code, [I.function])
@@ -582,18 +642,18 @@ def meth(f):
     if f.result_ignored:
         #just evaluate defaults with side effects
         for d in f.defaults:
-            yield generate_eval_and_drop_unless_pure(d)
+            emit_eval_and_drop_unless_pure(d)
         return
     for d in f.defaults:
-        yield genops(d)
+        emit_node(d)
     free_bindings = get_canonical_free_bindings(f)
     if free_bindings:
         for fr in free_bindings:
-            yield B.LOAD_CLOSURE, state.name_translations[fr]
-        yield B.BUILD_TUPLE, len(free_bindings)
-    yield load_function_code(f)
-    yield (B.MAKE_CLOSURE if free_bindings else
-           B.MAKE_FUNCTION), len(f.defaults)
+            emit(B.LOAD_CLOSURE, state.name_translations[fr])
+        emit(B.BUILD_TUPLE, len(free_bindings))
+    emit_all(load_function_code(f))
+    emit(B.MAKE_CLOSURE if free_bindings else
+         B.MAKE_FUNCTION, len(f.defaults))
 
 # # # # # # # # # #
 # Pre-Evaluation  #
@@ -609,57 +669,86 @@ def meth(pe):
 
 @defmethod(generate_operations, [I.import_name])
 def meth(im):
-    yield B.LOAD_CONST, -1
-    yield B.LOAD_CONST, None
-    yield B.IMPORT_NAME, im.name
+    emit(B.LOAD_CONST, -1)
+    emit(B.LOAD_CONST, None)
+    emit(B.IMPORT_NAME, im.name)
     if im.result_ignored:
-        yield B.POP_TOP, None
+        emit(B.POP_TOP)
 
 
 # # # # # # # # # # # # # # # # # # # #
 # Tree-wise Lexical Binding Utilities #
 # # # # # # # # # # # # # # # # # # # #
 
-class NonLocalNameFinder(IRWalker):
-
-    descend_into_functions = True
+class FunctionBindings(object):
+    '''bindings used within a function, or top level expression, as found by
+       BindingAnalyzer.  free bindings include those of nested functions that
+       aren't bound by this function, whereas cell and local bindings are
+       only those bound by this function
+    '''
 
     def __init__(self):
-        IRWalker.__init__(self)
-        self.cell_bindings = set()
         self.free_bindings = set()
-
-    def visit_node(self, node):
-        for bu in I.iter_bindings(node):
-            bt = bind.get_binding_use_type(bu)
-            if bt == bind.BND_CELL:
-                self.cell_bindings.add(bu.binding)
-            elif bt == bind.BND_FREE:
-                self.free_bindings.add(bu.binding)
-        self.visit_children(node)
-
-
-def find_non_local_bindings(node):
-    nlbf = NonLocalNameFinder()
-    nlbf.visit(node)
-    return nlbf.free_bindings, nlbf.cell_bindings
+        self.cell_bindings = set()
+        self.local_bindings = set()
 
 
-class LocalNameTranslator(IRWalker):
+class BindingAnalyzer(StackWalker):
+    '''finds the bindings of all functions in a single walk, bottom up, by
+       collecting the free bindings of each function into the function that
+       contains it when leaving the function.  for code generation, the
+       FunctionBindings of each function are cached on the function node,
+       along with assigning name translations to each non-global binding
+    '''
 
     descend_into_functions = True
 
-    def __init__(self):
-        IRWalker.__init__(self)
+    def __init__(self, for_codegen=True):
+        StackWalker.__init__(self)
+        self.for_codegen = for_codegen
+        self.use_types = state.local_use_types if for_codegen else {}
         self.local_names = set()
+        self.stack = [FunctionBindings()]
 
-    def visit_node(self, node):
+    def enter_node(self, node):
+        fb = self.stack[-1]
         for bu in I.iter_bindings(node):
-            if bu.binding not in state.name_translations:
-                if bind.get_binding_use_type(bu) is not bind.BND_GLOBAL:
-                    name = self.new_local_name(bu.binding.symbol.print_form)
-                    state.name_translations[bu.binding] = name
-        self.visit_children(node)
+            ut = self.get_use_type(bu)
+            if ut == bind.BND_GLOBAL:
+                continue
+            if ut == bind.BND_FREE:
+                fb.free_bindings.add(bu.binding)
+            elif ut == bind.BND_CELL:
+                fb.cell_bindings.add(bu.binding)
+            else:
+                fb.local_bindings.add(bu.binding)
+            if self.for_codegen and bu.binding not in state.name_translations:
+                name = self.new_local_name(bu.binding.symbol.print_form)
+                state.name_translations[bu.binding] = name
+
+    def enter_function(self, func):
+        self.stack.append(FunctionBindings())
+        self.enter_node(func)
+
+    def leave_function(self, func):
+        fb = self.stack.pop()
+        fb.free_bindings -= fb.cell_bindings
+        self.stack[-1].free_bindings |= fb.free_bindings
+        if self.for_codegen:
+            func.function_bindings = fb
+
+    def get_use_type(self, bu):
+        if not bu.scope:
+            return bind.BND_GLOBAL
+        if bu.scope.get_locals_scope() is not bu.binding.scope.get_locals_scope():
+            return bind.BND_FREE
+        #all uses within the scope of a binding are either local or cell,
+        #and finding which requires visiting the scope of each use
+        try:
+            return self.use_types[bu.binding]
+        except KeyError:
+            ut = self.use_types[bu.binding] = bind.get_binding_use_type(bu)
+            return ut
 
     def new_local_name(self, basename):
         for trans in self.iter_translations(basename):
@@ -676,8 +765,56 @@ class LocalNameTranslator(IRWalker):
             yield '%s(%d)' % (basename, i)
 
 
+def analyze_bindings(ir, for_codegen=True):
+    '''FunctionBindings of ir, along with those of each function that it
+       contains when for_codegen
+    '''
+    analyzer = BindingAnalyzer(for_codegen)
+    analyzer.walk(ir)
+    [fb] = analyzer.stack
+    fb.free_bindings -= fb.cell_bindings
+    if for_codegen and not isinstance(ir, I.function):
+        ir.function_bindings = fb
+    return fb
+
+def get_function_bindings(ir):
+    '''FunctionBindings cached by the analysis of compilation ir
+    '''
+    try:
+        return ir.function_bindings
+    except AttributeError:
+        analyze_bindings(ir)
+        return ir.function_bindings
+
+class NonLocalNameFinder(StackWalker):
+
+    descend_into_functions = True
+
+    def __init__(self):
+        StackWalker.__init__(self)
+        self.cell_bindings = set()
+        self.free_bindings = set()
+
+    def enter_node(self, node):
+        for bu in I.iter_bindings(node):
+            bt = bind.get_binding_use_type(bu)
+            if bt == bind.BND_CELL:
+                self.cell_bindings.add(bu.binding)
+            elif bt == bind.BND_FREE:
+                self.free_bindings.add(bu.binding)
+
+def find_non_local_bindings(node):
+    '''bindings with free and cell uses anywhere within node, including
+       nested functions; free bindings of nested functions that are cells
+       of an enclosing function within node are included in both.  use
+       analyze_bindings for the bindings of each function
+    '''
+    nlbf = NonLocalNameFinder()
+    nlbf.walk(node)
+    return nlbf.free_bindings, nlbf.cell_bindings
+
 def translate_bindings(ir):
-    LocalNameTranslator().visit(ir)
+    analyze_bindings(ir)
     return ir
 
 
@@ -685,26 +822,25 @@ def translate_bindings(ir):
 # Remove locations from other files #
 # # # # # # # # # # # # # # # # # # #
 
-class LocationStripper(IRWalker):
+class LocationStripper(StackWalker):
 
     descend_into_functions = True
 
     def __init__(self, filename):
-        IRWalker.__init__(self)
+        StackWalker.__init__(self)
         self.filename = filename
 
-    def visit_node(self, node):
+    def enter_node(self, node):
         if node.filename is not self.filename or self.filename is None:
             node.filename = None
             node.lineno = None
             node.colno = None
-        self.visit_children(node)
 
 def strip_locations_from_other_files(node, filename):
-    LocationStripper(filename).visit(node)
+    LocationStripper(filename).walk(node)
 
 def strip_all_locatons(node):
-    LocationStripper(None).visit(node)
+    LocationStripper(None).walk(node)
 
 
 # # # # # # #
@@ -725,13 +861,16 @@ class CompilationError(Exception):
 def compilation_error(ir=None, msg='error', *args):
     raise CompilationError(ir, msg%args if args else msg)
 
-def generate_eval_and_drop(node):
+def emit_eval_and_drop(node):
     node.result_ignored = True
-    yield genops(node)
+    emit_node(node)
 
-def generate_eval_and_drop_unless_pure(node):
+def emit_eval_and_drop_unless_pure(node):
     if not purep(node):
-        yield generate_eval_and_drop(node)
+        emit_eval_and_drop(node)
+
+generate_eval_and_drop = yielding(emit_eval_and_drop)
+generate_eval_and_drop_unless_pure = yielding(emit_eval_and_drop_unless_pure)
 
 def compile_code(ops, freevars, args, varargs, varkwargs,
                  name, filename, firstlineno, docstring):
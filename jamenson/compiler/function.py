@@ -21,7 +21,7 @@ def make_function(func, **kwds):
     top = I.copy_loc(I.make_toplevel(body, func.scope), body)
     top = common_transform(top)
     func.body = top.expression
-    free_bindings = codegen.get_canonical_free_bindings(func)
+    free_bindings = codegen.get_function_free_bindings(func)
     if free_bindings:
         raise ValueError("can't create a function with free bindings")
     with codegen.state.top(tag_labels=None, **kwds):
@@ -13,8 +13,7 @@ if __name__ == '__main__':
 import itertools
 
 from ..runtime.multimethod import defmethod, around
-from ..runtime.ports import (Port, PortList, connect, disconnect,
-                             get_cell, get_cells, DanglingPort)
+from ..runtime.ports import Port, PortList, DanglingPort
 from ..runtime.copy import copy, copy_obj
 from ..runtime.symbol import Symbol
 from ..runtime.atypes import (as_optimized_type, anytype, notanytype,
@@ -308,7 +307,7 @@ def meth(callnext, tg):
     return cp
 
 def get_uses(tg):
-    return get_cells(tg._uses)
+    return tg._uses.get_cells()
 
 tag.uses = property(get_uses)
 
@@ -322,7 +321,7 @@ def meth(callnext, jp):
 
 def get_jump_tag(jp):
     try:
-        return get_cell(jp._tag)
+        return jp._tag.get_cell()
     except DanglingPort:
         return None
 
@@ -332,12 +331,12 @@ def set_jump_tag(jp, tg):
         if not isinstance(tg, tag):
             raise TypeError("tag attribute of %s must be a tag instance; given %s" %
                             (type(jp).__name__, tg))
-        connect(jp._tag, tg._uses)
+        jp._tag.connect(tg._uses)
 
 def del_jump_tag(jp):
     tg = get_jump_tag(jp)
     if tg:
-        disconnect(jp._tag, tg._uses)
+        jp._tag.disconnect(tg._uses)
 
 jump.tag = property(get_jump_tag,
                     set_jump_tag,
@@ -349,7 +348,7 @@ def meth(callnext, jp):
     cp = callnext(jp)
     cp.tagid = next_tag_id()
     cp._tag = Port(cp)
-    connect(cp._tag, copy(jp.tag)._uses)
+    cp._tag.connect(copy(jp.tag)._uses)
     return cp
 
 
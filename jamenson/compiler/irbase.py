@@ -1,4 +1,9 @@
 '''Base class and framework for intermediate representation
+
+   Nodes are created with one of two backends.  The ports backend connects
+   each node to its children and bindings through ports, which the compact
+   backend replaces with slots holding children and bindings directly, and
+   a pointer from each child back to its parent and its index therein.
 '''
 
 import sys
@@ -9,8 +14,7 @@ from functools import partial
 from ..runtime.func import identity
 from ..runtime.collections import OrderedSet
 from ..runtime.multimethod import MultiMethod, defmethod
-from ..runtime.ports import (Port, connect, disconnect, disconnect_all, replace_connection,
-                             get_cell, DanglingPort, AttrPortList)
+from ..runtime.ports import Port, DanglingPort, BreakNonExisting, AttrPortList
 from ..runtime.as_string import StringingMixin, as_string
 from ..runtime.copy import copy, copy_obj, set_copy
 from ..runtime.atypes import as_optimized_type, typep, anytype
@@ -61,7 +65,7 @@ class node(StringingMixin):
     def continuation():
         def get(self):
             try:
-                return get_cell(self.continuation_port)
+                return self.continuation_port.get_cell()
             except DanglingPort:
                 return None
         def set(self, value):
@@ -69,7 +73,29 @@ class node(StringingMixin):
                 raise RuntimeError("setting continuation in child is ambiguous")
             del_(self)
         def del_(self):
-            disconnect_all(self.continuation_port)
+            self.continuation_port.disconnect_all()
+        return property(get, set, del_)
+    continuation = continuation()
+
+
+class compact_node(node):
+    '''base class for ir nodes of the compact backend
+    '''
+
+    #parent node, the slot holding this node in the parent,
+    #and index in that slot when it holds a sequence of children
+    __slots__ = ['_parent', '_parent_slot', '_parent_index',
+                 'lineno', 'colno', 'filename']
+
+    def continuation():
+        def get(self):
+            return self._parent
+        def set(self, value):
+            if value is not None:
+                raise RuntimeError("setting continuation in child is ambiguous")
+            del_(self)
+        def del_(self):
+            detach_child(self)
         return property(get, set, del_)
     continuation = continuation()
 
@@ -92,7 +118,7 @@ def base_init_func(cls, arg_mapping, *args, **kwds):
 def base_get_child(name, node):
     port = getattr(node, name)
     try:
-        return get_cell(port)
+        return port.get_cell()
     except DanglingPort:
         return None
 
@@ -102,16 +128,16 @@ def base_set_child(name, node, child):
     except AttributeError:
         pass
     if child is not None:
-        connect(getattr(node,name), as_node(child).continuation_port)
+        getattr(node,name).connect(as_node(child).continuation_port)
 
 def base_del_child(name, node):
     port = getattr(node, name)
     try:
-        child = get_cell(port)
+        child = port.get_cell()
     except DanglingPort:
         raise AttributeError
     else:
-        disconnect(port, child.continuation_port)
+        port.disconnect(child.continuation_port)
 
 
 def base_get_childlist(name, node):
@@ -128,7 +154,7 @@ def base_del_childlist(name, node):
 def base_get_binding(name, node):
     port = getattr(node, name)
     try:
-        return get_cell(port)
+        return port.get_cell()
     except DanglingPort:
         return None
 
@@ -140,16 +166,16 @@ def base_set_binding(name, node, binding):
     if binding is not None:
         if binding.user:
             raise RuntimeError('attempting to reuse binding %s' % (binding,))
-        connect(getattr(node, name), binding.user_port)
+        getattr(node, name).connect(binding.user_port)
 
 def base_del_binding(name, node):
     port = getattr(node, name)
     try:
-        binding = get_cell(port)
+        binding = port.get_cell()
     except DanglingPort:
         raise AttributeError
     else:
-        disconnect(port, binding.user_port)
+        port.disconnect(binding.user_port)
 
 def base_get_bindinglist(name, node):
     return getattr(node, name)
@@ -175,6 +201,215 @@ def build_accessors(dct, names, base_get, base_set, base_del):
                           partial(base_set, inner_name),
                           partial(base_del, inner_name))
 
+
+# # # # # # # # # # # # # # # #
+# Accessor to Compact Slots   #
+# # # # # # # # # # # # # # # #
+
+class CompactList(object):
+    '''sequence of children or bindings held directly by a compact node
+    '''
+
+    __slots__ = ['node', 'name', 'items']
+
+    def __init__(self, node, name):
+        self.node = node
+        self.name = name
+        self.items = []
+
+    def __iter__(self):
+        #copied, as iteration commonly modifies the sequence
+        return iter(self.items[::])
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, el):
+        return el in self.items
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def index(self, el):
+        return self.items.index(el)
+
+    def extend(self, seq):
+        for el in seq:
+            self.append(el)
+
+    def __delitem__(self, index):
+        if not isinstance(index, slice):
+            self.remove(self.items[index])
+        elif index == slice(None, None, None):
+            self.clear()
+        else:
+            for el in self.items[index]:
+                self.remove(el)
+
+
+class ChildNodeList(CompactList):
+    """sequence of children nodes, each of whom records its index herein
+    """
+
+    __slots__ = []
+
+    def append(self, child):
+        child = as_compact_child(child)
+        detach_child(child)
+        attach_child(self.node, self.name, child, len(self.items))
+        self.items.append(child)
+
+    def remove(self, child):
+        if child._parent is not self.node or child._parent_slot != self.name:
+            raise BreakNonExisting
+        detach_child(child)
+
+    def __setitem__(self, index, child):
+        child = as_compact_child(child)
+        old = self.items[index]
+        if old is child:
+            return
+        detach_child(child)
+        index = old._parent_index
+        old._parent = old._parent_slot = old._parent_index = None
+        attach_child(self.node, self.name, child, index)
+        self.items[index] = child
+
+    def clear(self):
+        for child in self.items:
+            child._parent = child._parent_slot = child._parent_index = None
+        del self.items[::]
+
+    def pop_index(self, index):
+        items = self.items
+        del items[index]
+        for i in xrange(index, len(items)):
+            items[i]._parent_index = i
+
+
+class BindingNodeList(CompactList):
+    '''sequence of bindings used in a node
+    '''
+
+    __slots__ = []
+
+    def append(self, binding):
+        detach_binding(binding)
+        binding.user_node = self.node
+        self.items.append(binding)
+
+    def remove(self, binding):
+        if binding not in self.items:
+            raise BreakNonExisting
+        self.items.remove(binding)
+        binding.user_node = None
+
+    def __setitem__(self, index, binding):
+        old = self.items[index]
+        if old is binding:
+            return
+        detach_binding(binding)
+        index = self.items.index(old)
+        old.user_node = None
+        binding.user_node = self.node
+        self.items[index] = binding
+
+    def clear(self):
+        for binding in self.items:
+            binding.user_node = None
+        del self.items[::]
+
+
+def as_compact_child(child):
+    if not isinstance(child, compact_node):
+        child = as_node(child)
+        assert isinstance(child, compact_node), 'cannot hold %r in compact node' % (child,)
+    return child
+
+def attach_child(node, name, child, index=None):
+    child._parent = node
+    child._parent_slot = name
+    child._parent_index = index
+
+def detach_child(child):
+    parent = child._parent
+    if parent is None:
+        return
+    name = child._parent_slot
+    index = child._parent_index
+    child._parent = child._parent_slot = child._parent_index = None
+    if index is None:
+        setattr(parent, name, None)
+    else:
+        getattr(parent, name).pop_index(index)
+
+def detach_binding(binding):
+    user = binding.user_node
+    if user is None:
+        return
+    for name in user._bindings:
+        if getattr(user, name) is binding:
+            setattr(user, '_'+name, None)
+    for name in user._bindinglists:
+        bindings = getattr(user, name)
+        if binding in bindings:
+            bindings.remove(binding)
+    binding.user_node = None
+
+def compact_set_child(name, node, child):
+    old = getattr(node, name)
+    if old is not None:
+        old._parent = old._parent_slot = old._parent_index = None
+        setattr(node, name, None)
+    if child is not None:
+        child = as_compact_child(child)
+        detach_child(child)
+        attach_child(node, name, child)
+        setattr(node, name, child)
+
+def compact_del_child(name, node):
+    child = getattr(node, name)
+    if child is None:
+        raise AttributeError
+    detach_child(child)
+
+def compact_set_childlist(name, node, seq):
+    seq = list(seq)
+    children = getattr(node, name)
+    children.clear()
+    children.extend(seq)
+
+def compact_del_childlist(name, node):
+    getattr(node, name).clear()
+
+def compact_set_binding(name, node, binding):
+    old = getattr(node, name)
+    if old is not None:
+        old.user_node = None
+        setattr(node, name, None)
+    if binding is not None:
+        if binding.user:
+            raise RuntimeError('attempting to reuse binding %s' % (binding,))
+        binding.user_node = node
+        setattr(node, name, binding)
+
+def compact_del_binding(name, node):
+    binding = getattr(node, name)
+    if binding is None:
+        raise AttributeError
+    binding.user_node = None
+    setattr(node, name, None)
+
+compact_set_bindinglist = compact_set_childlist
+compact_del_bindinglist = compact_del_childlist
+
+def build_slot_accessors(dct, names, base_set, base_del):
+    for n in names:
+        inner_name = '_' + n
+        dct[n] = property(operator.attrgetter(inner_name),
+                          partial(base_set, inner_name),
+                          partial(base_del, inner_name))
+
 # # # # # # # # # # #
 # Node Construction #
 # # # # # # # # # # #
@@ -188,10 +423,17 @@ def bases_collect_list(bases, attr):
         acc.extend(getattr(base, attr, ()))
     return acc
 
+#backend of nodes created without one specified, either 'compact' or 'ports'.
+#must be set before defining nodes, including those of the ir module
+default_backend = 'compact'
+
+backend_base_classes = {'ports' : node,
+                        'compact' : compact_node}
+
 def createnode(name, children=[], childlists=[],
                bindings=[], bindinglists=[], attrs=[],
                args=None, bases=[], doc='', cls_attrs=None,
-               optimized=None, result_type=None):
+               optimized=None, result_type=None, backend=None):
     d = dict(__doc__=doc)
 
     if cls_attrs:
@@ -201,10 +443,27 @@ def createnode(name, children=[], childlists=[],
     if result_type is not None:
         d['result_type'] = as_optimized_type(result_type)
 
-    build_accessors(d, children, base_get_child, base_set_child, base_del_child)
-    build_accessors(d, childlists, base_get_childlist, base_set_childlist, base_del_childlist)
-    build_accessors(d, bindings, base_get_binding, base_set_binding, base_del_binding)
-    build_accessors(d, bindinglists, base_get_bindinglist, base_set_bindinglist, base_del_bindinglist)
+    base_node = backend_base_classes[backend or default_backend]
+    bases = list(bases)
+    if base_node not in bases:
+        bases = bases + [base_node]
+
+    if base_node is compact_node:
+        inherited = set(bases_collect_list(bases, '_children') +
+                        bases_collect_list(bases, '_childlists') +
+                        bases_collect_list(bases, '_bindings') +
+                        bases_collect_list(bases, '_bindinglists'))
+        d['__slots__'] = ['_'+n for n in children + childlists + bindings + bindinglists
+                          if n not in inherited]
+        build_slot_accessors(d, children, compact_set_child, compact_del_child)
+        build_slot_accessors(d, childlists, compact_set_childlist, compact_del_childlist)
+        build_slot_accessors(d, bindings, compact_set_binding, compact_del_binding)
+        build_slot_accessors(d, bindinglists, compact_set_bindinglist, compact_del_bindinglist)
+    else:
+        build_accessors(d, children, base_get_child, base_set_child, base_del_child)
+        build_accessors(d, childlists, base_get_childlist, base_set_childlist, base_del_childlist)
+        build_accessors(d, bindings, base_get_binding, base_set_binding, base_del_binding)
+        build_accessors(d, bindinglists, base_get_bindinglist, base_set_bindinglist, base_del_bindinglist)
 
     xattrs = []
     for n in attrs:
@@ -216,9 +475,6 @@ def createnode(name, children=[], childlists=[],
             d[n] = property(operator.attrgetter('_'+n),
                             partial(base_check_type_set_attr,
                                     as_optimized_type(tp), '_'+n))
-    bases = list(bases)
-    if node not in bases:
-        bases = bases + [node]
 
     children = bases_collect_list(bases, '_children') + children
     childlists = bases_collect_list(bases, '_childlists') + childlists
@@ -283,7 +539,7 @@ def meth(node):
 
 def init_binding_ports(node):
     for n in node.__class__._bindings:
-        setattr(node, '_'+n, Port(n))
+        setattr(node, '_'+n, Port(node))
     for n in node.__class__._bindinglists:
         setattr(node, '_'+n, BindingList(node))
 
@@ -293,6 +549,20 @@ def init_child_ports(node):
     for n in node.__class__._childlists:
         setattr(node, '_'+n, ChildrenList(node))
 
+@defmethod(init_ports, [compact_node])
+def meth(node):
+    node._parent = node._parent_slot = node._parent_index = None
+    node.lineno = node.colno = node.filename = None
+    cls = node.__class__
+    for n in cls._children:
+        setattr(node, '_'+n, None)
+    for n in cls._childlists:
+        setattr(node, '_'+n, ChildNodeList(node, '_'+n))
+    for n in cls._bindings:
+        setattr(node, '_'+n, None)
+    for n in cls._bindinglists:
+        setattr(node, '_'+n, BindingNodeList(node, '_'+n))
+
 
 as_node = MultiMethod(name='as_node',
                       signature='op',
@@ -362,9 +632,19 @@ def meth(node):
 # # # # # # #
 
 def replace_child(old, new):
-    replace_connection(old.continuation_port.port,
-                       old.continuation_port,
-                       new.continuation_port)
+    if isinstance(old, compact_node):
+        parent = old._parent
+        if parent is None:
+            raise BreakNonExisting
+        if old._parent_index is None:
+            setattr(parent, old._parent_slot[1:], new)
+        else:
+            getattr(parent, old._parent_slot)[old._parent_index] = new
+    else:
+        port = old.continuation_port.port
+        if port is None:
+            raise BreakNonExisting
+        port.replace_connection(old.continuation_port, new.continuation_port)
 
 def ir_location_str(ir):
     return '%s:%s.%s' % ('?' if ir.filename is None else ir.filename,
@@ -16,6 +16,7 @@ from ..runtime.symbol import (Symbol, get_sys_symbol, keywordp, attributep,
 from ..runtime.cons import Cons, nil, well_form_list_p
 from ..runtime.macro import MacroFunction
 from ..runtime.builtins import builtinp, get_builtin
+from ..runtime.read import FormLocations
 
 from . import ir as I
 from . import bind
@@ -44,7 +45,7 @@ class TranslationState(CtxSingleton):
         return cp
 
     def _cxs_setup_aux(self):
-        self.form_locations = self.form_locations or {}
+        self.form_locations = self.form_locations or FormLocations()
         self.filename = self.filename or '<string>'
         self.scope = self.scope or bind.Scope(manage_locals=True)
         self.tag_bodies_stack = self.tag_bodies_stack or []
@@ -665,7 +666,7 @@ def meth(form):
 # # # # # # #
 
 def get_form_loc(form):
-    return state.form_locations.get(id(form), None)
+    return state.form_locations.get(form)
 
 def get_a_form_loc(form=None):
     return (get_form_loc(form) if form is not None else None) or state.current_loc or (None,None)
@@ -57,20 +57,150 @@ class IRWalker(object):
             return self.visit_node(node)
 
 
-class Flagger(IRWalker):
+#returned by enter visitors of StackWalker to not walk children of a node
+SKIP_CHILDREN = object()
+
+class StackWalker(object):
+    '''depth first code walker that holds pending nodes on an explicit stack,
+       rather than recursing through python frames, such that arbitrarily
+       deeply nested code can be walked.
+
+       enter_<node class> is called before the children of a node are walked,
+       and can return SKIP_CHILDREN to not walk them.  leave_<node class>,
+       when defined, is called after all of the children have been walked,
+       and isn't called for nodes whose children were skipped.
+       visitors are dispatched over the method resolution order of the node
+       class, as with IRWalker.
+    '''
+
+    def __init__(self):
+        self.enter_table = {}
+        self.leave_table = {}
+
+    def walk(self, node):
+        if node is None:
+            return None
+        get_enter = self.get_enter
+        get_leave = self.get_leave
+        stack = [(node, None)]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            node, leave = pop()
+            if leave is not None:
+                leave(node)
+                continue
+            cls = node.__class__
+            if get_enter(cls)(node) is not SKIP_CHILDREN:
+                leave = get_leave(cls)
+                if leave is not None:
+                    push((node, leave))
+                children = list(I.iter_children(node))
+                children.reverse()
+                stack.extend((child, None) for child in children)
+        return node
+
+    def get_enter(self, cls):
+        try:
+            return self.enter_table[cls]
+        except KeyError:
+            meth = self.find_visitor('enter_', cls)
+            if meth is None:
+                raise RuntimeError("%s can't enter %s" %
+                                   (self.__class__.__name__,
+                                    cls.__name__))
+            self.enter_table[cls] = meth
+            return meth
+
+    def get_leave(self, cls):
+        try:
+            return self.leave_table[cls]
+        except KeyError:
+            meth = self.leave_table[cls] = self.find_visitor('leave_', cls)
+            return meth
+
+    def find_visitor(self, prefix, cls):
+        #first visitor of classes in method resolution order,
+        #where base visitors can be shadowed with None
+        for c in cls.mro():
+            meth = getattr(self, prefix + c.__name__, None)
+            if meth is not None:
+                return meth
+        return None
+
+    #default visitors
+    def enter_node(self, node):
+        pass
+
+    leave_node = None
+
+    descend_into_functions = False
+
+    def enter_function(self, node):
+        if not self.descend_into_functions:
+            return SKIP_CHILDREN
+        return self.enter_node(node)
+
+
+def walk_fused(node, walkers):
+    '''walk node once for each of several independent StackWalkers.
+       each walker visits the same nodes, in the same order, as it would
+       walking alone, and children are only walked while some walker
+       entering their parent didn't skip them
+    '''
+    if node is None:
+        return None
+    stack = [(node, tuple(walkers), False)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        node, walkers, leaving = pop()
+        cls = node.__class__
+        if leaving:
+            for walker in walkers:
+                walker.get_leave(cls)(node)
+            continue
+        descending = tuple(walker for walker in walkers
+                           if walker.get_enter(cls)(node) is not SKIP_CHILDREN)
+        leavers = tuple(walker for walker in descending
+                        if walker.get_leave(cls) is not None)
+        if leavers:
+            push((node, leavers, True))
+        if descending:
+            children = list(I.iter_children(node))
+            children.reverse()
+            stack.extend((child, descending, False) for child in children)
+    return node
+
+def iter_nodes(node, descend_into_functions=False):
+    '''iterate node and its descendants, depth first, without recursion.
+       functions are only included, along with their descendants,
+       when descend_into_functions
+    '''
+    stack = [node] if node is not None else []
+    while stack:
+        node = stack.pop()
+        if not descend_into_functions and isinstance(node, I.function):
+            continue
+        yield node
+        children = list(I.iter_children(node))
+        children.reverse()
+        stack.extend(children)
+
+
+class Flagger(StackWalker):
 
     def __init__(self, attr, value, descend_into_functions=False):
-        IRWalker.__init__(self)
+        StackWalker.__init__(self)
         self.attr = attr
         self.value = value
         self.descend_into_functions = descend_into_functions
 
-    def visit_node(self, node):
+    def enter_node(self, node):
         setattr(node, self.attr, self.value)
-        self.visit_children(node)
 
 def flag_tree(ir, attr, value=True, descend_into_functions=False):
-    Flagger(attr, value, descend_into_functions).visit(ir)
+    Flagger(attr, value, descend_into_functions).walk(ir)
 
 
 class ReducingWalker(IRWalker):
@@ -101,7 +231,7 @@ class LogicWalker(ReducingWalker):
         return self.visit_children(node)
 
 def any_node(predicate, node, descend_into_functions=False):
-    return LogicWalker(predicate, any, descend_into_functions).visit(node)
+    return any(itertools.imap(predicate, iter_nodes(node, descend_into_functions)))
 
 def all_nodes(predicate, node, descend_into_functions=False):
     return LogicWalker(predicate, all, descend_into_functions).visit(node)
@@ -115,22 +245,21 @@ def contains_type(tp, node, descend_into_functions=False):
     return any_node(lambda node: isinstance(node, tp), node, descend_into_functions)
 
 
-class LocationPropigator(IRWalker):
+class LocationPropigator(StackWalker):
 
     descend_into_functions = True
 
     def __init__(self, original_node, skips=[]):
-        IRWalker.__init__(self)
+        StackWalker.__init__(self)
         self.original_node = original_node
         self.skips = set(skips)
 
-    def visit_node(self, node):
+    def enter_node(self, node):
         if node in self.skips:
-            return
+            return SKIP_CHILDREN
         I.copy_loc(node, self.original_node)
-        self.visit_children(node)
 
 def propigate_location(original, new, skips=[]):
-    LocationPropigator(original, skips).visit(new)
+    LocationPropigator(original, skips).walk(new)
     return new
 
@@ -1,49 +1,238 @@
+'''Incremental build of the core Jamenson modules
+
+   Dependencies of each module are taken from the (b:require ...) forms in
+   its source.  A module is compiled when it has no compiled code, or when
+   the content hash of its source, or that of any module it transitively
+   requires, differs from the hash recorded by the previous build.  Each
+   module is compiled in a new worker process, such that it only sees the
+   runtime state of the modules it requires, with up to as many modules
+   compiled at once as there are jobs and each module compiled as soon as
+   all of the modules it requires are.
+
+   usage: python -m jamenson.core.build [-j N] [-v] [--force] [MODULES]
+'''
 
 from __future__ import absolute_import
 from __future__ import with_statement
 
-import os
+import re
 import sys
-from subprocess import Popen
-
-from jamenson.runtime.filepat import FilePath
-from jamenson.compiler.util import timing
-
-JMC_PATH = FilePath(os.path.expanduser('~/bin/jmc'))
-assert JMC_PATH.exists()
-
-build_order = '''
-    bootstrap0
-    backq
-    bootstrap1
-    ops
-    cxr
-    lambda
-    iter
-    cons
-    symbol
-    setf
-    control
-    import
-    multimethod
-    user
-    core
-'''.split()
+from hashlib import md5
+from Queue import Queue
+from optparse import OptionParser
+from multiprocessing import Pool, cpu_count
+
+from ..runtime.filepath import FilePath
+from ..runtime.tempfile import temp_file_proxy
+from ..runtime.require import normalize_name, get_name_path
+from ..compiler.util import timing
+
+core_directory = FilePath(__file__).abspath().parent()
+
+#modules built when none are given
+default_roots = ['core']
+
+#files read when compiling a module, that aren't required by it
+extra_inputs = {'user': ['user_symbols.jms']}
+
+#content hashes of the last build of each module
+manifest_name = 'build.manifest'
+
+package = 'core'
+
+
+class BuildError(Exception):
+    pass
+
+
+# # # # # # # # # # # # #
+# Dependency Discovery  #
+# # # # # # # # # # # # #
+# require forms are found in the text of the source, as reading it could
+# require reader macros that are only defined by the modules it requires
+
+comment_pattern = re.compile(r';[^\n]*')
+require_pattern = re.compile(r"\(\s*b:require((?:\s+'[^\s()']+)+)\s*\)")
+
+def find_requires(source):
+    acc = []
+    for match in require_pattern.finditer(comment_pattern.sub('', source)):
+        for name in match.group(1).split():
+            name = normalize_name(name[1:])
+            if name not in acc:
+                acc.append(name)
+    return acc
+
+def get_source_path(name, directory=core_directory):
+    return directory.child(get_name_path(name) + '.jms')
+
+def get_compiled_path(name, directory=core_directory):
+    return directory.child(get_name_path(name) + '.jmc')
+
+def read_source(name, directory=core_directory):
+    with open(get_source_path(name, directory)) as fp:
+        return fp.read()
+
+def scan_modules(roots, directory=core_directory):
+    '''map of each module reachable from roots to the modules it requires.
+       required modules without source in directory aren't built and left out
+    '''
+    graph = {}
+    pending = map(normalize_name, roots)
+    while pending:
+        name = pending.pop()
+        if name in graph:
+            continue
+        if not get_source_path(name, directory).exists():
+            raise BuildError('no source for module %s' % (name,))
+        requires = [dep for dep in find_requires(read_source(name, directory))
+                    if dep != name and get_source_path(dep, directory).exists()]
+        graph[name] = requires
+        pending.extend(requires)
+    return graph
+
+def build_order(graph):
+    '''modules ordered such that each follows all that it requires
+    '''
+    order = []
+    state = {}
+    def visit(name, path):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise BuildError('cyclic requires %s' % (' -> '.join(path + [name]),))
+        state[name] = 'visiting'
+        for dep in graph[name]:
+            visit(dep, path + [name])
+        state[name] = 'done'
+        order.append(name)
+    for name in sorted(graph):
+        visit(name, [])
+    return order
+
+
+# # # # # # # # # #
+# Content Hashes  #
+# # # # # # # # # #
+
+def calculate_hashes(graph, directory=core_directory):
+    '''hash of the source of each module combined with the hashes of
+       the modules it requires, and thereby all that they require
+    '''
+    hashes = {}
+    for name in build_order(graph):
+        digest = md5(read_source(name, directory))
+        for extra in extra_inputs.get(name, ()):
+            with open(directory.child(extra)) as fp:
+                digest.update(fp.read())
+        for dep in sorted(graph[name]):
+            digest.update('%s=%s' % (dep, hashes[dep]))
+        hashes[name] = digest.hexdigest()
+    return hashes
+
+def load_manifest(directory=core_directory):
+    path = directory.child(manifest_name)
+    if not path.exists():
+        return {}
+    with open(path) as fp:
+        return dict(line.split() for line in fp if line.strip())
+
+def save_manifest(manifest, directory=core_directory):
+    with temp_file_proxy(directory.child(manifest_name)) as fp:
+        for name in sorted(manifest):
+            print >>fp, name, manifest[name]
+
+def find_stale(graph, hashes, manifest, directory=core_directory):
+    return set(name for name in graph
+               if manifest.get(name) != hashes[name] or
+               not get_compiled_path(name, directory).exists())
+
+
+# # # # # # # #
+# Compilation #
+# # # # # # # #
+# modules are compiled by the jmc front end, as when invoked with --nocore -p core
+
+def make_compiler(verbosity):
+    from ..bin import jmc
+    compiler = jmc.jmc = jmc.JMC()
+    compiler.package = package
+    compiler.nocore = True
+    compiler.verbosity = verbosity
+    return compiler
+
+def compile_module(path):
+    from ..bin.jmc import process_target_in_worker
+    return process_target_in_worker(path)
+
+def build(roots=default_roots, jobs=1, verbosity=0, force=False, directory=core_directory):
+    '''build stale modules reachable from roots.
+       returns names of modules that failed, along with those requiring them
+    '''
+    compiler = make_compiler(verbosity)
+    graph = scan_modules(roots, directory)
+    hashes = calculate_hashes(graph, directory)
+    manifest = {} if force else load_manifest(directory)
+    stale = find_stale(graph, hashes, manifest, directory)
+    compiler.vmsg(1, '%d of %d modules to build', len(stale), len(graph))
+    waiting = dict((name, set(graph[name]) & stale) for name in stale)
+    failed = set()
+    done = Queue()
+    def finished(name, (path, log, error, snapshot)):
+        compiler.emit(log)
+        if error is not None:
+            compiler.msg('failed compiling %s\n%s', path, error.rstrip())
+            failed.add(name)
+            return
+        manifest[name] = hashes[name]
+        save_manifest(manifest, directory)
+    def ready():
+        names = sorted(name for name,deps in waiting.iteritems() if not deps)
+        for name in names:
+            del waiting[name]
+        return names
+    def complete(name):
+        for deps in waiting.itervalues():
+            deps.discard(name)
+    pool = Pool(max(jobs, 1), maxtasksperchild=1)
+    try:
+        running = 0
+        while True:
+            for name in ready():
+                pool.apply_async(compile_module, (get_source_path(name, directory),),
+                                 callback=lambda result, name=name: done.put((name, result)))
+                running += 1
+            if not running:
+                break
+            name, result = done.get()
+            running -= 1
+            finished(name, result)
+            if name not in failed:
+                complete(name)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    #modules left waiting require a module that failed
+    failed.update(waiting)
+    return failed
 
 def main():
+    parser = OptionParser(usage='%prog [-j N] [-v] [--force] [MODULES]')
+    parser.add_option('-j', '--jobs', dest='jobs', type='int', default=cpu_count(),
+                      metavar='N', help='compile up to N modules at once')
+    parser.add_option('-v', '--verbose', dest='verbosity', default=0, action='count',
+                      help='increment extent of messages durring compiling')
+    parser.add_option('-f', '--force', dest='force', default=False, action='store_true',
+                      help='rebuild all modules')
+    options, args = parser.parse_args()
     with timing() as t:
-        for target in build_order:
-            build(target)
-    print 'build time', t.strtime
-
-def build(path):
-    print >>sys.stderr, 'building', path
-    sys.stderr.flush()
-    mypath = FilePath(__file__)
-    path = mypath.sibling(path + '.jms')
-    p = Popen(map(str, [JMC_PATH, '-vv', '--nocore', '-p', 'core', path]))
-    r = p.wait()
-    if r!=0:
-        raise RuntimeError("command returned %s" % (r,))
+        failed = build(args or default_roots, options.jobs, options.verbosity, options.force)
+    print >>sys.stderr, 'build time', t.strtime
+    if failed:
+        print >>sys.stderr, 'failed to build', ' '.join(sorted(failed))
+        sys.exit(1)
 
 __name__ == '__main__' and main()
@@ -45,6 +45,8 @@
 from __future__ import absolute_import
 
 from functools import partial
+from threading import local
+from weakref import WeakKeyDictionary, ref as weakref
 
 from ..func import identity, noop, compose
 from ..collections import OrderedDict, OrderedSet
@@ -56,13 +58,45 @@ from ..multimethod import MultiMethod, defmethod, defboth_wrapper, around
 from .. import multimethod as MM
 
 __all__ = atypes_multimethods_interface + '''
-          as_type as_string eq_types
+          as_type as_string eq_types intern_type
           IsInstanceType union
           optimize_type
-          typep
+          typep compile_type predicate_expression
 '''.split()
 
 
+# # # # # # # #
+# Type caches #
+# # # # # # # #
+# results computed from types, such as compiled predicates and optimized
+# types, are cached.  these depend on the methods of the multimethods used
+# to compute them and are all forgotten whenever one of these gains a method
+
+#id of type -> (type, compiled predicate)
+compiled_types = {}
+compiled_types_limit = 4096
+#predicate source -> factory closing over constants
+predicate_factories = {}
+#type -> optimized type, keyed by hash_type and eq_types
+optimized_types = {}
+optimized_types_limit = 4096
+#(reducer, class, class) -> whether a pair of instances may reduce
+reducible_pairs = {}
+
+def clear_type_caches():
+    compiled_types.clear()
+    optimized_types.clear()
+    reducible_pairs.clear()
+
+class TypeCacheMultiMethod(MultiMethod):
+    '''multimethod whose methods determine cached results of types
+    '''
+
+    def invalidate(self, method=None):
+        clear_type_caches()
+        MultiMethod.invalidate(self, method)
+
+
 # # # # # # #
 # Base Type #
 # # # # # # #
@@ -82,16 +116,16 @@ type_name = MultiMethod(name='type_name',
                         doc='''returns a string the meaningfully names
                         what this type coresponds to
                         ''')
-eq_types = MultiMethod(name='eq_types',
-                       #signature='object,object',
-                       doc='''whether two types instances have the same
-                       semantical meaning
-                       ''')
-hash_type = MultiMethod(name='hash_type',
-                        #signature='object',
-                        doc='''calculate a hash s.t. two types that are equal through eq_types
-                        will have the same hash key
-                        ''')
+eq_types = TypeCacheMultiMethod(name='eq_types',
+                                #signature='object,object',
+                                doc='''whether two types instances have the same
+                                semantical meaning
+                                ''')
+hash_type = TypeCacheMultiMethod(name='hash_type',
+                                 #signature='object',
+                                 doc='''calculate a hash s.t. two types that are equal through eq_types
+                                 will have the same hash key
+                                 ''')
 
 @defmethod(as_string, [TypeBase])
 def meth(op):
@@ -114,6 +148,51 @@ def meth(a,b):
     return a is b
 
 
+# # # # # # # #
+# Interning   #
+# # # # # # # #
+# types are hash-consed on construction, such that equal types are generally
+# the same object; comparing them is then an identity check and their hash
+# is calculated once.  as with any hashing of types, this relies on eq_types
+# and hash_type methods of a class being defined before its instances are made.
+# types are only weakly held, and those that can't be hashed aren't interned
+
+#canonical type -> weak reference to itself
+interned_types = WeakKeyDictionary()
+
+class StrictConstants(local):
+    '''whether constants of types (e.g. of EqType and MemberType) are only equal
+       when they are also of the same type.  only the case while interning,
+       such that (eq True) isn't interned as (eq 1), although both match the
+       same objects
+    '''
+    enabled = False
+
+strict_constants = StrictConstants()
+
+def intern_type(tp):
+    '''the canonical instance of types equal to tp
+    '''
+    enabled = strict_constants.enabled
+    strict_constants.enabled = True
+    try:
+        try:
+            tp._type_hash = hash_type(tp)
+            canonical = interned_types.get(tp)
+        except TypeError:
+            #unhashable
+            tp.__dict__.pop('_type_hash', None)
+            return tp
+        if canonical is not None:
+            canonical = canonical()
+            if canonical is not None:
+                return canonical
+        interned_types[tp] = weakref(tp)
+        return tp
+    finally:
+        strict_constants.enabled = enabled
+
+
 # # # # # # # # #
 # Type Methods  #
 # # # # # # # # #
@@ -168,10 +247,10 @@ defmethod(as_type, [tuple])(OneOf)
 # upon these simple operations, are provied below
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 
-union_two = MultiMethod(name='union_two',
-                        #signature='TypeBase,TypeBase',
-                        doc='''calculates the union of two types
-                        ''')
+union_two = TypeCacheMultiMethod(name='union_two',
+                                 #signature='TypeBase,TypeBase',
+                                 doc='''calculates the union of two types
+                                 ''')
 
 def union(*inners):
     '''union of all types, this is optimized by by optimize_type
@@ -205,7 +284,47 @@ def meth(o,a):
 # Optimizations #
 # # # # # # # # #
 
-optimize_type = MultiMethod('optimize_type',
+class OptimizeTypeMultiMethod(TypeCacheMultiMethod):
+    '''memoizes results, such that equal types are only optimized once
+    '''
+
+    def __call__(self, op):
+        try:
+            return self.memoized(op)
+        except KeyError:
+            pass
+        except TypeError:
+            #unhashable, not a type
+            return MultiMethod.__call__(self, op)
+        optimized = MultiMethod.__call__(self, op)
+        self.memoize(op, optimized)
+        return optimized
+
+    #as with interning, memoized types are only the same when their
+    #constants are also of the same type
+
+    @staticmethod
+    def memoized(op):
+        enabled = strict_constants.enabled
+        strict_constants.enabled = True
+        try:
+            return optimized_types[op]
+        finally:
+            strict_constants.enabled = enabled
+
+    @staticmethod
+    def memoize(op, optimized):
+        enabled = strict_constants.enabled
+        strict_constants.enabled = True
+        try:
+            if len(optimized_types) >= optimized_types_limit:
+                optimized_types.clear()
+            optimized_types[op] = optimized
+        finally:
+            strict_constants.enabled = enabled
+
+
+optimize_type = OptimizeTypeMultiMethod('optimize_type',
                             #signature='TypeBase',
                             doc='''optimize type
                             may return an entirely different type, or a variant of the existing type,
@@ -247,8 +366,9 @@ def compile_join_reduce(mm, method, last_func):
     return wrap
 
 MM.combination_compilers[combine_join_reduce] = compile_join_reduce
+MM.combination_roles[combine_join_reduce] = 'reduce'
 
-union_pair_reduce = MultiMethod('union_pair_reduce',
+union_pair_reduce = TypeCacheMultiMethod('union_pair_reduce',
                                 doc='''
                                 reduce sets of elements in unions by
                                 pairwise reduction
@@ -256,23 +376,116 @@ union_pair_reduce = MultiMethod('union_pair_reduce',
 
 defunionreduce = partial(defboth_wrapper, union_pair_reduce)
 
+#reducer -> {class: function reducing all inners of exactly that class at once}
+bulk_join_reducers = {}
+
+def reduce_equal(a, b):
+    '''least specific reduction of a pair; equal types reduce to the first
+    '''
+    if eq_types(a,b):
+        return a
+    return None
+
+def pair_may_reduce(reducer, a_cls, b_cls):
+    '''whether reducer has a method beyond reduce_equal for a pair
+       of instances of these classes.  assumed so, when the reducer
+       doesn't dispatch on class alone
+    '''
+    key = reducer, a_cls, b_cls
+    try:
+        return reducible_pairs[key]
+    except KeyError:
+        pass
+    reducer.prepare()
+    if all(keyer is type for keyer in reducer.type_keyers):
+        reducible = any(meth.func is not reduce_equal
+                        for meth in reducer.select_methods((a_cls, b_cls)))
+    else:
+        reducible = True
+    reducible_pairs[key] = reducible
+    return reducible
+
+def bulk_reduce_join(reducer, inners):
+    bulk_reducers = bulk_join_reducers.get(reducer)
+    if not bulk_reducers:
+        return inners
+    buckets = {}
+    for tp in inners:
+        if tp.__class__ in bulk_reducers:
+            buckets.setdefault(tp.__class__, []).append(tp)
+    if not any(len(bucket) > 1 for bucket in buckets.itervalues()):
+        return inners
+    acc = []
+    for tp in inners:
+        bucket = buckets.get(tp.__class__)
+        if bucket is None or len(bucket) == 1:
+            acc.append(tp)
+        elif bucket[0] is tp:
+            #in place of the first of its class
+            acc.append(bulk_reducers[tp.__class__](bucket))
+    return acc
+
 def combinate_reduce_join(reducer, op):
-    '''Reduce combinations through pairwsie reduction.
-       T all combinations; including reducer(a,b) for all a and b s.t. a is not b
+    '''Reduce join through pairwise reduction, until no pair of inners reduces.
+       Inners of a class with a bulk reducer are first reduced at once.  Each
+       remaining inner is then only tried against previous inners of classes that
+       the reducer has methods for, and against equal inners through hashing.
+       Reduced pairs take the position of the first of the pair.
     '''
     inners = list(op.inners)
-    for i,a in enumerate(inners):
-        for b in inners[i+1:]:
-            r = reducer(a,b)
+    if len(inners) < 2:
+        return op
+    inners = bulk_reduce_join(reducer, inners)
+    changed = len(inners) != len(op.inners)
+    #reduced inners by position; None once reduced into another
+    slots = []
+    by_class = {}
+    by_hash = {}
+    def place(tp, i):
+        slots[i] = tp
+        by_class.setdefault(tp.__class__, set()).add(i)
+        by_hash.setdefault(hash(tp), set()).add(i)
+    def clear(i):
+        tp = slots[i]
+        slots[i] = None
+        by_class[tp.__class__].discard(i)
+        by_hash[hash(tp)].discard(i)
+    def find_reduction(tp, index):
+        candidates = set(by_hash.get(hash(tp), ()))
+        for cls,indices in by_class.iteritems():
+            if indices and (pair_may_reduce(reducer, cls, tp.__class__) or
+                            pair_may_reduce(reducer, tp.__class__, cls)):
+                candidates.update(indices)
+        candidates.discard(index)
+        for i in sorted(candidates):
+            other = slots[i]
+            if index is None or i < index:
+                r = reducer(other, tp)
+            else:
+                r = reducer(tp, other)
             if r is not None:
-                new_inners = op.inners.copy()
-                #remove before add, incase r is eqal to orignal
-                new_inners.remove(a)
-                new_inners.remove(b)
-                #insert at position of first one
-                new_inners.insert(i, r)
-                return combinate_reduce_join(reducer, op.__class__(new_inners))
-    return op
+                return i, r
+        return None
+    for tp in inners:
+        index = None
+        while True:
+            found = find_reduction(tp, index)
+            if found is None:
+                break
+            changed = True
+            i,tp = found
+            clear(i)
+            if index is not None:
+                clear(index)
+                i = min(i, index)
+            place(tp, i)
+            index = i
+        if index is None:
+            slots.append(None)
+            place(tp, len(slots) - 1)
+    if not changed:
+        return op
+    return op.__class__([tp for tp in slots if tp is not None])
 
 @defmethod(optimize_type, [OneOf], combination=around)
 def meth(callnext, op):
@@ -283,23 +496,43 @@ def meth(callnext, op):
 # pairwise reduction of join pairs  #
 # # # # # # # # # # # # # # # # # # #
 
-@defunionreduce([TypeBase, TypeBase])
-def meth(a,b):
-    if eq_types(a,b):
-        return a
-    return None
+defunionreduce([TypeBase, TypeBase])(reduce_equal)
 
 @defunionreduce([IsInstanceType, IsInstanceType])
 def meth(a,b):
     return IsInstanceType(*(a.types | b.types))
 
+def union_instance_types(tps):
+    return IsInstanceType(*set().union(*(tp.types for tp in tps)))
+
+bulk_join_reducers[union_pair_reduce] = {IsInstanceType: union_instance_types}
+
 # # # # #
 # typep #
 # # # # #
+# typep methods define the test for each class of type.  calls to typep
+# don't dispatch through these methods, but use a predicate compiled
+# by compile_type once per type instance.  types with a predicate_expression
+# method are inlined into one python expression; all others call back into
+# the typep methods
+
+class TypepMultiMethod(TypeCacheMultiMethod):
+
+    def __call__(self, op, tp):
+        try:
+            compiled_tp, predicate = compiled_types[id(tp)]
+        except KeyError:
+            return compile_type(tp)(op)
+        if compiled_tp is not tp:
+            return compile_type(tp)(op)
+        return predicate(op)
+
+    def call_methods(self, op, tp):
+        return MultiMethod.__call__(self, op, tp)
 
-typep = MultiMethod(name='typep',
-                    #signature='object, TypeBase',
-                    doc='''test whether an instance corresponds to a type specifiier''')
+typep = TypepMultiMethod(name='typep',
+                         #signature='object, TypeBase',
+                         doc='''test whether an instance corresponds to a type specifiier''')
 
 @defmethod(typep, [object, IsInstanceType])
 def meth(op, tp):
@@ -312,6 +545,78 @@ def meth(op, tp):
             return True
     return False
 
+predicate_expression = TypeCacheMultiMethod(name='predicate_expression',
+                                            #signature='TypeBase, TypePredicateBuilder, str',
+                                            doc='''python expression that tests the variable
+                                            named arg against a type.  objects are
+                                            referenced through builder.constant
+                                            ''')
+
+class TypePredicateBuilder(object):
+
+    def __init__(self):
+        self.constants = []
+
+    def constant(self, value):
+        self.constants.append(value)
+        return 'k%d' % (len(self.constants) - 1)
+
+    def expression(self, tp, arg):
+        return predicate_expression(tp, self, arg)
+
+    def build(self, tp):
+        expression = self.expression(tp, 'op')
+        source = ('def make_predicate(%s):\n'
+                  '    def predicate(op):\n'
+                  '        return %s\n'
+                  '    return predicate\n') % (
+            ''.join('k%d, ' % i for i in xrange(len(self.constants))), expression)
+        try:
+            factory = predicate_factories[source]
+        except KeyError:
+            ns = {}
+            try:
+                exec compile(source, '<typep>', 'exec') in ns
+            except (SyntaxError, MemoryError, RuntimeError):
+                #too deeply nested for the python compiler
+                return partial(call_typep_methods, tp)
+            factory = predicate_factories[source] = ns['make_predicate']
+        return factory(*self.constants)
+
+def call_typep_methods(tp, op):
+    return typep.call_methods(op, tp)
+
+def compile_type(tp):
+    '''predicate of one argument that tests against tp; cached per type
+    '''
+    try:
+        compiled_tp, predicate = compiled_types[id(tp)]
+    except KeyError:
+        pass
+    else:
+        if compiled_tp is tp:
+            return predicate
+    predicate = TypePredicateBuilder().build(tp)
+    if len(compiled_types) >= compiled_types_limit:
+        compiled_types.clear()
+    compiled_types[id(tp)] = tp, predicate
+    return predicate
+
+@defmethod(predicate_expression, [object, TypePredicateBuilder, str])
+def meth(tp, builder, arg):
+    return '%s(%s, %s)' % (builder.constant(typep.call_methods), arg, builder.constant(tp))
+
+@defmethod(predicate_expression, [IsInstanceType, TypePredicateBuilder, str])
+def meth(tp, builder, arg):
+    types = tuple(tp.types)
+    return 'isinstance(%s, %s)' % (arg, builder.constant(types[0] if len(types) == 1 else types))
+
+@defmethod(predicate_expression, [OneOf, TypePredicateBuilder, str])
+def meth(tp, builder, arg):
+    if not tp.inners:
+        return 'False'
+    return '(%s)' % ' or '.join(builder.expression(etp, arg) for etp in tp.inners)
+
 
 
 # # # # # # # # # # # #
@@ -465,7 +770,7 @@ def make_indexer(indices, scorer):
 #apply new methods to classes
 #from jamenson.runtime.atypes import bsclasses
 def wire():
-    for name in 'as_string eq_types hash_type as_type'.split():
+    for name in 'as_string eq_types hash_type as_type intern_type'.split():
         bsclasses_names_spaces[name] = globals()[name]
 wire()
 del wire
@@ -2,14 +2,19 @@
 '''
 
 from __future__ import absolute_import
+from __future__ import with_statement
 
 import sys
+import re
+from time import time as clock
+from weakref import WeakSet
+from types import ClassType
 
-from compiler import parse as py_compiler_parse
-from compiler.ast import Keyword as AstKeyword
+from _ast import PyCF_ONLY_AST
 
 from ..bases import CachingBase
 from ..collections import OrderedDict
+from ..func import identity, noop
 from ..fakeatypes import (as_optimized_type, type_name, compose_types_scorer,
                           no_score, best_score, worst_score)
 
@@ -19,6 +24,9 @@ __all__ = '''MultiMethodError only before after around
              MultiMethod
              defmethod defboth_wrapper
              current_method
+             start_dispatch_profiling stop_dispatch_profiling
+             report_dispatch_profile
+             collect_dispatch_snapshot save_dispatch_snapshot load_dispatch_snapshot
 '''.split()
 
 not_specified = object()
@@ -44,9 +52,8 @@ def parse_sig(sig, gbls=None, lcls=None):
     lcls = gbls.copy()
     lcls['_parse_sig_func_'] = lambda *args, **kwds: (args,kwds)
     args,kwds = eval(co, gbls, lcls)
-    ast = py_compiler_parse(callstr, mode='eval')
-    kwds_order = [arg.name for arg in ast.node.args
-                  if isinstance(arg, AstKeyword)]
+    call = compile(callstr, '<string>', 'eval', PyCF_ONLY_AST).body
+    kwds_order = [kwd.arg for kwd in call.keywords]
     kwds = sorted(kwds.iteritems(),
                   key=lambda (name,_): kwds_order.index(name))
     return args, kwds
@@ -77,10 +84,8 @@ class MethodSignature(CachingBase):
     @classmethod
     def from_sig_string(cls, s):
         callstr = 'func(%s)' % (s,)
-        ast = py_compiler_parse(callstr, mode='eval')
-        kwds = [arg.name for arg in ast.node.args
-                if isinstance(arg, AstKeyword)]
-        return cls(len(ast.node.args) - len(kwds), kwds)
+        call = compile(callstr, '<string>', 'eval', PyCF_ONLY_AST).body
+        return cls(len(call.args), [kwd.arg for kwd in call.keywords])
 
     def __repr__(self):
         return '%s(%r, %r)' % (self.__class__.__name__,
@@ -269,6 +274,108 @@ def compile_around(mm, method, last_func):
 combination_compilers[around] = compile_around
 
 
+# # # # # # # # # # # # # # # # # #
+# generated method combinations   #
+# # # # # # # # # # # # # # # # # #
+# rather than nesting one generic wrapper per method, a sequence of
+# combined methods is flattened into a single generated function with
+# the arity of the multimethod's signature.  each combination type has
+# a role describing its place in the generated body:
+#   before  - called before the inner methods
+#   after   - called after the inner methods, innermost first
+#   only    - terminal; result is returned
+#   around  - terminal; called with the remaining combination as first argument
+#   reduce  - result is returned if not None, otherwise continue with next
+# combination types without a role fall back to combination_compilers
+
+combination_roles = {only:'only', before:'before', after:'after', around:'around'}
+
+combination_factories = {}
+
+def generate_combination_source(nargs, kwds, roles):
+    if kwds:
+        params = '*args, **kwds'
+    else:
+        params = ', '.join('a%d' % i for i in xrange(nargs))
+    call = lambda i, pre='': 'f%d(%s%s)' % (i, pre, params)
+    acc = ['def make_combination(inner, %s):' % ', '.join('f%d' % i for i in xrange(len(roles))),
+           '    def combination(%s):' % params]
+    afters = []
+    computing = False
+    for i,role in enumerate(roles):
+        if role == 'before':
+            acc.append('        ' + call(i))
+        elif role == 'after':
+            afters.insert(0, i)
+        else:
+            value = call(i, 'inner, ' if role == 'around' else '')
+            if computing:
+                acc.extend(['        if op is None:',
+                            '            op = ' + value])
+            else:
+                acc.append('        op = ' + value)
+            computing = True
+    acc.extend('        ' + call(i) for i in afters)
+    acc.extend(['        return op',
+                '    return combination'])
+    return '\n'.join(acc) + '\n'
+
+def get_combination_factory(nargs, kwds, roles):
+    shape = nargs, bool(kwds), roles
+    try:
+        return combination_factories[shape]
+    except KeyError:
+        pass
+    source = generate_combination_source(*shape)
+    ns = {}
+    exec compile(source, '<combination %s>' % ','.join(roles), 'exec') in ns
+    factory = combination_factories[shape] = ns['make_combination']
+    return factory
+
+def split_combination_segment(roles):
+    '''length of the leading segment of roles that can be generated as one
+       function; befores and afters, then reductions, then a terminal.
+       returns None when the segment has another layout
+    '''
+    reducing = False
+    for i,role in enumerate(roles):
+        if role in ('only', 'around'):
+            return i+1
+        elif role == 'reduce':
+            reducing = True
+        elif reducing:
+            return None
+    return len(roles) if reducing else None
+
+def generate_method_combination(mm, methods, roles):
+    n = split_combination_segment(roles)
+    if n is None:
+        return compile_method_combination(mm, methods)
+    if n == 1 and roles[0] != 'around':
+        return methods[0].func
+    inner = None
+    if roles[n-1] == 'around':
+        inner = generate_method_combination(mm, methods[n:], roles[n:])
+    signature = mm.signature
+    factory = get_combination_factory(signature.nargs, signature.kwds, tuple(roles[:n]))
+    func = factory(inner, *[method.func for method in methods[:n]])
+    func.func_name = mm.name
+    return func
+
+def compile_method_combination(mm, methods):
+    '''generic method combination, nesting a wrapper per method
+    '''
+    last_func = None
+    for method in reversed(list(methods)):
+        try:
+            compiler = combination_compilers[method.combination]
+        except KeyError:
+            raise RuntimeError("unhandled combination %s" % method.combination)
+        else:
+            last_func = compiler(mm, method, last_func)
+    return last_func
+
+
 # # # # # # # # #
 # multimethods  #
 # # # # # # # # #
@@ -320,6 +427,183 @@ class NoSuchMethod(MultiMethodError):
         return str(self)
 
 
+# # # # # # #
+# call caches #
+# # # # # # # #
+
+class CallCache(dict):
+    '''call cache of a multimethod; maps call keys to effective methods
+       when bounded to maxsize entries, the least recently used entries
+       are evicted.  misses, evictions and uncacheable (unhashable) calls
+       are always counted.  hits are only counted when the cache is tracked,
+       that is bounded or keeping statistics, so that untracked hits cost
+       no more than a dict lookup
+    '''
+
+    def __init__(self, maxsize=None, stats=False):
+        dict.__init__(self)
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("bad call cache size %r" % (maxsize,))
+        self.maxsize = maxsize
+        self.stats = stats
+        self.tracked = bool(stats) or maxsize is not None
+        self.stamps = {} if maxsize is not None else None
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncacheable = 0
+
+    def touch(self, key):
+        self.hits += 1
+        if self.stamps is not None:
+            self.clock += 1
+            self.stamps[key] = self.clock
+
+    def fill(self, key, func):
+        self.misses += 1
+        return self.store(key, func)
+
+    def store(self, key, func):
+        if self.stamps is not None:
+            if len(self) >= self.maxsize:
+                #drop the least recently used quarter in one go
+                self.evict(len(self) - self.maxsize + max(1, self.maxsize // 4))
+            self.clock += 1
+            self.stamps[key] = self.clock
+        self[key] = func
+        return func
+
+    def evict(self, n):
+        stamps = self.stamps
+        for key in sorted(stamps, key=stamps.__getitem__)[:n]:
+            del self[key]
+            del stamps[key]
+        self.evictions += n
+
+    def discard(self, keys):
+        for key in keys:
+            del self[key]
+            if self.stamps is not None:
+                del self.stamps[key]
+
+    def clear(self):
+        dict.clear(self)
+        if self.stamps is not None:
+            self.stamps.clear()
+
+    def info(self):
+        return dict(hits=self.hits if self.tracked else None,
+                    misses=self.misses,
+                    evictions=self.evictions,
+                    uncacheable=self.uncacheable,
+                    size=len(self),
+                    maxsize=self.maxsize)
+
+
+# # # # # # # # # # #
+# compiled dispatch #
+# # # # # # # # # # #
+# generate a dispatch function specialized to the number of arguments
+# and the shape of the type keyers of a multimethod.  handles the common
+# case of calls with exactly the required positional arguments; all
+# other calls go through the generic path.  source is generated once per
+# shape and the resulting factory is closed over each multimethod's keyers,
+# call cache and calculate_method.
+# when the key only varies by the class of a single argument (ie. all methods
+# dispatch on one argument with IsInstanceType) the cache is keyed directly on
+# that class, as with single dispatch
+
+dispatch_factories = {}
+
+def keyer_kind(keyer):
+    if keyer is type:
+        return 'type'
+    if keyer is noop:
+        return 'noop'
+    if keyer is identity:
+        return 'identity'
+    return 'call'
+
+def key_expression(kind, i, arg):
+    if kind == 'type':
+        return 'type(%s)' % arg
+    if kind == 'noop':
+        return 'None'
+    if kind == 'identity':
+        return arg
+    return 'k%d(%s)' % (i, arg)
+
+def single_dispatch_index(nargs, kinds):
+    '''index of the only argument that varies the call key when it
+       is keyed by class, otherwise None
+    '''
+    varying = [i for i,kind in enumerate(kinds[:nargs]) if kind != 'noop']
+    if len(varying) == 1 and kinds[varying[0]] == 'type':
+        return varying[0]
+    return None
+
+def generate_dispatch_factory_source(nargs, nkwds, kinds, cache_mode):
+    '''cache_mode is one of None (no cache), 'plain' or 'tracked'
+    '''
+    args = ', '.join('a%d' % i for i in xrange(nargs))
+    keys = [key_expression(kind, i, 'a%d' % i)
+            for i,kind in enumerate(kinds[:nargs])]
+    keys.extend(['not_specified'] * nkwds)
+    acc = ['def make_dispatch(cache, calculate_method, %s):' %
+           ''.join('k%d, ' % i for i in xrange(len(kinds))),
+           '    def dispatch(%s):' % args]
+    single = single_dispatch_index(nargs, kinds)
+    if cache_mode is None:
+        acc.extend(['        key = (%s)' % ''.join('%s, ' % key for key in keys),
+                    '        func = calculate_method(key)'])
+    else:
+        if single is not None:
+            keys[single] = key = 'tp'
+            acc.append('        tp = type(a%d)' % single)
+        else:
+            key = 'key'
+            acc.append('        key = (%s)' % ''.join('%s, ' % key for key in keys))
+        acc.extend(['        try:',
+                    '            func = cache[%s]' % key,
+                    '        except KeyError:',
+                    '            func = cache.fill(%s, calculate_method((%s)))' %
+                    (key, ''.join('%s, ' % key for key in keys))])
+        if single is None and set(kinds[:nargs]) - set(['type','noop']):
+            acc.extend(['        except TypeError:',
+                        '            #unhashable key, go direct',
+                        '            cache.uncacheable += 1',
+                        '            func = calculate_method(key)'])
+        if cache_mode == 'tracked':
+            acc.extend(['        else:',
+                        '            cache.touch(%s)' % key])
+    acc.extend(['        return func(%s)' % args,
+                '    return dispatch'])
+    return '\n'.join(acc) + '\n'
+
+def get_dispatch_factory(nargs, nkwds, kinds, cache_mode):
+    shape = nargs, nkwds, kinds, cache_mode
+    try:
+        return dispatch_factories[shape]
+    except KeyError:
+        pass
+    source = generate_dispatch_factory_source(*shape)
+    ns = dict(type=type, not_specified=not_specified)
+    exec compile(source, '<dispatch %d/%d %s>' % (nargs, nkwds, ','.join(kinds)), 'exec') in ns
+    factory = dispatch_factories[shape] = ns['make_dispatch']
+    return factory
+
+def compile_dispatch(mm):
+    signature = mm.signature
+    kinds = tuple(map(keyer_kind, mm.type_keyers))
+    cache = mm.callcache
+    cache_mode = None if cache is None else 'tracked' if cache.tracked else 'plain'
+    factory = get_dispatch_factory(signature.nargs, len(signature.kwds), kinds, cache_mode)
+    dispatch = factory(mm.callcache, mm.calculate_method, *mm.type_keyers)
+    dispatch.func_name = mm.name
+    return dispatch
+
+
 def score_call_vector(scorers, call_key):
     acc = []
     for scorer,key in zip(scorers, call_key):
@@ -333,12 +617,21 @@ def score_call_vector(scorers, call_key):
     #print 'score',self.type_sig,score
     return acc
 
+#all live multimethods, such that dispatch can be reset when profiling
+all_multimethods = WeakSet()
+
 class MultiMethod(object):
     '''
     '''
 
+    #use generated dispatch functions for positional calls
+    compiled_dispatch = True
+    #active DispatchProfiler; all calls take the generic path when profiling
+    profiler = None
+
     def __init__(self, name='<multilambda>', doc='', signature=None,
-                 default_combination=None, cache=True, inherit_from=()):
+                 default_combination=None, cache=True, inherit_from=(),
+                 cache_size=None, cache_stats=False):
         self.name = name
         self.doc = doc
         self.methods = []
@@ -349,7 +642,14 @@ class MultiMethod(object):
         self.type_keyers = None
         self.all_methods = None
         self.scorers = {}
-        self.callcache = dict() if cache else None
+        self.callcache = CallCache(cache_size, cache_stats) if cache else None
+        #keyers used to build the keys currently in callcache
+        self.cache_keyers = None
+        #methods registered since keys were built; None when all keys are stale
+        self.stale_methods = []
+        self.dispatch = None
+        self.dispatch_nargs = None
+        all_multimethods.add(self)
         for i_f in inherit_from:
             self.inherit_from(i_f)
 
@@ -357,39 +657,78 @@ class MultiMethod(object):
         return '%s%s' % (self.name, self.signature if self.signature else '<unspecified>')
 
     def __call__(self, *args, **kwds):
+        if kwds or len(args) != self.dispatch_nargs:
+            return self.generic_call(args, kwds)
+        return self.dispatch(*args)
+
+    def generic_call(self, args, kwds):
+        if self.profiler is not None:
+            return self.profiler.profile_call(self, args, kwds)
+        self.prepare()
+        if self.dispatch is None and self.compiled_dispatch:
+            self.dispatch = compile_dispatch(self)
+            self.dispatch_nargs = self.signature.nargs
+            if not kwds and len(args) == self.dispatch_nargs:
+                return self.dispatch(*args)
+        call_vector, call_key = self.make_call_key(args, kwds)
+        return self.signature.perform_call(call_vector, self.lookup_method(call_key))
+
+    def prepare(self):
         if not self.type_keyers:
             self.build_type_keys()
         self.get_signature()
+
+    def make_call_key(self, args, kwds):
         try:
             call_vector = self.signature.partition_call_vector(args, kwds)
         except InvalidCallArguments,e:
             raise InvalidMethodArguments(self, e.given_sig)
-        call_key = self.signature.as_types_of_call_vector(call_vector, self.type_keyers, not_specified)
+        return call_vector, self.signature.as_types_of_call_vector(call_vector, self.type_keyers,
+                                                                   not_specified)
+
+    def lookup_method(self, call_key):
+        cache = self.callcache
+        if cache is None:
+            return self.calculate_method(call_key)
+        try:
+            func = cache[call_key]
+        except KeyError:
+            return cache.fill(call_key, self.calculate_method(call_key))
+        except TypeError:
+            #unhashable key, go direct
+            cache.uncacheable += 1
+            return self.calculate_method(call_key)
+        if cache.tracked:
+            cache.touch(call_key)
+        return func
+
+    def set_cache_policy(self, cache=True, size=None, stats=False):
+        '''replace the call cache; size bounds the number of entries
+           and stats enables counting of hits
+        '''
+        self.callcache = CallCache(size, stats) if cache else None
+        self.invalidate()
+
+    def cache_info(self):
+        '''statistics of the call cache, or None when not caching
+        '''
         if self.callcache is None:
-            func = self.calculate_method(call_key)
-        else:
-            try:
-                func = self.callcache[call_key]
-            except KeyError:
-                func = self.callcache[call_key] = self.calculate_method(call_key)
-            except TypeError:
-                #unhashable key, go direct
-                func = self.calculate_method(call_key)
-        return self.signature.perform_call(call_vector, func)
+            return None
+        return self.callcache.info()
 
     inherts_from_port = None
     inherts_to_port = None
     def inherit_from(self, parent):
         if self.inherts_from_port is None:
-            from jamenson.runtime.ports import PortList, connect
+            from jamenson.runtime.ports import PortList
             self.inherts_from_port = PortList(self)
         parent.inherts_to(self)
 
     def inherts_to(self, child):
-        from jamenson.runtime.ports import PortList, connect
+        from jamenson.runtime.ports import PortList
         if self.inherts_to_port is None:
             self.inherts_to_port = PortList(self)
-        connect(self.inherts_to_port, child.inherts_from_port)
+        self.inherts_to_port.connect(child.inherts_from_port)
 
     def register_method(self, typesig, func, combination):
         methsig = typesig.calculate_method_signature()
@@ -397,18 +736,52 @@ class MultiMethod(object):
             self.signature = methsig
         elif methsig is not self.signature:
             raise InconsistenCallSignature(self, methsig)
-        self.methods.append(Method(typesig, func, combination))
-        self.invalidate()
-
-    def invalidate(self):
-        if self.callcache:
-            self.callcache.clear()
+        method = Method(typesig, func, combination)
+        self.methods.append(method)
+        self.invalidate(method)
+
+    def invalidate(self, method=None):
+        '''forget dispatch state.  when invalidating for a newly
+           registered method, only cached calls to which that method
+           may apply are dropped, once keys are rebuilt
+        '''
+        self.dispatch = None
+        self.dispatch_nargs = None
+        if method is None:
+            self.stale_methods = None
+        elif self.stale_methods is not None:
+            self.stale_methods.append(method)
         self.type_keyers = None
         self.all_methods = None
         if self.inherts_to_port:
-            from jamenson.runtime.ports import get_cells
-            for child in get_cells(self.inherts_to_port):
-                child.invalidate()
+            for child in self.inherts_to_port.get_cells():
+                child.invalidate(method)
+
+    def refresh_callcache(self):
+        stale, self.stale_methods = self.stale_methods, []
+        cache = self.callcache
+        if not cache:
+            pass
+        elif stale is None or self.cache_keyers != self.type_keyers:
+            cache.clear()
+        elif stale:
+            meths_scorers = [self.scorers[meth] for meth in stale]
+            single = single_dispatch_index(self.get_signature().nargs,
+                                           map(keyer_kind, self.type_keyers))
+            def applies(key):
+                for scorers in meths_scorers:
+                    try:
+                        if isinstance(key, tuple):
+                            score = score_call_vector(scorers, key)
+                        else:
+                            score = scorers[single](key)
+                    except Exception:
+                        return True
+                    if score is not no_score:
+                        return True
+                return False
+            cache.discard([key for key in cache.keys() if applies(key)])
+        self.cache_keyers = self.type_keyers
 
     def build_type_keys(self):
         self.all_methods = self.get_all_methods()
@@ -420,13 +793,13 @@ class MultiMethod(object):
         meths_scorers = zip(*scorers)
         for method,meth_scorers in zip(self.all_methods, meths_scorers):
             self.scorers[method] = meth_scorers
+        self.refresh_callcache()
 
     def get_signature(self):
         if self.signature is None:
             if self.inherts_from_port is None:
                 raise RuntimeError("no methods defined")
-            from jamenson.runtime.ports import get_cells
-            for parent in get_cells(self.inherts_from_port):
+            for parent in self.inherts_from_port.get_cells():
                 if self.signature is None:
                     self.signature = parent.get_signature()
                 elif self.signature is not parent.signature:
@@ -438,23 +811,28 @@ class MultiMethod(object):
             return self.all_methods
         meths = self.methods
         if self.inherts_from_port is not None:
-            from jamenson.runtime.ports import get_cells
-            for parent in get_cells(self.inherts_from_port):
+            for parent in self.inherts_from_port.get_cells():
                 meths = parent.get_all_methods() + meths
         self.all_methods = meths
         return meths
 
     def calculate_method(self, call_key):
+        methods = self.select_methods(call_key)
+        if not methods:
+            return self.no_applicable_methods_call(call_key)
+        return self.build_method_combination(methods)
+
+    def select_methods(self, call_key):
+        '''applicable methods for a call key, in order of combination
+        '''
         applicable_methods = []
         for meth in self.all_methods:
             score = score_call_vector(self.scorers[meth], call_key)
             if score is not no_score:
                 applicable_methods.append([meth,score])
-        if not applicable_methods:
-            return self.no_applicable_methods_call(call_key)
         applicable_methods.reverse()
         applicable_methods.sort(key=lambda (meth,score): score) #rellies on Python's stable sorts
-        return self.build_method_combination(meth for meth,score in applicable_methods)
+        return [meth for meth,score in applicable_methods]
 
     def no_applicable_methods_call(self, call_key):
         call_sig = self.signature.perform_call(call_key, CallSignature.from_call)
@@ -464,17 +842,328 @@ class MultiMethod(object):
         return wrapper
 
     def build_method_combination(self, methods):
-        last_func = None
-        for method in reversed(list(methods)):
-            try:
-                compiler = combination_compilers[method.combination]
-            except KeyError:
-                raise RuntimeError("unhandled combination %s" % method.combination)
+        methods = list(methods)
+        roles = [combination_roles.get(method.combination) for method in methods]
+        if None in roles:
+            return compile_method_combination(self, methods)
+        if roles[-1] in ('before', 'after', 'around'):
+            missing_inner(self, methods[-1])
+        return generate_method_combination(self, methods, roles)
+
+
+# # # # # # # # # # # #
+# dispatch profiling  #
+# # # # # # # # # # # #
+# when profiling, multimethods forgo compiled dispatch and every call
+# is recorded through the active profiler.  no cost when not profiling
+
+class DispatchStats(object):
+
+    def __init__(self, mm):
+        self.mm = mm
+        self.calls = 0
+        self.hits = 0
+        self.misses = 0
+        self.calculate_time = 0.0
+        #cumulative time of outermost calls, such that recursion isn't counted twice
+        self.time = 0.0
+        self.active = 0
+        #effective method -> [calls, inclusive time]
+        self.methods = {}
+
+    @property
+    def hit_ratio(self):
+        return float(self.hits) / self.calls if self.calls else 0.0
+
+
+class DispatchProfiler(object):
+
+    def __init__(self):
+        self.stats = {}
+
+    def get_stats(self, mm):
+        try:
+            return self.stats[mm]
+        except KeyError:
+            stats = self.stats[mm] = DispatchStats(mm)
+            return stats
+
+    def profile_call(self, mm, args, kwds):
+        stats = self.get_stats(mm)
+        stats.calls += 1
+        stats.active += 1
+        start = clock()
+        try:
+            mm.prepare()
+            call_vector, call_key = mm.make_call_key(args, kwds)
+            cache = mm.callcache
+            if cache is not None:
+                misses = cache.misses + cache.uncacheable
+            lookup_start = clock()
+            func = mm.lookup_method(call_key)
+            method_start = clock()
+            if cache is None or cache.misses + cache.uncacheable != misses:
+                stats.misses += 1
+                stats.calculate_time += method_start - lookup_start
             else:
-                last_func = compiler(self, method, last_func)
-        #last_func.func_name = self.name
-        #last_func.func_doc = self.doc
-        return last_func
+                stats.hits += 1
+            try:
+                return mm.signature.perform_call(call_vector, func)
+            finally:
+                try:
+                    meth_stats = stats.methods[func]
+                except KeyError:
+                    meth_stats = stats.methods[func] = [0, 0.0]
+                meth_stats[0] += 1
+                meth_stats[1] += clock() - method_start
+        finally:
+            stats.active -= 1
+            if not stats.active:
+                stats.time += clock() - start
+
+    def report(self, fp=None, limit=20, methods_limit=3):
+        '''print the multimethods with the greatest cumulative time
+        '''
+        if fp is None:
+            fp = sys.stdout
+        print >>fp, '%-40s %9s %6s %10s %10s' % ('multimethod', 'calls', 'hits',
+                                                 'calculate', 'cumulative')
+        all_stats = sorted(self.stats.itervalues(), key=lambda stats: stats.time, reverse=True)
+        for stats in all_stats[:limit]:
+            print >>fp, '%-40s %9d %5.1f%% %9.4fs %9.4fs' % (
+                str(stats.mm.name)[:40], stats.calls, 100.0 * stats.hit_ratio,
+                stats.calculate_time, stats.time)
+            methods = sorted(stats.methods.iteritems(), key=lambda (func,(calls,tm)): tm,
+                             reverse=True)
+            for func,(calls,tm) in methods[:methods_limit]:
+                print >>fp, '    %-36s %9d %17s %9.4fs' % (describe_method(func)[:36], calls, '', tm)
+
+def describe_method(func):
+    try:
+        code = func.func_code
+    except AttributeError:
+        return repr(func)
+    return '%s %s:%d' % (func.func_name, code.co_filename.rsplit('/',1)[-1],
+                         code.co_firstlineno)
+
+def reset_all_dispatch():
+    for mm in list(all_multimethods):
+        mm.dispatch = None
+        mm.dispatch_nargs = None
+
+last_dispatch_profiler = None
+
+def start_dispatch_profiling():
+    '''record dispatch statistics of all multimethods until stopped
+    '''
+    global last_dispatch_profiler
+    profiler = last_dispatch_profiler = MultiMethod.profiler = DispatchProfiler()
+    reset_all_dispatch()
+    return profiler
+
+def stop_dispatch_profiling():
+    profiler = MultiMethod.profiler
+    MultiMethod.profiler = None
+    reset_all_dispatch()
+    return profiler
+
+def report_dispatch_profile(fp=None, limit=20):
+    '''report for the active, or most recently stopped, dispatch profiler
+    '''
+    profiler = MultiMethod.profiler or last_dispatch_profiler
+    if profiler is None:
+        raise MultiMethodError("dispatch profiling not started")
+    profiler.report(fp, limit)
+
+
+# # # # # # # # # # # #
+# dispatch snapshots  #
+# # # # # # # # # # # #
+# resolved call caches are saved as the indices of the methods selected
+# for each call key.  keyers, scorers and effective methods are functions,
+# so are rebuilt when loading; only the scoring of methods is saved.
+# a multimethod is matched by name and a digest of its methods, each
+# entry by the class hierarchies of its key.  anything that doesn't
+# match is left to be resolved on first call.  only keys of classes and
+# literals are saved, as loading other objects can have side effects
+# (e.g. symbols are interned).  modules used only for snapshots are
+# imported when needed, to keep them out of startup
+
+dispatch_snapshot_version = 2
+
+class_types = type, ClassType
+literal_types = bool, int, long, float, str, unicode
+
+def describe_type_sig(type_sig):
+    #members of unions print in hash order, which varies between processes
+    return ' '.join(sorted(re.findall(r'[^(),\s]+', str(type_sig))))
+
+def describe_method_set(mm):
+    acc = [mm.name, repr(mm.get_signature())]
+    for meth in mm.get_all_methods():
+        acc.append('%s %s %s %s' % (meth.combination, describe_type_sig(meth.type_sig),
+                                    getattr(meth.func, '__module__', None),
+                                    describe_method(meth.func)))
+    return '\n'.join(acc)
+
+def method_set_digest(mm):
+    '''digest of a multimethod's methods, or None when they can't be
+       described the same way in another process
+    '''
+    from hashlib import md5
+    desc = describe_method_set(mm)
+    if ' at 0x' in desc:
+        return None
+    return md5(desc).hexdigest()
+
+def class_mro(cls, acc=None):
+    #as inspect.getmro, which is slow to import
+    try:
+        return cls.__mro__
+    except AttributeError:
+        #classic classes
+        if acc is None:
+            acc = []
+        if cls not in acc:
+            acc.append(cls)
+            for base in cls.__bases__:
+                class_mro(base, acc)
+        return acc
+
+def describe_key_classes(key):
+    if not isinstance(key, tuple):
+        key = key,
+    return tuple(' '.join('%s.%s' % (cls.__module__, cls.__name__) for cls in class_mro(k))
+                 for k in key if isinstance(k, class_types))
+
+def snapshot_keyp(key):
+    if isinstance(key, tuple):
+        return all(map(snapshot_keyp, key))
+    return key is None or isinstance(key, class_types) or isinstance(key, literal_types)
+
+def expand_call_key(mm, key):
+    '''full call key for a key of single dispatch, which is only the class
+    '''
+    if isinstance(key, tuple):
+        return key
+    signature = mm.signature
+    call_key = [None] * signature.nargs + [not_specified] * len(signature.kwds)
+    call_key[single_dispatch_index(signature.nargs, map(keyer_kind, mm.type_keyers))] = key
+    return tuple(call_key)
+
+def snapshot_entries(mm):
+    from cPickle import dumps, HIGHEST_PROTOCOL
+    index = dict((meth,i) for i,meth in enumerate(mm.all_methods))
+    acc = []
+    for key in mm.callcache.keys():
+        methods = mm.select_methods(expand_call_key(mm, key))
+        if not methods:
+            continue
+        if isinstance(key, tuple):
+            unspecified = tuple(i for i,k in enumerate(key) if k is not_specified)
+            key = tuple(None if k is not_specified else k for k in key)
+        else:
+            unspecified = ()
+        if not snapshot_keyp(key):
+            continue
+        try:
+            acc.append(dumps((key, unspecified, [index[meth] for meth in methods],
+                              describe_key_classes(key)), HIGHEST_PROTOCOL))
+        except Exception:
+            #classes that can't be found by name
+            continue
+    return acc
+
+def snapshot_multimethods(multimethods):
+    by_ident = {}
+    for mm in multimethods:
+        if mm.callcache and mm.type_keyers:
+            by_ident.setdefault((mm.name, method_set_digest(mm)), []).append(mm)
+    return dict((ident, mms[0]) for ident,mms in by_ident.iteritems()
+                if ident[1] is not None and len(mms) == 1)
+
+def collect_dispatch_snapshot(multimethods=None):
+    '''snapshot of the resolved call caches of multimethods, by default
+       all live multimethods, as saved by save_dispatch_snapshot
+    '''
+    if multimethods is None:
+        multimethods = list(all_multimethods)
+    snapshot = {}
+    for ident,mm in snapshot_multimethods(multimethods).iteritems():
+        entries = snapshot_entries(mm)
+        if entries:
+            snapshot[ident] = entries
+    return snapshot
+
+def merge_dispatch_snapshot(snapshot, other):
+    for ident,entries in other.iteritems():
+        acc = snapshot.setdefault(ident, [])
+        seen = set(acc)
+        for entry in entries:
+            if entry not in seen:
+                seen.add(entry)
+                acc.append(entry)
+
+def save_dispatch_snapshot(path, multimethods=None, merge=()):
+    '''save the resolved call caches of multimethods, by default all
+       live multimethods, to path, along with the entries of snapshots in
+       merge (e.g. collected in worker processes).  returns the number
+       of entries saved
+    '''
+    from cPickle import dump, HIGHEST_PROTOCOL
+    from jamenson.runtime.tempfile import temp_file_proxy
+    snapshot = collect_dispatch_snapshot(multimethods)
+    for other in merge:
+        merge_dispatch_snapshot(snapshot, other)
+    with temp_file_proxy(path, 'wb') as fp:
+        dump((dispatch_snapshot_version, snapshot), fp, HIGHEST_PROTOCOL)
+    return sum(map(len, snapshot.itervalues()))
+
+def load_dispatch_snapshot(path, multimethods=None):
+    '''fill the call caches of multimethods, by default all live
+       multimethods, from a snapshot saved by save_dispatch_snapshot.
+       returns the number of entries restored, which is 0 when the
+       snapshot doesn't exist or is of another version
+    '''
+    from cPickle import load, loads
+    try:
+        with open(path, 'rb') as fp:
+            version, snapshot = load(fp)
+    except Exception:
+        #only a cache, start cold
+        return 0
+    if version != dispatch_snapshot_version:
+        return 0
+    if multimethods is None:
+        multimethods = list(all_multimethods)
+    #only multimethods named in the snapshot are digested
+    names = set(name for name,digest in snapshot)
+    count = 0
+    for mm in multimethods:
+        if mm.name not in names or mm.callcache is None or not mm.get_all_methods():
+            continue
+        entries = snapshot.get((mm.name, method_set_digest(mm)))
+        if not entries:
+            continue
+        mm.prepare()
+        cache = mm.callcache
+        methods = mm.all_methods
+        for entry in entries:
+            try:
+                key, unspecified, indices, classes = loads(entry)
+            except Exception:
+                continue
+            if describe_key_classes(key) != classes:
+                continue
+            if unspecified:
+                key = list(key)
+                for i in unspecified:
+                    key[i] = not_specified
+                key = tuple(key)
+            if key not in cache:
+                cache.store(key, mm.build_method_combination(methods[i] for i in indices))
+                count += 1
+    return count
 
 
 def defmethod(mm, sig, combination=None, ns=None):
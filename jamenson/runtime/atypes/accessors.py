@@ -11,6 +11,7 @@ from .common import worst_score, best_score, no_score
 from ..atypes import (as_type, as_string, eq_types, hash_type, as_type,
                       TypeBase, anytype, notanytype,
                       complement, union, intersection, optimize_type, typep,
+                      compile_type, predicate_expression, TypePredicateBuilder,
                       defunionreduce, defintersectionreduce,
                       get_type_keyer, get_key_scorer, keyer_getfunc,
                       instance_keyer, flatten_type_key,
@@ -186,6 +187,20 @@ def meth(op, a):
 def meth(op, i):
     return typep(op[i.item], i.inner)
 
+@defmethod(predicate_expression, [HasAttr, TypePredicateBuilder, str])
+def meth(ha, builder, arg):
+    return 'hasattr(%s, %s)' % (arg, builder.constant(ha.attrname))
+
+@defmethod(predicate_expression, [Attr, TypePredicateBuilder, str])
+def meth(a, builder, arg):
+    return '%s(getattr(%s, %s))' % (builder.constant(compile_type(a.inner)), arg,
+                                    builder.constant(a.attrname))
+
+@defmethod(predicate_expression, [Item, TypePredicateBuilder, str])
+def meth(i, builder, arg):
+    return '%s(%s[%s])' % (builder.constant(compile_type(i.inner)), arg,
+                           builder.constant(i.item))
+
 
 # # # # # # # #
 # Keyer Types #
@@ -37,12 +37,10 @@ def bootstrap():
     from ..util import strtime
 
     # Preload following modules so their time isn't included in load time below
-    import compiler
-    import compiler.ast
     from .. import bases
     from .. import collections
     from . import common
-    del compiler, bases, collections, common
+    del bases, collections, common
 
     # Module names used in bootstrapping process
     base_name = 'jamenson.runtime'
@@ -9,8 +9,21 @@ bsclasses_names_spaces = globals()
 
 from ..collections import OrderedDict, OrderedSet
 
+class InternedTypeClass(type):
+    '''class of types whose instances are hash-consed on construction
+    '''
+
+    def __call__(cls, *args, **kwds):
+        return intern_type(type.__call__(cls, *args, **kwds))
+
+def intern_type(tp):
+    #replaced by atypes, once types can be compared
+    return tp
+
 class TypeBase(object):
 
+    __metaclass__ = InternedTypeClass
+
     def __invert__(self):
         return complement(self)
 
@@ -37,11 +50,17 @@ class TypeBase(object):
             return NotImplemented
 
     def __hash__(self):
-        return hash_type(self)
+        try:
+            #cached for interned types
+            return self._type_hash
+        except AttributeError:
+            return hash_type(self)
 
     def __getstate__(self):
         if not hasattr(self, '__slots__'):
-            return vars(self)
+            state = dict(vars(self))
+            state.pop('_type_hash', None)
+            return state
         return [getattr(self, name) for name in self.__slots__]
 
     def __setstate__(self, state):
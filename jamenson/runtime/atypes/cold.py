@@ -40,7 +40,10 @@ def score_type(tp, key):
         except ValueError:
             continue
         except TypeError:
-            score = best_score if issubclass(x, key) else no_score
+            if x is type and issubclass(key, x):
+                score = best_score
+            else:
+                score = best_score if issubclass(x, key) else no_score
         if acc is no_score:
             acc = score
         else:
@@ -11,10 +11,12 @@ from ..multimethod import MultiMethod, defmethod, defboth_wrapper, around
 from .common import worst_score, best_score, no_score
 from ..atypes import (as_type, as_string, eq_types,
                       IsInstanceType, union, optimize_type, typep,
+                      compile_type, predicate_expression, TypePredicateBuilder,
                       TypeBase, JoinBase, OneOf, KeyerBase, hash_type,
                       defeq, defunion2, union_two, union_pair_reduce,
                       combine_join_reduce, combinate_reduce_join,
-                      defunionreduce, TypeKeyerType,
+                      TypeCacheMultiMethod, reduce_equal, bulk_join_reducers,
+                      defunionreduce, TypeKeyerType, strict_constants,
                       get_type_keyer, get_key_scorer, keyer_getfunc,
                       flatten_keyer, flatten_type_key,
                       score_worst, score_none)
@@ -123,6 +125,12 @@ def meth(a,b):
 def meth(op):
     return hash(id(op.op)) ^ 0x5f5b9f1
 
+@defmethod(eq_types, [EqType,EqType])
+def meth(a,b):
+    if strict_constants.enabled and type(a.op) is not type(b.op):
+        return False
+    return a.op == b.op
+
 @defmethod(hash_type, [EqType])
 def meth(op):
     try:
@@ -141,7 +149,11 @@ def meth(op):
 
 @defeq('MemberType,MemberType')
 def meth(a,b):
-    return a.elements == b.elements
+    if a.elements != b.elements:
+        return False
+    return (not strict_constants.enabled or
+            set((type(el), el) for el in a.elements) ==
+            set((type(el), el) for el in b.elements))
 
 
 @defmethod(as_string, [Predicate])
@@ -195,10 +207,10 @@ defmethod(as_type, [type(lambda : 1)])(Predicate)
 # Algebric Operations #
 # # # # # # # # # # # #
 
-complement = MultiMethod(name='complement',
-                         signature='TypeBase',
-                         doc='''calculates the complment (inverse) of a type
-                         ''')
+complement = TypeCacheMultiMethod(name='complement',
+                                  signature='TypeBase',
+                                  doc='''calculates the complment (inverse) of a type
+                                  ''')
 
 @defmethod(complement, [anytype])
 def meth(op):
@@ -234,10 +246,10 @@ def meth(a,b):
     return OneOf(a.inners | b.inners)
 
 
-intersection_two = MultiMethod(name='intersection_two',
-                               signature='TypeBase,TypeBase',
-                               doc='''calculates the intersection of two types
-                               ''')
+intersection_two = TypeCacheMultiMethod(name='intersection_two',
+                                        signature='TypeBase,TypeBase',
+                                        doc='''calculates the intersection of two types
+                                        ''')
 
 def intersection(*inners):
     '''intersection of all types, this is optimized by by optimize_type
@@ -309,7 +321,7 @@ def meth(callnext, op):
 # Join Reduction  #
 # # # # # # # # # #
 
-intersection_pair_reduce = MultiMethod('intersection_pair_reduce',
+intersection_pair_reduce = TypeCacheMultiMethod('intersection_pair_reduce',
                                 doc='''
                                 reduce sets of elements in intersections by
                                 pairwise reduction
@@ -355,11 +367,7 @@ def meth(callnext, op):
 # pairwise reduction of join pairs  #
 # # # # # # # # # # # # # # # # # # #
 
-@defintersectionreduce([TypeBase, TypeBase])
-def meth(a,b):
-    if eq_types(a,b):
-        return a
-    return None
+defintersectionreduce([TypeBase, TypeBase])(reduce_equal)
 
 @defunionreduce([_AnyType, TypeBase])
 def meth(a,t):
@@ -384,6 +392,14 @@ def meth(a,b):
         return notanytype
     return IsInstanceType(*t)
 
+def intersect_instance_types(tps):
+    t = set.intersection(*(tp.types for tp in tps))
+    if not t:
+        return notanytype
+    return IsInstanceType(*t)
+
+bulk_join_reducers[intersection_pair_reduce] = {IsInstanceType: intersect_instance_types}
+
 @defunionreduce([IsType, IsType])
 def meth(a,b):
     if a.op is b.op:
@@ -424,7 +440,7 @@ def meth(m,e):
 
 @defintersectionreduce([MemberType, EqType])
 def meth(m,e):
-    if e.op not in m:
+    if e.op not in m.elements:
         return notanytype
     return e
 
@@ -483,7 +499,7 @@ def meth(op, p):
 
 @defmethod(typep, [object, Invert])
 def meth(op, tp):
-    return not typep(op, tp)
+    return not typep(op, tp.inner)
 
 @defmethod(typep, [object, Seq])
 def meth(op, tp):
@@ -511,6 +527,59 @@ def meth(op, tp):
     return False
 
 
+# # # # # # # # # # # # #
+# compiled predicates   #
+# # # # # # # # # # # # #
+
+@defmethod(predicate_expression, [_AnyType, TypePredicateBuilder, str])
+def meth(tp, builder, arg):
+    return 'True'
+
+@defmethod(predicate_expression, [_NotAnyType, TypePredicateBuilder, str])
+def meth(tp, builder, arg):
+    return 'False'
+
+@defmethod(predicate_expression, [IsType, TypePredicateBuilder, str])
+def meth(tp, builder, arg):
+    return '(%s is %s)' % (arg, builder.constant(tp.op))
+
+@defmethod(predicate_expression, [EqType, TypePredicateBuilder, str])
+def meth(tp, builder, arg):
+    return '(%s == %s)' % (arg, builder.constant(tp.op))
+
+@defmethod(predicate_expression, [MemberType, TypePredicateBuilder, str])
+def meth(tp, builder, arg):
+    return '(%s in %s)' % (arg, builder.constant(tp.elements))
+
+@defmethod(predicate_expression, [Predicate, TypePredicateBuilder, str])
+def meth(tp, builder, arg):
+    return 'bool(%s(%s))' % (builder.constant(tp.func), arg)
+
+@defmethod(predicate_expression, [Invert, TypePredicateBuilder, str])
+def meth(tp, builder, arg):
+    return '(not %s)' % (builder.expression(tp.inner, arg),)
+
+def every_element(predicate, op):
+    try:
+        i = iter(op)
+    except (TypeError,ValueError,AttributeError):
+        return False
+    for el in i:
+        if not predicate(el):
+            return False
+    return True
+
+@defmethod(predicate_expression, [Seq, TypePredicateBuilder, str])
+def meth(tp, builder, arg):
+    return '%s(%s)' % (builder.constant(partial(every_element, compile_type(tp.inner))), arg)
+
+@defmethod(predicate_expression, [AllOf, TypePredicateBuilder, str])
+def meth(tp, builder, arg):
+    if not tp.inners:
+        return 'True'
+    return '(%s)' % ' and '.join(builder.expression(etp, arg) for etp in tp.inners)
+
+
 
 
 # # # # # # # #
@@ -3,10 +3,11 @@ from __future__ import absolute_import
 from __future__ import with_statement
 
 import __builtin__ as bltns
+from functools import partial
 
 from .symbol import (resolve_and_export_print_form, get_package,
                      get_symbol_package,
-                     get_sys_symbol, set_symbol_cell,
+                     get_sys_symbol, set_symbol_cell, export_lazy_symbol,
                      set_symbol_cell, get_symbol_cell,
                      packages,
                      symbolp, attributep,
@@ -14,11 +15,11 @@ from .symbol import (resolve_and_export_print_form, get_package,
 from .cons import register_special_form_emiter, format_cons_raw
 from .as_string import as_string, StringingMixin
 from .multimethod import defmethod
-from . import require
 from . import symbol
 from . import macro
 from . import cons
 from . import copy
+from .func import identity
 
 
 
@@ -84,21 +85,30 @@ builtin_extras = {
     'make-attr-getter' : make_attr_getter,
     'make-call-method' : make_call_method,
     'attr'             : attr,
-    'require'          : require.require,
     'obj'              : obj,
     'make-copy'        : copy.make_copy,
 }
 
+def get_require():
+    #require loads filepath and friends, only needed once code is loaded
+    from .require import require
+    return require
+
+lazy_builtin_extras = {
+    'require'          : get_require,
+}
+
 def get_builtin_symbol(name):
     return resolve_and_export_print_form(name, bltn_pkg)
 
 def setup():
+    #symbols are only interned and bound when first looked up
     for name in dir(bltns):
-        sym = get_builtin_symbol(name)
-        set_symbol_cell(sym, getattr(bltns, name))
+        export_lazy_symbol(name, partial(getattr, bltns, name), bltn_pkg)
     for name,value in builtin_extras.iteritems():
-        sym = get_builtin_symbol(name)
-        set_symbol_cell(sym, value)
+        export_lazy_symbol(name, partial(identity, value), bltn_pkg)
+    for name,get_value in lazy_builtin_extras.iteritems():
+        export_lazy_symbol(name, get_value, bltn_pkg)
 setup()
 
 def reset():
@@ -2,13 +2,19 @@
 from __future__ import with_statement
 
 import new
+from threading import local
+from operator import attrgetter
+from contextlib import contextmanager
 
 
 class CtxSingletonState(object):
 
     def __init__(self, ctx):
         self._cxs_ctx = ctx
-        self._cxs_super = super(self.__class__.mro()[0], self)
+
+    @property
+    def _cxs_super(self):
+        return super(self.__class__, self)
 
     @property
     def parent(self):
@@ -29,34 +35,58 @@ class CtxSingletonState(object):
     def __exit__(self, *exc_info):
         return self._cxs_ctx._cxs_exit_instance(self, exc_info)
 
+    def _cxs_resume(self):
+        '''context manager that pushes this very state, without copying,
+           and pops it again (still intact) on exit
+        '''
+        return self._cxs_ctx._cxs_resume_instance(self)
+
     def __call__(self, *args, **kwds):
         return self._cxs_copy(*args, **kwds)
 
     def _cxs_copy(self, **kwds):
-        cp = self.__class__(self._cxs_ctx)
-        for n,v in vars(self).iteritems():
-            if not (n.startswith('_cxs_') or (hasattr(self.__class__, n) and
-                                              getattr(self.__class__,n) == v)):
-                setattr(cp, n, v)
-        for n,v in kwds.iteritems():
-            setattr(cp, n, v)
+        cp = object.__new__(self.__class__)
+        #copies _cxs_ctx along with all fields
+        cp.__dict__.update(self.__dict__)
+        cp.__dict__.update(kwds)
         return cp
 
     def _cxs_delete(self):
-        vars(self).clear()
+        self.__dict__.clear()
+
+
+class CtxSingletonStack(local):
+    '''stack of states of a singleton within the current thread.
+       the thread creating the singleton starts from its root state and
+       all others from a copy of the root state, made on their first use
+    '''
+
+    def __init__(self, ctx):
+        self.stack = []
+        self.top = None
+        root = ctx.__dict__.get('_cxs_root')
+        if root is not None:
+            top = root._cxs_copy()
+            self.stack.append(top)
+            self.top = top
 
 
 class CtxSingletonBase(object):
 
+    __slots__ = ['_cxs_local', '__dict__']
+
     def __init__(self, singleton_state_cls):
         self._cxs_singleton_cls = singleton_state_cls
-        self._cxs_stack = []
-        #have to create _cxs_stack before calling _cxs_create_top
-        self._cxs_stack.append(self._cxs_singleton_cls._cxs_create_top(self))
+        self._cxs_local = CtxSingletonStack(self)
+        #have to create _cxs_local before calling _cxs_create_top
+        self._cxs_root = self._cxs_singleton_cls._cxs_create_top(self)
+        self._cxs_push(self._cxs_root)
+
+    top = property(attrgetter('_cxs_local.top'))
 
     @property
-    def top(self):
-        return self._cxs_stack[-1]
+    def _cxs_stack(self):
+        return self._cxs_local.stack
 
     @property
     def bottom(self):
@@ -75,22 +105,27 @@ class CtxSingletonBase(object):
 
     def _cxs_get_child(self, state):
         i = self._cxs_stack.index(state) + 1
-        None if i==len(self._cxs_stack) else self._cxs_stack[i]
+        return None if i==len(self._cxs_stack) else self._cxs_stack[i]
 
     def __getitem__(self, i):
         return self._cxs_stack[i]
 
     #map attributes to top state
+    #each attribute found through __getattr__ is then forwarded by a descriptor
+    #on the singleton class, such that further reads don't call into python
     def __getattr__(self, name):
         assert not name.startswith('_cxs_')
         assert not name.startswith('__')
-        return getattr(self.top, name)
+        value = getattr(self._cxs_local.top, name)
+        if '_cxs_singleton_cls' in vars(self.__class__):
+            setattr(self.__class__, name, property(attrgetter('_cxs_local.top.' + name)))
+        return value
 
     def __setattr__(self, name, value):
         if name.startswith('_cxs_'):
-            vars(self)[name] = value
+            object.__setattr__(self, name, value)
         else:
-            setattr(self.top, name, value)
+            setattr(self._cxs_local.top, name, value)
 
     #map context managment to default state when called on singleton
     #use top attribute to map to top state
@@ -98,7 +133,7 @@ class CtxSingletonBase(object):
         return self._cxs_enter_cls()
 
     def __exit__(self, *exc_info):
-        return self._cxs_exit_cls()
+        return self._cxs_exit_cls(exc_info)
 
     #map copying to default state when called on singleton
     #use top attribute to copy default
@@ -106,22 +141,49 @@ class CtxSingletonBase(object):
         return self._cxs_singleton_cls._cxs_create_top(self)(*args, **kwds)
 
     #context managment
+    #top is cached along side the stack of the current thread, as pushing
+    #and popping are the most common operations on singletons
+    def _cxs_push(self, top):
+        local = self._cxs_local
+        local.stack.append(top)
+        local.top = top
+
+    def _cxs_pop(self):
+        local = self._cxs_local
+        top = local.stack.pop()
+        local.top = local.stack[-1]
+        return top
+
     def _cxs_enter_instance(self, instance):
         assert instance._cxs_ctx is self
         top = instance._cxs_copy()
         assert top._cxs_ctx is self
-        self._cxs_stack.append(top)
+        local = self._cxs_local
+        local.stack.append(top)
+        local.top = top
         return top
 
     def _cxs_enter_cls(self):
-        self._cxs_stack.append(self._cxs_singleton_cls._cxs_create_top(self))
+        self._cxs_push(self._cxs_singleton_cls._cxs_create_top(self))
 
     def _cxs_exit_instance(self, instance, exc_info):
         return self._cxs_exit_cls(exc_info)
 
     def _cxs_exit_cls(self, exc_info):
-        self._cxs_stack.pop()._cxs_delete()
-        return list(exc_info).count(None)==3
+        local = self._cxs_local
+        local.stack.pop()._cxs_delete()
+        local.top = local.stack[-1]
+        return exc_info[0] is None
+
+    @contextmanager
+    def _cxs_resume_instance(self, instance):
+        assert instance._cxs_ctx is self
+        self._cxs_push(instance)
+        try:
+            yield instance
+        finally:
+            top = self._cxs_pop()
+            assert top is instance
 
 
 
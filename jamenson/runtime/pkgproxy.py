@@ -38,5 +38,7 @@ class PackageProxy(object):
         return self
 
     def __dir__(self):
-        return list(self.__dict__) + list(self._package.imports)
+        #lazy exports are listed without binding them
+        return (list(self.__dict__) + list(self._package.imports) +
+                list(self._package.lazy_exports))
 
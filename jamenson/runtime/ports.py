@@ -2,6 +2,8 @@
    for creating arbitary bidirectional graphs
 '''
 
+from bisect import insort
+
 from jamenson.runtime.multimethod import MultiMethod, defmethod
 
 __all__ = '''PortError DanglingPort AmbiguousConnection BreakNonExisting
@@ -49,7 +51,107 @@ class PortList(PortBase):
 
     def __init__(self, cell):
         self.cell = cell
-        self.ports = []
+        self.ports = PortSequence()
+
+
+class PortSequence(object):
+    '''ordered ports connected to a PortList.  ports are indexed by their
+       positions, such that testing for and removing a port takes constant
+       time.  removal leaves a hole, which are compacted once they make up
+       half of the sequence, or when accessing ports by index.  as with a
+       list, a port can transiently occupy several positions
+    '''
+
+    def __init__(self, seq=()):
+        self.items = []
+        self.positions = {}
+        self.holes = 0
+        for op in seq:
+            self.append(op)
+
+    def compact(self):
+        if self.holes:
+            self.items = [op for op in self.items if op is not hole]
+            self.positions = {}
+            for i,op in enumerate(self.items):
+                self.positions.setdefault(op, []).append(i)
+            self.holes = 0
+
+    def append(self, op):
+        self.positions.setdefault(op, []).append(len(self.items))
+        self.items.append(op)
+
+    def remove(self, op):
+        try:
+            indices = self.positions[op]
+        except KeyError:
+            raise ValueError('port not in sequence')
+        index = indices.pop(0)
+        if not indices:
+            del self.positions[op]
+        self.items[index] = hole
+        self.holes += 1
+        if self.holes > 8 and 2 * self.holes > len(self.items):
+            self.compact()
+
+    def index(self, op):
+        self.compact()
+        try:
+            return self.positions[op][0]
+        except KeyError:
+            raise ValueError('port not in sequence')
+
+    def clear(self):
+        del self.items[::]
+        self.positions.clear()
+        self.holes = 0
+
+    def __contains__(self, op):
+        return op in self.positions
+
+    def __len__(self):
+        return len(self.items) - self.holes
+
+    def __iter__(self):
+        if self.holes:
+            self.compact()
+        return iter(self.items[::])
+
+    def __getitem__(self, index):
+        self.compact()
+        return self.items[index]
+
+    def __setitem__(self, index, op):
+        self.compact()
+        old = self.items[index]
+        if old is op:
+            return
+        index = index % len(self.items)
+        indices = self.positions[old]
+        indices.remove(index)
+        if not indices:
+            del self.positions[old]
+        self.items[index] = op
+        insort(self.positions.setdefault(op, []), index)
+
+    def __delitem__(self, index):
+        if index != slice(None, None, None):
+            raise ValueError('can only delete all ports')
+        self.clear()
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'PortSequence(%r)' % (list(self),)
+
+    def __reduce__(self):
+        return PortSequence, (list(self),)
+
+hole = object()
 
 
 get_cells = MultiMethod('get_cells',
@@ -68,63 +170,60 @@ replace_connection = MultiMethod('replace_connection',
                                  signature='one_end,old_other,new_other')
 disconnect_other = MultiMethod('disconnect_other',
                                doc='disconnect other end of port; only used internally')
+connect_other = MultiMethod('connect_other')
 
 
-@defmethod(get_cells, [Port])
-def meth(p):
+# # # # # # # # # # # # # # # # # #
+# Operations on Port and PortList #
+# # # # # # # # # # # # # # # # # #
+# implementations for exactly Port and PortList, which are both called
+# directly by the methods of ports and registered in the multimethods.
+# methods fall back to the multimethods for all other types of ports
+
+def port_get_cells(p):
     return [p.port.cell] if p.port is not None else []
 
-@defmethod(get_cells, [PortList])
-def meth(pl):
+def portlist_get_cells(pl):
     return [p.cell for p in pl.ports]
 
-@defmethod(get_cell, [Port])
-def meth(p):
+def port_get_cell(p):
     if p.port is None:
         raise DanglingPort
     return p.port.cell
 
-@defmethod(get_cell, [PortList])
-def meth(pl):
+def portlist_get_cell(pl):
     if not pl.ports:
         raise DanglingPort
     elif len(pl.ports)!=1:
         raise AmbiguousConnection
     return pl.ports[0]
 
-@defmethod(count_connections, [Port])
-def meth(p):
+def port_count_connections(p):
     return 1 if p.port is not None else 0
 
-@defmethod(count_connections, [PortList])
-def meth(pl):
+def portlist_count_connections(pl):
     return len(pl.ports)
 
-@defmethod(connect, [Port, Port])
-def meth(a,b):
+def port_connect_port(a,b):
     if a is b:
         raise PortError('cannot self connect ports')
     if a.port is not None:
-        disconnect(a, a.port)
+        a.disconnect(a.port)
     if b.port is not None:
-        disconnect(b, b.port)
+        b.disconnect(b.port)
     a.port = b
     b.port = a
 
-@defmethod(connect, [Port, PortList])
-def meth(p,pl):
+def port_connect_portlist(p,pl):
     if p.port is not None:
-        disconnect(p, p.port)
+        p.disconnect(p.port)
     p.port = pl
-    assert p not in pl.ports
     pl.ports.append(p)
 
-@defmethod(connect, [PortList, Port])
-def meth(pl,p):
-    connect(p,pl)
+def portlist_connect_port(pl,p):
+    port_connect_portlist(p,pl)
 
-@defmethod(connect, [PortList, PortList])
-def meth(a,b):
+def portlist_connect_portlist(a,b):
     if a is b:
         raise PortError('cannot self connect ports')
     if a in b.ports:
@@ -134,81 +233,132 @@ def meth(a,b):
     a.ports.append(b)
     b.ports.append(a)
 
-@defmethod(disconnect, [Port,Port])
-def meth(a,b):
+def port_disconnect_port(a,b):
     if a.port is not b:
         raise BreakNonExisting
     assert b.port is a
-    disconnect_all(a)
+    port_disconnect_all(a)
     assert a.port is None
     assert b.port is None
 
-@defmethod(disconnect, [Port,PortList])
-def meth(p,pl):
+def port_disconnect_portlist(p,pl):
     if p not in pl.ports:
         raise BreakNonExisting
-    disconnect_all(p)
+    port_disconnect_all(p)
     assert p.port is None
     assert p not in pl.ports
 
-@defmethod(disconnect, [PortList,Port])
-def meth(pl,p):
-    disconnect(p,pl)
+def portlist_disconnect_port(pl,p):
+    port_disconnect_portlist(p,pl)
 
-@defmethod(disconnect, [PortList,PortList])
-def meth(a,b):
+def portlist_disconnect_portlist(a,b):
     if b not in a.ports:
         raise BreakNonExisting
     a.ports.remove(b)
     b.ports.remove(a)
 
-@defmethod(disconnect_all, [Port])
-def meth(p):
+def port_disconnect_all(p):
     if p.port is not None:
-        disconnect_other(p.port, p)
+        p.port.disconnect_other(p)
         p.port = None
 
-@defmethod(disconnect_all, [PortList])
-def meth(pl):
+def portlist_disconnect_all(pl):
     for x in pl.ports:
-        disconnect_other(x, pl)
+        x.disconnect_other(pl)
     del pl.ports[::]
 
-@defmethod(disconnect_other, [Port,PortBase])
-def meth(p, x):
+def port_disconnect_other(p, x):
     assert p.port is x
     p.port = None
 
-@defmethod(disconnect_other, [PortList,PortBase])
-def meth(pl, x):
+def portlist_disconnect_other(pl, x):
     pl.ports.remove(x)
 
-
-@defmethod(replace_connection, [Port, PortBase, PortBase])
-def meth(p, old, new):
-    assert p.port is old
-    disconnect(p, old)
-    connect(p, new)
-
-connect_other = MultiMethod('connect_other')
-
-@defmethod(connect_other, [PortList, PortBase])
-def meth(pl, other):
-    pl.ports.append(other)
-
-@defmethod(connect_other, [Port, PortBase])
-def meth(p, other):
+def port_connect_other(p, other):
     if p.port is not None:
-        disconnect_all(p)
+        p.disconnect_all()
     assert p.port is None
     p.port = other
 
-@defmethod(replace_connection, [PortList, PortBase, PortBase])
-def meth(pl, old, new):
+def portlist_connect_other(pl, other):
+    pl.ports.append(other)
+
+def port_replace_connection(p, old, new):
+    assert p.port is old
+    p.disconnect(old)
+    p.connect(new)
+
+def portlist_replace_connection(pl, old, new):
     inx = pl.ports.index(old)
     pl.ports[inx] = new
-    disconnect_other(old, pl)
-    connect_other(new, pl)
+    old.disconnect_other(pl)
+    new.connect_other(pl)
+
+
+defmethod(get_cells, [Port])(port_get_cells)
+defmethod(get_cells, [PortList])(portlist_get_cells)
+defmethod(get_cell, [Port])(port_get_cell)
+defmethod(get_cell, [PortList])(portlist_get_cell)
+defmethod(count_connections, [Port])(port_count_connections)
+defmethod(count_connections, [PortList])(portlist_count_connections)
+defmethod(connect, [Port, Port])(port_connect_port)
+defmethod(connect, [Port, PortList])(port_connect_portlist)
+defmethod(connect, [PortList, Port])(portlist_connect_port)
+defmethod(connect, [PortList, PortList])(portlist_connect_portlist)
+defmethod(disconnect, [Port, Port])(port_disconnect_port)
+defmethod(disconnect, [Port, PortList])(port_disconnect_portlist)
+defmethod(disconnect, [PortList, Port])(portlist_disconnect_port)
+defmethod(disconnect, [PortList, PortList])(portlist_disconnect_portlist)
+defmethod(disconnect_all, [Port])(port_disconnect_all)
+defmethod(disconnect_all, [PortList])(portlist_disconnect_all)
+defmethod(disconnect_other, [Port, PortBase])(port_disconnect_other)
+defmethod(disconnect_other, [PortList, PortBase])(portlist_disconnect_other)
+defmethod(connect_other, [Port, PortBase])(port_connect_other)
+defmethod(connect_other, [PortList, PortBase])(portlist_connect_other)
+defmethod(replace_connection, [Port, PortBase, PortBase])(port_replace_connection)
+defmethod(replace_connection, [PortList, PortBase, PortBase])(portlist_replace_connection)
+
+
+# # # # # # # # #
+# Port Methods  #
+# # # # # # # # #
+
+def single_dispatcher(mm, table):
+    def method(self, *args):
+        try:
+            func = table[self.__class__]
+        except KeyError:
+            return mm(self, *args)
+        return func(self, *args)
+    method.func_name = mm.name
+    return method
+
+def pair_dispatcher(mm, table):
+    def method(self, other):
+        try:
+            func = table[self.__class__, other.__class__]
+        except KeyError:
+            return mm(self, other)
+        return func(self, other)
+    method.func_name = mm.name
+    return method
+
+for mm in [get_cells, get_cell, count_connections, disconnect_all,
+           disconnect_other, connect_other, replace_connection]:
+    setattr(PortBase, mm.name, single_dispatcher(mm, {}))
+for mm in [connect, disconnect]:
+    setattr(PortBase, mm.name, pair_dispatcher(mm, {}))
+
+for cls,prefix in [(Port, 'port'), (PortList, 'portlist')]:
+    for mm in [get_cells, get_cell, count_connections, disconnect_all,
+               disconnect_other, connect_other, replace_connection]:
+        setattr(cls, mm.name, single_dispatcher(mm, {cls : globals()[prefix + '_' + mm.name]}))
+    for mm in [connect, disconnect]:
+        setattr(cls, mm.name, pair_dispatcher(mm, dict(
+            ((cls, other_cls), globals()['%s_%s_%s' % (prefix, mm.name, other_prefix)])
+            for other_cls,other_prefix in [(Port, 'port'), (PortList, 'portlist')])))
+del cls, prefix, mm
+
 
 class PortCollection(object):
 
@@ -223,19 +373,19 @@ class PortCollection(object):
 class AttrPortList(PortCollection):
 
     def append(self, other):
-        connect(self.port, self.get_item_port(other))
+        self.port.connect(self.get_item_port(other))
 
     def remove(self, other):
-        disconnect(self.port, self.get_item_port(other))
+        self.port.disconnect(self.get_item_port(other))
 
     def __iter__(self):
-        return iter(get_cells(self.port))
+        return iter(self.port.get_cells())
 
     def __len__(self):
-        return count_connections(self.port)
+        return self.port.count_connections()
 
     def __contains__(self, el):
-        return el in get_cells(self.port)
+        return getattr(el, self.item_attr_name, None) in self.port.ports
 
     def extend(self, seq):
         for el in seq:
@@ -248,12 +398,11 @@ class AttrPortList(PortCollection):
         raise ValueError
 
     def __getitem__(self, index):
-        return get_cells(self.port)[index]
+        return self.port.get_cells()[index]
 
     def __setitem__(self, index, el):
-        replace_connection(self.port,
-                           self.get_item_port(self[index]),
-                           self.get_item_port(el))
+        self.port.replace_connection(self.get_item_port(self[index]),
+                                     self.get_item_port(el))
 
     def __delitem__(self, index):
         if not isinstance(index, slice):
@@ -262,10 +411,10 @@ class AttrPortList(PortCollection):
             l = len(self)
             start,stop,step = index.indices(l)
             if start==0 and step==1 and stop==l:
-                disconnect_all(self.port)
+                self.port.disconnect_all()
                 return
         for el in self[index]:
-            disconnect(self.port,self.get_item_port(el))
+            self.port.disconnect(self.get_item_port(el))
 
 
 
@@ -292,16 +441,15 @@ class AttrPortMapping(PortCollection):
         index = self._index_key(key, None)
         if index is None:
             self.key_list.append(key)
-            connect(self.port, self.get_item_port(value))
+            self.port.connect(self.get_item_port(value))
         else:
-            replace_connection(self.port,
-                               self.port.ports[index],
-                               self.get_item_port(value))
+            self.port.replace_connection(self.port.ports[index],
+                                         self.get_item_port(value))
 
     def __delitem__(self, key):
         index = self._index_key(key)
         del self.key_list[index]
-        disconnect(self.port, self.port.ports[index])
+        self.port.disconnect(self.port.ports[index])
 
     def __iter__(self):
         return iter(self.key_list)
@@ -316,16 +464,16 @@ class AttrPortMapping(PortCollection):
         return self.key_list[::]
 
     def values(self):
-        return get_cells(self.port)
+        return self.port.get_cells()
 
     def items(self):
-        return zip(self.key_list, get_cells(self.port))
+        return zip(self.key_list, self.port.get_cells())
 
     def iterkeys(self):
         return iter(self.key_list)
 
     def itervalues(self):
-        return iter(get_cells(self.port))
+        return iter(self.port.get_cells())
 
     def iteritems(self):
         return iter(self.items())
@@ -338,7 +486,7 @@ class AttrPortMapping(PortCollection):
 
     def clear(self):
         del self.key_list[::]
-        disconnect_all(self.port)
+        self.port.disconnect_all()
 
     def __len__(self):
         return len(self.key_list)
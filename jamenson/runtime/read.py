@@ -7,7 +7,8 @@ from __future__ import with_statement
 
 import sys
 import re
-from decimal import Decimal
+from collections import deque
+from array import array
 
 from .multimethod import MultiMethod, defmethod
 from .ctxsingleton import CtxSingleton
@@ -18,7 +19,7 @@ from .symbol import (resolve_full_symbol_print_form,
 from .cons import Cons,clist,nil
 from .builtins import get_builtin_symbol
 
-__all__ = '''Stream readone read readstate
+__all__ = '''Stream BufferedStream FormLocations readone iter_forms read readstate
 '''.split()
 
 
@@ -29,6 +30,10 @@ get_char_puller = MultiMethod('get_char_puller',
 
 @defmethod(get_char_puller, [object])
 def meth(op):
+    #file-like objects
+    read = getattr(op, 'read', None)
+    if callable(read):
+        return lambda : read(1)
     if not callable(op):
         raise TypeError("dont't know how to read %r" % (op,))
     return op
@@ -104,7 +109,7 @@ class Stream(object):
                 self.colno = self.previous_colnos.pop()
                 self.lineno -= 1
             else:
-                self.colno += 1
+                self.colno -= 1
             self.buffer.append(c)
 
     def syntax_error(self, msg='Syntax Error', char=''):
@@ -147,23 +152,271 @@ class Stream(object):
         else:
             return self.lineno, max(1, self.colno-1)
 
+
+# # # # # # # # # # #
+# buffered streams  #
+# # # # # # # # # # #
+
+get_block_puller = MultiMethod('get_block_puller',
+                               doc='''returns a function that pulls blocks of characters
+                                      out of the argument; an empty string marks the end
+                                      ''')
+
+@defmethod(get_block_puller, [object])
+def meth(op):
+    block_size = BufferedStream.block_size
+    #file-like objects and sockets
+    for name in 'read', 'recv':
+        pull = getattr(op, name, None)
+        if callable(pull):
+            return lambda : pull(block_size)
+    #generic character pullers yield blocks of a single character
+    return get_char_puller(op)
+
+def iter_block_seq(seq):
+    yield seq
+    while True:
+        yield ''
+
+@defmethod(get_block_puller, [str])
+def meth(s):
+    return iter(iter_block_seq(s)).next
+
+@defmethod(get_block_puller, [buffer])
+def meth(b):
+    return iter(iter_block_seq(str(b))).next
+
+@defmethod(get_block_puller, [(list,tuple)])
+def meth(seq):
+    return iter(iter_block_seq(''.join(seq))).next
+
+@defmethod(get_block_puller, [file])
+def meth(fp):
+    if fp.isatty():
+        #don't block waiting on an interactive user
+        return fp.readline
+    block_size = BufferedStream.block_size
+    return lambda : fp.read(block_size)
+
+run_matchers = {}
+def get_run_matcher(pattern):
+    '''compiled matcher for the longest run of characters that each match pattern
+    '''
+    try:
+        return run_matchers[pattern]
+    except KeyError:
+        matcher = run_matchers[pattern] = re.compile('(?:%s)*' % (pattern,)).match
+        return matcher
+
+match_blank = re.compile(r'(?:\s+|;[^\n]*)*').match
+
+char_matchers = {}
+def get_char_matcher(pattern):
+    try:
+        return char_matchers[pattern]
+    except KeyError:
+        matcher = char_matchers[pattern] = re.compile(pattern).match
+        return matcher
+
+
+class BufferedStream(Stream):
+    '''character stream that pulls its source in large blocks
+       runs of characters are consumed by collect with a single regular
+       expression match, instead of testing each character individually
+    '''
+
+    block_size = 1 << 16
+    #number of newlines that may be pushed back across
+    max_pushed_lines = 64
+
+    def __init__(self, op, filename=None, start_lineno=None):
+        self.op = op
+        self.read_a_block = get_block_puller(op)
+        self.exhausted = False
+        self.text = ''
+        self.pos = 0
+        #characters pushed back that can't be handled by rewinding text
+        self.buffer = []
+        self.lineno = start_lineno or 1
+        self.colno = 1
+        self.previous_colnos = deque(maxlen=self.max_pushed_lines)
+        if filename is None:
+            try:
+                filename = op.name
+            except AttributeError:
+                pass
+        self.filename = filename
+
+    def fill(self):
+        '''replace exhausted text with next block from source
+           returns False when source is exhausted
+        '''
+        if self.exhausted:
+            return False
+        try:
+            text = self.read_a_block()
+        except StopIteration:
+            text = ''
+        if not text:
+            self.exhausted = True
+            return False
+        self.text = text
+        self.pos = 0
+        return True
+
+    def pull_char(self):
+        if self.buffer:
+            c = self.buffer.pop()
+        elif self.pos < len(self.text) or self.fill():
+            c = self.text[self.pos]
+            self.pos += 1
+        else:
+            return ''
+        if c=='\n':
+            self.previous_colnos.append(self.colno)
+            self.colno = 1
+            self.lineno += 1
+        else:
+            self.colno += 1
+        return c
+
+    def push_char(self, c):
+        if c:
+            assert len(c) == 1
+            if c=='\n':
+                self.colno = self.previous_colnos.pop()
+                self.lineno -= 1
+            else:
+                self.colno -= 1
+            if not self.buffer and self.pos and self.text[self.pos-1] == c:
+                self.pos -= 1
+            else:
+                self.buffer.append(c)
+
+    def peek_char(self):
+        if self.buffer:
+            return self.buffer[-1]
+        if self.pos < len(self.text) or self.fill():
+            return self.text[self.pos]
+        return ''
+
+    def looking_at(self, pattern):
+        return get_char_matcher(pattern)(self.peek_char())
+
+    def advance_position(self, chars):
+        '''update line and column for a run of consumed characters
+        '''
+        n_newlines = chars.count('\n')
+        if not n_newlines:
+            self.colno += len(chars)
+            return
+        lines = chars.split('\n')
+        self.previous_colnos.append(self.colno + len(lines[0]))
+        self.previous_colnos.extend(1 + len(line) for line in lines[1:-1])
+        self.lineno += n_newlines
+        self.colno = 1 + len(lines[-1])
+
+    def collect(self, pattern, pre=None):
+        acc = []
+        if pre:
+            acc.append(pre)
+        match_char = get_char_matcher(pattern)
+        while self.buffer:
+            c = self.pull_char()
+            if not match_char(c):
+                self.push_char(c)
+                return ''.join(acc)
+            acc.append(c)
+        match_run = get_run_matcher(pattern)
+        while self.pos < len(self.text) or self.fill():
+            text = self.text
+            start = self.pos
+            end = match_run(text, start).end()
+            if end > start:
+                chars = text[start:end]
+                self.advance_position(chars)
+                acc.append(chars)
+                self.pos = end
+            if end < len(text):
+                break
+        return ''.join(acc)
+
+    def strip_whitespace(self):
+        while self.buffer:
+            self.collect(r'\s')
+            if self.peek_char() != ';':
+                return
+            self.collect('[^\n]')
+        while self.pos < len(self.text) or self.fill():
+            text = self.text
+            start = self.pos
+            end = match_blank(text, start).end()
+            if end > start:
+                self.consume(text[start:end])
+            if end < len(text):
+                break
+            if text.rfind(';', start, end) > text.rfind('\n', start, end):
+                #finish comment that continues into next block
+                self.collect('[^\n]')
+
+    def extend(self):
+        '''append the next block from source to the unconsumed text
+           returns False when source is exhausted
+        '''
+        if self.exhausted:
+            return False
+        text = self.text[self.pos:]
+        if not self.fill():
+            return False
+        self.text = text + self.text
+        return True
+
+    def merge_buffer(self):
+        '''move pushed back characters into text, s.t. the unconsumed
+           characters can be scanned directly
+        '''
+        if self.buffer:
+            self.buffer.reverse()
+            self.buffer.append(self.text[self.pos:])
+            self.text = ''.join(self.buffer)
+            self.pos = 0
+            self.buffer = []
+
+    def consume(self, chars):
+        '''consume characters matched at current position
+        '''
+        self.pos += len(chars)
+        self.advance_position(chars)
+
+    def consume_to(self, pos):
+        '''consume all characters of text up to pos
+        '''
+        self.consume(self.text[self.pos:pos])
+
+
 default_read_table = {}
 default_hash_table = {}
 default_print_form_patterns = []
+default_end_symbol_chars = ''.join(get_chars(r'\s();'))
+#bumped whenever one of the default tables changes
+default_tables_version = 0
+
+def default_tables_changed():
+    global default_tables_version
+    default_tables_version += 1
 
 class ReaderState(CtxSingleton):
 
     def _cxs_setup_top(self):
-        self.table = default_read_table.copy()
-        self.hash_table = default_hash_table.copy()
-        self.print_form_patterns = default_print_form_patterns[::]
+        self.reset_tables()
         self.record_forms = False
         self.read_symbol = read_symbol
         self.stream = None
         self.handle_attribute = True
         self.handle_methods = True
         self.handle_constants = True
-        self.end_symbol_chars = ''.join(get_chars(r'\s();'))
+        self.end_symbol_chars = default_end_symbol_chars
+        self.tokenize = True
         self._cxs_setup_aux()
 
     def _cxs_copy(self, **kwds):
@@ -179,7 +432,13 @@ class ReaderState(CtxSingleton):
         else:
             if not isinstance(self.stream, Stream):
                 self.stream = Stream(self.stream)
-        self.form_locations = {} if self.record_forms else None
+        self.form_locations = FormLocations() if self.record_forms else None
+
+    def reset_tables(self):
+        self.table = default_read_table.copy()
+        self.hash_table = default_hash_table.copy()
+        self.print_form_patterns = default_print_form_patterns[::]
+        self.tables_version = default_tables_version
 
 def pull_char():
     return readstate.stream.pull_char()
@@ -213,18 +472,56 @@ def get_last_loc():
 
 
 EOFRaise = object()
+in_memory_sources = str, buffer, list, tuple
+
 def readone(bytesource, eofp=EOFRaise,
             filename=None, start_lineno=None,
             record_forms=None, inherit_state=True):
     '''read a single item from byte source
+       sources other than strings are read a character at a time, such
+       that the characters following the item remain in the source
     '''
-    kwds = dict(stream=Stream(bytesource, filename=filename,
-                              start_lineno=start_lineno))
+    stream_cls = BufferedStream if isinstance(bytesource, in_memory_sources) else Stream
+    kwds = dict(stream=stream_cls(bytesource, filename=filename,
+                                  start_lineno=start_lineno))
     if record_forms is not None:
         kwds['record_forms'] = bool(record_forms)
     with (readstate.top if inherit_state else readstate)(**kwds):
         return read(eofp)
 
+def iter_forms(bytesource, filename=None, start_lineno=None,
+               record_forms=None, inherit_state=True):
+    '''lazily read all top level forms from byte source
+       reader state is created once and resumed for each form.  when
+       recording forms, yields (form, form_locations) pairs with a fresh
+       location table for each top level form.
+    '''
+    if isinstance(bytesource, Stream):
+        stream = bytesource
+    else:
+        stream = BufferedStream(bytesource, filename=filename,
+                                start_lineno=start_lineno)
+    kwds = dict(stream=stream)
+    if record_forms is not None:
+        kwds['record_forms'] = bool(record_forms)
+    state = (readstate.top if inherit_state else readstate)(**kwds)
+    eof = object()
+    try:
+        while True:
+            #a fresh state would pick up reader macros registered
+            #while evaluating previous forms
+            if not inherit_state and state.tables_version != default_tables_version:
+                state.reset_tables()
+            if state.record_forms:
+                state.form_locations = FormLocations()
+            with state._cxs_resume():
+                form = read(eof)
+            if form is eof:
+                break
+            yield (form, state.form_locations) if state.record_forms else form
+    finally:
+        state._cxs_delete()
+
 def read(eofp=EOFRaise):
     '''read one object out of current state
     '''
@@ -234,14 +531,66 @@ def read(eofp=EOFRaise):
         if eofp is EOFRaise:
             unexpected_end_of_input()
         return eofp
+    if readstate.tokenize and tokenizer_applicable(readstate.stream):
+        return tokenized_read(readstate.stream)
     reader = readstate.table.get(c, readstate.read_symbol)
     if readstate.record_forms:
         loc = get_last_loc()
     op = reader()
     if readstate.record_forms:
-        readstate.form_locations[id(op)] = loc if id(op) not in readstate.form_locations else None
+        record_form_location(op, loc)
     return op
 
+def record_form_location(op, loc):
+    readstate.form_locations.record(op, loc)
+
+class FormLocations(object):
+    '''compact table of reader locations for forms
+       forms are numbered in the order they are recorded and their
+       positions are kept in parallel arrays indexed by that serial
+       number.  recorded forms are kept alive by the table, so their
+       ids can't be reused while it exists.
+    '''
+
+    __slots__ = ['serials','forms','linenos','colnos']
+
+    def __init__(self):
+        self.serials = {}
+        self.forms = []
+        self.linenos = array('l')
+        self.colnos = array('l')
+
+    def __len__(self):
+        return len(self.forms)
+
+    def __contains__(self, form):
+        return id(form) in self.serials
+
+    def record(self, form, loc):
+        serial = self.serials.get(id(form))
+        if serial is not None:
+            #read more than once (ie. symbols); location is ambiguous
+            self.linenos[serial] = 0
+            return
+        lineno,colno = loc or (0,0)
+        self.serials[id(form)] = len(self.forms)
+        self.forms.append(form)
+        self.linenos.append(lineno or 0)
+        self.colnos.append(colno or 0)
+
+    def get(self, form, default=None):
+        serial = self.serials.get(id(form))
+        if serial is None:
+            return default
+        lineno = self.linenos[serial]
+        if not lineno:
+            return None
+        return lineno, self.colnos[serial]
+
+    def values(self):
+        return [(lineno, colno) if lineno else None
+                for lineno,colno in zip(self.linenos, self.colnos)]
+
 
 # # # # # #
 # readers #
@@ -252,6 +601,8 @@ def register_reader_aux(pattern, func, table=None):
         table = default_read_table
     for c in get_chars(pattern):
         table[c] = func
+    if table is default_read_table or table is default_hash_table:
+        default_tables_changed()
     return func
 
 def register_reader(chars, table=None):
@@ -299,7 +650,11 @@ def read_symbol():
     return read_symbol_ex(pull_char())
 
 def read_symbol_ex(c):
-    c = collect_symbol(c)
+    return interpret_symbol(collect_symbol(c))
+
+def interpret_symbol(c):
+    '''convert the print_form of a symbol literal to the form it represents
+    '''
     for matcher,func in reversed(readstate.print_form_patterns):
         m = matcher(c)
         if m:
@@ -359,6 +714,7 @@ def register_print_form_pattern(pattern):
     match = pattern.match
     def wrap(func):
         default_print_form_patterns.append([match,func])
+        default_tables_changed()
         return func
     return wrap
 
@@ -500,7 +856,7 @@ def read_number():
             return 0
         i = int(chars, radix)
         if decimal:
-            i = Decimal(str(i))
+            i = make_decimal(str(i))
         if neg:
             i*=-1
         return i
@@ -521,9 +877,14 @@ def read_number():
     if symbol_possible():
         return read_symbol_ex(dropped + ('d' if decimal else ''))
     if decimal:
-        n = Decimal(dropped)
+        n = make_decimal(dropped)
     return n
 
+def make_decimal(digits):
+    #decimal is slow to import and seldom read
+    from decimal import Decimal
+    return Decimal(digits)
+
 
 # # # # #
 # cons  #
@@ -625,4 +986,144 @@ def read_hash():
         syntax_error("no read macro for hash escape %r" % (c,))
     return reader()
 
+
+# # # # # # # #
+#  tokenizer  #
+# # # # # # # #
+# fast path for reading with the default readers.  each token is lexed from
+# the text of a BufferedStream with a single master regular expression and
+# lists and quotes are built with an explicit stack.  line and column
+# positions are only brought up to date when needed, ie. recording form
+# locations, resolving symbols, calling readers, and raising errors.
+# characters with readers that the tokenizer doesn't know, ie. reader macros,
+# are handled by calling that reader, as are rare token forms (escapes,
+# radixes, exponents, etc.) for which the character at a time readers are used.
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+match_token = re.compile(r'''(?:\s+|;[^\n]*)*
+                             (?:(?P<open>\()
+                               |(?P<close>\))
+                               |(?P<quote>')
+                               |(?P<string>"(?:[^"\\]|\\.)*")
+                               |(?P<atom>(?:[^%s\\]|\\.?)+))?
+                          ''' % (re.escape(default_end_symbol_chars),),
+                         re.DOTALL | re.VERBOSE).match
+match_int = re.compile(r'[+-]?(?:0|[1-9]\d*)$').match
+match_float = re.compile(r'(?:[+-]?(?:0|[1-9]\d*)\.\d*|\.\d+)$').match
+
+def tokenizer_applicable(stream):
+    return (isinstance(stream, BufferedStream) and
+            readstate.end_symbol_chars == default_end_symbol_chars)
+
+LIST_FRAME, DOT_FRAME, DOT_CLOSE_FRAME, QUOTE_FRAME = range(4)
+no_form = object()
+
+def tokenized_read(stream):
+    '''read one object with tokenizer
+       eof has already been checked for by read
+    '''
+    table = readstate.table
+    record_forms = readstate.record_forms
+    default_symbols = readstate.read_symbol is read_symbol
+    sync = stream.consume_to
+    #each frame is [frame_type, location, head, tail]
+    stack = []
+    stream.merge_buffer()
+    text = stream.text
+    pos = stream.pos
+    while True:
+        m = match_token(text, pos)
+        end = m.end()
+        if end == len(text) and not stream.exhausted:
+            #token may continue in next block
+            sync(pos)
+            if stream.extend():
+                text = stream.text
+                pos = stream.pos
+                continue
+        kind = m.lastgroup
+        start = m.start(kind) if kind is not None else end
+        frame_type = stack[-1][0] if stack else None
+        if frame_type == DOT_CLOSE_FRAME and kind != 'close':
+            sync(start)
+            stream.syntax_error()
+        if kind is None:
+            sync(end)
+            stream.unexpected_end_of_input()
+        if kind == 'close' and (frame_type == LIST_FRAME or frame_type == DOT_CLOSE_FRAME):
+            pos = end
+            frame = stack.pop()
+            op = frame[2]
+            loc = frame[1]
+        elif kind == 'atom' and frame_type == LIST_FRAME and end - start == 1 and text[start] == '.':
+            pos = end
+            stack[-1][0] = DOT_FRAME
+            continue
+        else:
+            if record_forms:
+                sync(start)
+                loc = stream.get_last_loc()
+            else:
+                loc = None
+            reader = table.get(text[start])
+            op = no_form
+            if kind == 'open' and reader is read_cons:
+                pos = end
+                stack.append([LIST_FRAME, loc, nil, nil])
+                continue
+            elif kind == 'quote' and reader is read_quote:
+                pos = end
+                stack.append([QUOTE_FRAME, loc, None, None])
+                continue
+            elif kind == 'string' and reader is read_string:
+                token = m.group(kind)
+                if '\\' not in token:
+                    op = token[1:-1]
+            elif kind == 'atom':
+                token = m.group(kind)
+                if '\\' not in token:
+                    if reader is None and default_symbols:
+                        sync(end)
+                        op = interpret_symbol(token)
+                    elif reader is read_number:
+                        if match_int(token):
+                            op = int(token)
+                        elif match_float(token):
+                            op = float(token)
+            if op is not no_form:
+                pos = end
+            else:
+                sync(start)
+                op = (reader or readstate.read_symbol)()
+                stream.merge_buffer()
+                text = stream.text
+                pos = stream.pos
+        #pass completed form up the stack
+        while True:
+            if record_forms:
+                record_form_location(op, loc)
+            if not stack:
+                sync(pos)
+                return op
+            frame = stack[-1]
+            frame_type = frame[0]
+            if frame_type == QUOTE_FRAME:
+                stack.pop()
+                op = clist(quote_sym, op)
+                loc = frame[1]
+            elif frame_type == LIST_FRAME:
+                cell = Cons(op, nil)
+                if frame[3] is nil:
+                    frame[2] = cell
+                else:
+                    frame[3].cdr = cell
+                frame[3] = cell
+                break
+            else:
+                assert frame_type == DOT_FRAME
+                frame[3].cdr = op
+                frame[0] = DOT_CLOSE_FRAME
+                break
+
+
 readstate = ReaderState()
@@ -9,7 +9,7 @@ from itertools import count
 import string
 
 from .multimethod import defmethod
-from .ports import PortList,connect,disconnect,disconnect_all,get_cells
+from .ports import PortList
 from .as_string import as_string
 from .purity import register_pure
 from .atypes import as_type, IsType
@@ -26,7 +26,8 @@ __all__ = '''Symbol symbolp make_symbol UnboundSymbolError boundp
            import_symbol unimport_symbol
            shadowing_import
            intern_symbol unintern_symbol
-           export_symbol unexport_symbol
+           export_symbol export_lazy_symbol unexport_symbol
+           iter_exported_symbols
            use_package unuse_package
            resolve_print_form
            sys_package user_package gensyms_package
@@ -40,10 +41,12 @@ __all__ = '''Symbol symbolp make_symbol UnboundSymbolError boundp
 
 class Symbol(object):
 
-    __slots__ = ['print_form']
+    __slots__ = ['print_form', 'home_package']
 
     def __init__(self, print_form):
         self.print_form = print_form
+        #package where this symbol is interned; maintained by the package system
+        self.home_package = None
 
     def __repr__(self):
         return 'Symbol(%r)' % (self.print_form,)
@@ -139,10 +142,20 @@ class Package(object):
         #print_form's that may shadow print_forms in used packages
         #maps from print_form to package where symbol is imported
         self.shadows = {}
+        #reverse of shadows; maps from print_form to the set of packages
+        #that shadow print_form through this package
+        self.shadowed_by = {}
         #packages that are used by this package
         self.used_pkgs = PortList(self)
         #packages that use this package
         self.uses_pkgs = PortList(self)
+        #caches of print_form to symbol resolutions as seen by this package
+        #for unqualified (resolved) and exported (pkg:name) lookups
+        self.resolved = {}
+        self.resolved_exports = {}
+        #print_form's of exported symbols that are only interned when first
+        #looked up; maps to a function that returns the symbol's value
+        self.lazy_exports = {}
 
     def __repr__(self):
         return '%s(%r)' % (self.__class__.__name__, self.name)
@@ -179,14 +192,14 @@ def package_context(package):
         yield None
 
 def all_used_packages(pkg, recursive=True):
-    acc = get_cells(pkg.used_pkgs)
+    acc = pkg.used_pkgs.get_cells()
     if recursive:
         for pkg in acc[::]:
             acc.extend(all_used_packages(pkg, True))
     return acc
 
 def all_use_packages(pkg, recursive=True):
-    acc = get_cells(pkg.uses_pkgs)
+    acc = pkg.uses_pkgs.get_cells()
     if recursive:
         for pkg in acc[::]:
             acc.extend(all_use_packages(pkg, True))
@@ -198,9 +211,8 @@ def all_use_packages(pkg, recursive=True):
 # # # # # # # # # # # # # # # #
 
 def get_symbol_package(sym):
-    for p in packages.itervalues():
-        if sym in p.interned:
-            return p
+    if isinstance(sym, Symbol):
+        return sym.home_package
     return None
 
 def internedp(sym):
@@ -215,8 +227,10 @@ def find_print_form_package(package, print_form, require_export):
     try:
         sym = package.imports[print_form]
     except KeyError:
-        pass
-    else:
+        sym = None
+        if print_form in package.lazy_exports:
+            sym = bind_lazy_export(package, print_form)
+    if sym is not None:
         if not require_export or sym in package.exports:
             return package
     if require_export is None:
@@ -224,12 +238,32 @@ def find_print_form_package(package, print_form, require_export):
     if print_form in package.shadows:
         return find_print_form_package(package.shadows[print_form], print_form,
                                        require_export)
-    for used_pkg in get_cells(package.used_pkgs):
+    for used_pkg in package.used_pkgs.get_cells():
         found = find_print_form_package(used_pkg, print_form, require_export)
         if found is not None:
             return found
     return None
 
+def invalidate_print_form(package, print_form):
+    '''forget cached resolutions of print_form in package and
+       in all packages that can see symbols through it
+    '''
+    package.resolved.pop(print_form, None)
+    package.resolved_exports.pop(print_form, None)
+    for pkg in package.uses_pkgs.get_cells():
+        invalidate_print_form(pkg, print_form)
+    for pkg in list(package.shadowed_by.get(print_form, ())):
+        invalidate_print_form(pkg, print_form)
+
+def invalidate_resolutions(package):
+    package.resolved.clear()
+    package.resolved_exports.clear()
+    for pkg in package.uses_pkgs.get_cells():
+        invalidate_resolutions(pkg)
+    for print_form, pkgs in package.shadowed_by.items():
+        for pkg in list(pkgs):
+            invalidate_print_form(pkg, print_form)
+
 def check_print_form_conflict(package, print_form):
     '''check if print_form can be introduced into package
        without creating a symbol conflict with existing symbols
@@ -256,6 +290,7 @@ def import_symbol(sym, package=None):
         package = state.package
     check_import_conflict(package, sym)
     package.imports[sym.print_form] = sym
+    invalidate_print_form(package, sym.print_form)
     return sym
 
 def unimport_symbol(sym, package=None):
@@ -265,6 +300,7 @@ def unimport_symbol(sym, package=None):
         unexport_symbol(sym, package)
     if sym in package.interned:
         unintern_symbol(sym)
+    invalidate_print_form(package, sym.print_form)
     try:
         isym =  package.imports.pop(sym.print_form)
     except KeyError:
@@ -288,10 +324,14 @@ def shadowing_import(sym, package=None):
         package = state.package
     check_import_conflict(package, sym)
     package.shadows[sym.print_form] = src_pkg
+    src_pkg.shadowed_by.setdefault(sym.print_form, set()).add(package)
+    invalidate_print_form(package, sym.print_form)
 
 def _intern_symbol(sym, package):
     package.interned.add(sym)
     package.imports[sym.print_form] = sym
+    sym.home_package = package
+    invalidate_print_form(package, sym.print_form)
     return sym
 
 def intern_symbol(sym, package=None):
@@ -311,8 +351,10 @@ def unintern_symbol(sym):
             raise PackageError("can't unintern %s::%s; exported in package %s" %
                                (package.name, sym.print_form, pkg.name))
     package.interned.remove(sym)
+    sym.home_package = None
     assert package.imports[sym.print_form] is sym
     del package.imports[sym.print_form]
+    invalidate_print_form(package, sym.print_form)
 
 def export_symbol(sym, package=None):
     if package is None:
@@ -320,6 +362,36 @@ def export_symbol(sym, package=None):
     if sym.print_form not in package.imports:
         import_symbol(sym, package)
     package.exports.add(sym)
+    invalidate_print_form(package, sym.print_form)
+
+def export_lazy_symbol(print_form, get_value, package=None):
+    '''export a symbol of print_form, which is only interned and bound to
+       get_value() when first looked up
+    '''
+    if package is None:
+        package = state.package
+    if print_form in package.imports:
+        sym = resolve_and_export_print_form(print_form, package)
+        set_symbol_cell(sym, get_value())
+    else:
+        package.lazy_exports[print_form] = get_value
+
+def bind_lazy_export(package, print_form):
+    get_value = package.lazy_exports.pop(print_form)
+    sym = _intern_symbol(Symbol(print_form), package)
+    package.exports.add(sym)
+    set_symbol_cell(sym, get_value())
+    return sym
+
+def iter_exported_symbols(package=None):
+    '''symbols exported by package, including lazy exports, which are
+       all bound when listing the exports
+    '''
+    if package is None:
+        package = state.package
+    for print_form in list(package.lazy_exports):
+        bind_lazy_export(package, print_form)
+    return iter(list(package.exports))
 
 def unexport_symbol(sym, package=None):
     if package is None:
@@ -329,12 +401,13 @@ def unexport_symbol(sym, package=None):
     except KeyError:
         raise PackageError("can't unexport %s from %s; not exported" %
                            (sym, package))
+    invalidate_print_form(package, sym.print_form)
 
 def check_package_cycle(up_pkg, chk_pkg):
     if chk_pkg is up_pkg:
         return True
     return any(check_package_cycle(up, chk_pkg)
-               for up in get_cells(up_pkg.used_pkgs))
+               for up in up_pkg.used_pkgs.get_cells())
 
 def use_package(src_pkg, dest_pkg=None):
     if dest_pkg is None:
@@ -346,24 +419,44 @@ def use_package(src_pkg, dest_pkg=None):
     for sym in src_pkg.exports:
         if sym.print_form not in shadow_print_forms:
             check_import_conflict(dest_pkg, sym)
-    connect(dest_pkg.used_pkgs,
-            src_pkg.uses_pkgs)
+    for print_form in src_pkg.lazy_exports:
+        if print_form not in shadow_print_forms:
+            check_print_form_conflict(dest_pkg, print_form)
+    dest_pkg.used_pkgs.connect(src_pkg.uses_pkgs)
+    invalidate_resolutions(dest_pkg)
 
 def unuse_package(src_pkg, dest_pkg=None):
     if dest_pkg is None:
         dest_pkg = state.package
-    disconnect(dest_pkg.used_pkgs,
-               src_pkg.uses_pkgs)
+    dest_pkg.used_pkgs.disconnect(src_pkg.uses_pkgs)
+    invalidate_resolutions(dest_pkg)
 
 def resolve_print_form(print_form, package=None):
     if package is None:
         package = state.package
+    try:
+        return package.resolved[print_form]
+    except KeyError:
+        pass
     pkg = find_print_form_package(package, print_form, None)
     if pkg is not None:
-        return pkg.imports[print_form]
+        sym = package.resolved[print_form] = pkg.imports[print_form]
+        return sym
     #new symbol, intern in this package
     return _intern_symbol(Symbol(print_form), package)
 
+def resolve_exported_print_form(print_form, package):
+    try:
+        return package.resolved_exports[print_form]
+    except KeyError:
+        pass
+    pkg = find_print_form_package(package, print_form, True)
+    if pkg is None:
+        raise InternalSymbolError("%s dosn't export symbol %s" %
+                                  (package.name, print_form))
+    sym = package.resolved_exports[print_form] = pkg.imports[print_form]
+    return sym
+
 def symbol_visibility(sym, package=None):
     ''' None -> no visibility
         True -> directly visible
@@ -495,11 +588,7 @@ def resolve_full_symbol_print_form(c, package=None):
         if c.startswith(':'):
             return make_keyword(c[1:])
         pkgname, print_form = c.split(':',1)
-        pkg = find_print_form_package(get_package(pkgname), print_form, True)
-        if pkg is None:
-            raise InternalSymbolError("%s dosn't export symbol %s" %
-                                      (pkgname, print_form))
-        return pkg.imports[print_form]
+        return resolve_exported_print_form(print_form, get_package(pkgname))
     elif c.startswith('&'):
         return get_sys_symbol(c)
     else:
@@ -510,12 +599,19 @@ def meth(package):
     global packages
     if builtin_packagep(package):
         raise PackageError("can't delete builtin package %s" % package.name)
+    invalidate_resolutions(package)
+    for sym in package.interned:
+        sym.home_package = None
     package.interned.clear()
     package.exports.clear()
+    for print_form, src_pkg in package.shadows.iteritems():
+        src_pkg.shadowed_by.get(print_form, set()).discard(package)
     package.shadows.clear()
+    package.shadowed_by.clear()
     package.imports.clear()
-    disconnect_all(package.used_pkgs)
-    disconnect_all(package.uses_pkgs)
+    package.lazy_exports.clear()
+    package.used_pkgs.disconnect_all()
+    package.uses_pkgs.disconnect_all()
     name = package.name
     package.name = '#<deleted:%s>' % name
     package.deleted = True
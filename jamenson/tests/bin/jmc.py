@@ -0,0 +1,66 @@
+
+import sys
+import unittest
+
+from jamenson.tests.util import shim_jump_opcodes
+shim_jump_opcodes()
+
+from jamenson.bin import jmc
+
+class StubJMC(jmc.JMC):
+    '''compiles targets by their name, without reading them
+    '''
+
+    package = None
+
+    def process_target_in_package(self, target):
+        self.msg('compiling %s', target)
+        if target.startswith('raise'):
+            raise ValueError(target)
+        if target.startswith('exit'):
+            sys.exit(target)
+
+class TestJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.old_jmc = getattr(jmc, 'jmc', None)
+
+    def tearDown(self):
+        jmc.jmc = self.old_jmc
+
+    def process(self, targets, jobs=2):
+        compiler = jmc.jmc = StubJMC()
+        compiler.jobs = jobs
+        compiler.targets = targets
+        compiler.log = []
+        try:
+            compiler.process_targets()
+        except SystemExit:
+            exited = True
+        else:
+            exited = False
+        return ''.join(compiler.log), exited
+
+    def testsuccess(self):
+        log, exited = self.process(['ok1', 'ok2', 'ok3'])
+        self.failIf(exited)
+        self.failUnlessEqual([line.split(': ', 1)[1] for line in log.splitlines()],
+                             ['compiling ok1', 'compiling ok2', 'compiling ok3'])
+
+    def testfailures(self):
+        log, exited = self.process(['ok1', 'raise2', 'exit3', 'ok4'])
+        self.failUnless(exited)
+        lines = [line.split(': ', 1)[1] for line in log.splitlines()
+                 if line.startswith(StubJMC.get_prog_name() + ': ')]
+        #messages of each target are in order of targets
+        self.failUnlessEqual([line for line in lines if line.startswith('compiling')],
+                             ['compiling ok1', 'compiling raise2', 'compiling exit3',
+                              'compiling ok4'])
+        failed = [line for line in lines if line.startswith('failed compiling')]
+        self.failUnlessEqual(failed, ['failed compiling raise2', 'failed compiling exit3'])
+        self.failUnless('ValueError: raise2' in log)
+        self.failUnless('SystemExit: exit3' in log)
+        self.failUnlessEqual(lines[-1], '2 of 4 targets failed')
+
+
+__name__ == '__main__' and unittest.main()
@@ -0,0 +1,6 @@
+
+from jamenson.tests.util import test_directory
+
+__name__ == '__main__' and test_directory(__file__)
+
+
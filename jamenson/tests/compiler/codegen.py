@@ -0,0 +1,156 @@
+
+from __future__ import with_statement
+
+import new
+import unittest
+
+import byteplay as B
+
+from jamenson.tests.util import shim_jump_opcodes
+shim_jump_opcodes()
+
+from jamenson.runtime.symbol import package_context
+from jamenson.runtime.read import iter_forms
+from jamenson.compiler import ir as I
+from jamenson.compiler import bind
+from jamenson.compiler.pkg import compiler_pkg
+from jamenson.compiler.translate import translate_top_level_form
+from jamenson.runtime.multimethod import defmethod, around
+from jamenson.compiler.irbase import createnode
+from jamenson.compiler.walk import iter_nodes
+from jamenson.compiler.codegen import (state, analyze_bindings, find_non_local_bindings,
+                                       get_function_free_bindings, OperationEmitter,
+                                       generate_operations, genops, emit, emit_node,
+                                       construct_compilation_ir, compile_operations)
+
+source = '''
+(setq f (function (let ((z (getattrq x foo)) (w 2))
+                    (if z
+                        (progn (setq y (getitem x 1))
+                               (function (let ((q 1))
+                                           (return (function (return (getitem (getitem y z)
+                                                                              (getitem q w)))
+                                                             "h" nil (w))))
+                                         "g" nil (a)))
+                        (return (tagbody a (f a 1 2 3) (go a)))))
+                  "f" nil (x y)))
+'''
+
+def translate_source(source):
+    #read in the compiler package, as other tests can reset the packages
+    #through which the special forms are otherwise seen
+    with package_context(compiler_pkg):
+        [(form, locs)] = list(iter_forms(source, record_forms=True))
+    return translate_top_level_form(form, form_locations=locs)
+
+def function_free_bindings(f):
+    #free bindings of a function as found before BindingAnalyzer
+    free_bindings, cell_bindings = find_non_local_bindings(f.body)
+    for bu in I.iter_bindings(f):
+        if bind.get_binding_use_type(bu) == bind.BND_CELL:
+            cell_bindings.add(bu.binding)
+    return free_bindings - cell_bindings
+
+class TestBindings(unittest.TestCase):
+
+    def setUp(self):
+        self.ir = translate_source(source)
+        self.functions = [node for node in iter_nodes(self.ir, True)
+                          if isinstance(node, I.function)]
+
+    def testfunctionbindings(self):
+        self.failUnlessEqual(len(self.functions), 3)
+        with state.top(tag_labels=None):
+            top_bindings = analyze_bindings(self.ir)
+            self.failUnless(self.ir.function_bindings is top_bindings)
+            self.failIf(top_bindings.free_bindings)
+            all_cell_bindings = set()
+            for f in self.functions:
+                fb = f.function_bindings
+                self.failUnlessEqual(fb.free_bindings, function_free_bindings(f))
+                self.failUnlessEqual(fb.free_bindings, get_function_free_bindings(f))
+                #cells are only those bound by each function
+                self.failIf(fb.cell_bindings & all_cell_bindings)
+                all_cell_bindings |= fb.cell_bindings
+                nested_cell_bindings = set()
+                for node in iter_nodes(f.body, True):
+                    if isinstance(node, I.function):
+                        nested_cell_bindings |= node.function_bindings.cell_bindings
+                self.failUnlessEqual(fb.cell_bindings | nested_cell_bindings,
+                                     find_non_local_bindings(f)[1])
+            self.failUnless(all_cell_bindings)
+            self.failUnlessEqual(all_cell_bindings, find_non_local_bindings(self.ir)[1])
+
+    def testnonlocalbindings(self):
+        f = self.functions[0]
+        free_bindings, cell_bindings = find_non_local_bindings(f)
+        #free bindings of the nested functions are cells of the enclosing functions
+        self.failUnless(free_bindings)
+        self.failUnless(free_bindings <= cell_bindings)
+        self.failIf(analyze_bindings(f, for_codegen=False).free_bindings)
+
+
+yielding_progn, make_yielding_progn = createnode('yielding_progn', bases=[I.progn])
+
+@defmethod(generate_operations, [yielding_progn], combination=around)
+def meth(callnext, p):
+    yield (B.NOP, None)
+    yield callnext(p)
+    yield [[genops(expr) for expr in p.exprs], [(B.POP_TOP, None)]]
+
+def emitted_operations(ir):
+    emitter = OperationEmitter()
+    with state.top(emitter=emitter, tag_labels=None):
+        emitter.emit_node(ir)
+    return emitter.ops
+
+class TestEmission(unittest.TestCase):
+
+    def make_exprs(self):
+        exprs = [I.make_constant(1), I.make_nop(), I.make_constant(2)]
+        for expr in exprs[:-1]:
+            expr.result_ignored = True
+        return exprs
+
+    def testyielding(self):
+        def emit_path():
+            emit(B.NOP)
+            emit_node(I.make_progn(self.make_exprs()))
+            for expr in self.make_exprs():
+                emit_node(expr)
+            emit(B.POP_TOP)
+        emitter = OperationEmitter()
+        with state.top(emitter=emitter, tag_labels=None):
+            emit_path()
+        ops = emitted_operations(make_yielding_progn(self.make_exprs()))
+        self.failUnless(ops)
+        self.failUnlessEqual(ops, emitter.ops)
+        self.failUnlessEqual(ops, [(B.NOP, None), (B.LOAD_CONST, 2),
+                                   (B.LOAD_CONST, 2), (B.POP_TOP, None)])
+
+    def testnestedfunction(self):
+        ir = translate_source('''
+        (function (let ((z 1))
+                    (return (function (return (getitem y z)) "g" nil (y))))
+                  "f" nil (x))
+        ''')
+        with state.top(tag_labels=None):
+            ops = compile_operations(construct_compilation_ir(ir))
+            #the emitter of each code object is popped once it is compiled
+            self.failIf(hasattr(state, 'emitter'))
+        self.failUnlessEqual([op for op,arg in ops],
+                             [B.SetLineno, B.LOAD_CONST, B.MAKE_FUNCTION, B.RETURN_VALUE])
+        f_code = ops[1][1]
+        [g_code] = [c for c in f_code.co_consts if isinstance(c, type(f_code))]
+        f_ops = [op for op,arg in B.Code.from_code(f_code).code]
+        g_ops = [op for op,arg in B.Code.from_code(g_code).code]
+        #operations of each function are emitted only into its own code
+        self.failUnless(B.MAKE_CLOSURE in f_ops)
+        self.failIf(B.BINARY_SUBSCR in f_ops)
+        self.failUnless(B.BINARY_SUBSCR in g_ops)
+        self.failIf(B.MAKE_CLOSURE in g_ops)
+        g = new.function(f_code, {})(None)
+        self.failUnlessEqual(g([4, 5]), 5)
+
+
+__name__ == '__main__' and unittest.main()
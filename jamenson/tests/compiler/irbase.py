@@ -0,0 +1,158 @@
+
+import unittest
+
+from jamenson.runtime.copy import make_copy
+from jamenson.runtime.ports import BreakNonExisting
+from jamenson.compiler.irbase import createnode, replace_child, iter_children, iter_bindings
+from jamenson.compiler.bind import Binding, BindingUse
+
+backends = 'ports', 'compact'
+
+def make_classes(backend):
+    leaf = createnode('leaf', attrs=['value'], backend=backend)
+    pair = createnode('pair', children=['left', 'right'], bindings=['var'],
+                      attrs=['value'], backend=backend)
+    seq = createnode('seq', childlists=['items'], bindinglists=['vars'],
+                     attrs=['value'], backend=backend)
+    return dict(leaf=leaf[1], pair=pair[1], seq=seq[1])
+
+def use(name):
+    return BindingUse(Binding(name))
+
+def build(backend):
+    '''the same ir for either backend, along with its nodes by value
+    '''
+    make = make_classes(backend)
+    root = make['seq']('root',
+                       [use('r')],
+                       [make['pair']('pair', use('p'),
+                                     make['leaf']('a'), make['leaf']('b')),
+                        make['leaf']('c'),
+                        make['seq']('inner', [use('i1'), use('i2')],
+                                    [make['leaf']('d'), make['leaf']('e')])])
+    nodes = {}
+    def collect(node):
+        nodes[node.value] = node
+        for child in iter_children(node):
+            collect(child)
+    collect(root)
+    return make, root, nodes
+
+def describe(node, parent=None):
+    '''structure of node, checking that it is consistently linked
+    '''
+    assert node.continuation is parent, (node.value, node.continuation, parent)
+    bindings = []
+    for bu in iter_bindings(node):
+        assert bu.user is node, (node.value, bu)
+        bindings.append(bu.binding.symbol)
+    return (node.value, bindings,
+            [describe(child, node) for child in iter_children(node)])
+
+class TestBackends(unittest.TestCase):
+
+    def check(self, operation):
+        '''apply operation to the ir of each backend, which must have the
+           same results and raise the same exceptions
+        '''
+        results = []
+        for backend in backends:
+            make, root, nodes = build(backend)
+            extra = error = None
+            try:
+                extra = operation(make, root, nodes)
+            except Exception, e:
+                error = e.__class__
+            results.append((describe(root), error,
+                            extra and describe(extra, extra.continuation)))
+        self.failUnlessEqual(results[0], results[1])
+        return results[0]
+
+    def testbuild(self):
+        self.failUnlessEqual(self.check(lambda make, root, nodes: None)[0],
+                             ('root', ['r'],
+                              [('pair', ['p'], [('a', [], []), ('b', [], [])]),
+                               ('c', [], []),
+                               ('inner', ['i1', 'i2'], [('d', [], []), ('e', [], [])])]))
+
+    def testreplacechild(self):
+        def replace(make, root, nodes):
+            new = make['leaf']('new')
+            replace_child(nodes['a'], new)
+            assert nodes['a'].continuation is None
+            replace_child(nodes['c'], make['leaf']('new2'))
+            replace_child(nodes['e'], make['leaf']('new3'))
+            replace_child(new, nodes['a'])
+        desc = self.check(replace)[0]
+        self.failUnlessEqual(desc[2][0][2][0], ('a', [], []))
+        self.failUnlessEqual(desc[2][1], ('new2', [], []))
+
+    def testreplacedetached(self):
+        def replace(make, root, nodes):
+            replace_child(make['leaf']('x'), make['leaf']('y'))
+        self.failUnlessEqual(self.check(replace)[1], BreakNonExisting)
+
+    def testdelete(self):
+        def delete(make, root, nodes):
+            del root.items[1]
+            assert nodes['c'].continuation is None
+            del nodes['inner'].items[::]
+            del nodes['inner'].vars[0]
+            del nodes['pair'].left
+            assert nodes['a'].continuation is None
+        desc = self.check(delete)[0]
+        self.failUnlessEqual(desc, ('root', ['r'],
+                                    [('pair', ['p'], [('b', [], [])]),
+                                     ('inner', ['i2'], [])]))
+
+    def testmove(self):
+        def move(make, root, nodes):
+            nodes['inner'].items.append(nodes['c'])
+            nodes['pair'].right = nodes['d']
+            root.items.append(nodes['b'])
+            nodes['pair'].left = nodes['e']
+        desc = self.check(move)[0]
+        self.failUnlessEqual([d[0] for d in desc[2]], ['pair', 'inner', 'b'])
+        self.failUnlessEqual(desc[2][0][2], [('e', [], []), ('d', [], [])])
+        self.failUnlessEqual(desc[2][1][2], [('c', [], [])])
+
+    def testsetlist(self):
+        def setlist(make, root, nodes):
+            nodes['inner'].items = [nodes['e'], make['leaf']('f'), nodes['d']]
+            root.vars = [use('r2'), use('r3')]
+        desc = self.check(setlist)[0]
+        self.failUnlessEqual(desc[2][2], ('inner', ['i1', 'i2'],
+                                          [('e', [], []), ('f', [], []), ('d', [], [])]))
+        self.failUnlessEqual(desc[1], ['r2', 'r3'])
+
+    def testbindingreuse(self):
+        def reuse(make, root, nodes):
+            nodes['pair'].var = nodes['inner'].vars[0]
+        self.failUnlessEqual(self.check(reuse)[1], RuntimeError)
+        def reuse(make, root, nodes):
+            nodes['pair'].var = iter(root.vars).next()
+        self.failUnlessEqual(self.check(reuse)[1], RuntimeError)
+        #appending to a list of bindings moves a binding, as with children
+        def move(make, root, nodes):
+            nodes['inner'].vars.append(nodes['pair'].var)
+        desc = self.check(move)[0]
+        self.failUnlessEqual(desc[2][0][1], [])
+        self.failUnlessEqual(desc[2][2][1], ['i1', 'i2', 'p'])
+        def rebind(make, root, nodes):
+            bu = nodes['pair'].var
+            del nodes['pair'].var
+            nodes['inner'].vars.append(bu)
+        self.failUnlessEqual(self.check(rebind)[0][2][2][1], ['i1', 'i2', 'p'])
+
+    def testcopy(self):
+        def copy(make, root, nodes):
+            cp = make_copy(root)
+            for a,b in zip(iter_bindings(cp), iter_bindings(root)):
+                assert a is not b and a.binding is not b.binding
+            return make['pair']('holder', None, cp, None)
+        desc, error, copied = self.check(copy)
+        self.failUnlessEqual(error, None)
+        self.failUnlessEqual(copied[2][0], desc)
+
+
+__name__ == '__main__' and unittest.main()
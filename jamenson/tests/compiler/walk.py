@@ -0,0 +1,160 @@
+
+from __future__ import with_statement
+
+import sys
+import unittest
+
+from jamenson.runtime.symbol import package_context
+from jamenson.runtime.read import iter_forms
+from jamenson.compiler import ir as I
+from jamenson.compiler.pkg import compiler_pkg
+from jamenson.compiler.translate import translate_top_level_form
+from jamenson.compiler.walk import IRWalker, StackWalker, SKIP_CHILDREN, iter_nodes, walk_fused
+
+source = '''
+(setq f (function (let ((z (getattrq x foo)))
+                    (if z
+                        (progn (setq y (getitem x 1))
+                               (function (return (getitem y z))))
+                        (return (tagbody a (f a 1 2 3) (go a)))))
+                  "f" nil (x y)))
+'''
+
+def translate_source(source):
+    #read in the compiler package, as other tests can reset the packages
+    #through which the special forms are otherwise seen
+    with package_context(compiler_pkg):
+        [(form, locs)] = list(iter_forms(source, record_forms=True))
+    return translate_top_level_form(form, form_locations=locs)
+
+class RecordingWalker(IRWalker):
+
+    def __init__(self, descend_into_functions=False, skip=None):
+        IRWalker.__init__(self)
+        self.descend_into_functions = descend_into_functions
+        self.skip = skip
+        self.entered = []
+        self.left = []
+
+    def visit_node(self, node):
+        self.entered.append(node)
+        if self.skip is None or not isinstance(node, self.skip):
+            self.visit_children(node)
+            self.left.append(node)
+
+class RecordingStackWalker(StackWalker):
+
+    def __init__(self, descend_into_functions=False, skip=None):
+        StackWalker.__init__(self)
+        self.descend_into_functions = descend_into_functions
+        self.skip = skip
+        self.entered = []
+        self.left = []
+
+    def enter_node(self, node):
+        self.entered.append(node)
+        if self.skip is not None and isinstance(node, self.skip):
+            return SKIP_CHILDREN
+
+    def leave_node(self, node):
+        self.left.append(node)
+
+class TestWalk(unittest.TestCase):
+
+    def setUp(self):
+        self.ir = translate_source(source)
+
+    def walk_both(self, **kwds):
+        walker = RecordingWalker(**kwds)
+        walker.visit(self.ir)
+        stack_walker = RecordingStackWalker(**kwds)
+        self.failUnless(stack_walker.walk(self.ir) is self.ir)
+        return walker, stack_walker
+
+    def testorder(self):
+        for descend_into_functions in (False, True):
+            walker, stack_walker = self.walk_both(descend_into_functions=descend_into_functions)
+            self.failUnless(len(walker.entered) > 1)
+            self.failUnlessEqual(stack_walker.entered, walker.entered)
+            self.failUnlessEqual(list(iter_nodes(self.ir, descend_into_functions)),
+                                 walker.entered)
+        functions = [node for node in walker.entered if isinstance(node, I.function)]
+        self.failUnlessEqual(len(functions), 2)
+        walker, stack_walker = self.walk_both(descend_into_functions=False)
+        for function in functions:
+            self.failIf(function in stack_walker.entered)
+
+    def testskipchildren(self):
+        for skip in (I.progn, I.tagbody, I.function):
+            walker, stack_walker = self.walk_both(descend_into_functions=True, skip=skip)
+            self.failUnlessEqual(stack_walker.entered, walker.entered)
+            skipped = [node for node in walker.entered if isinstance(node, skip)]
+            self.failUnless(skipped)
+            for node in skipped:
+                for child in I.iter_children(node):
+                    self.failIf(child in stack_walker.entered)
+
+    def testleave(self):
+        for skip in (None, I.progn):
+            walker, stack_walker = self.walk_both(descend_into_functions=True, skip=skip)
+            self.failUnlessEqual(stack_walker.left, walker.left)
+            self.failUnless(stack_walker.left[-1] is self.ir)
+            if skip is not None:
+                for node in stack_walker.entered:
+                    if isinstance(node, skip):
+                        self.failIf(node in stack_walker.left)
+
+    def testfused(self):
+        settings = [dict(descend_into_functions=False),
+                    dict(descend_into_functions=True),
+                    dict(descend_into_functions=True, skip=I.progn),
+                    dict(descend_into_functions=True, skip=I.tagbody)]
+        fused = [RecordingStackWalker(**kwds) for kwds in settings]
+        self.failUnless(walk_fused(self.ir, fused) is self.ir)
+        for kwds,walker in zip(settings, fused):
+            alone = RecordingStackWalker(**kwds)
+            alone.walk(self.ir)
+            self.failUnlessEqual(walker.entered, alone.entered)
+            self.failUnlessEqual(walker.left, alone.left)
+        self.failIfEqual(fused[0].entered, fused[1].entered)
+        self.failIfEqual(fused[1].entered, fused[2].entered)
+
+    def testfusedwithoutleave(self):
+        class Counter(StackWalker):
+            descend_into_functions = True
+            def __init__(self):
+                StackWalker.__init__(self)
+                self.count = 0
+            def enter_node(self, node):
+                self.count += 1
+        counter = Counter()
+        recorder = RecordingStackWalker(skip=I.function)
+        walk_fused(self.ir, [counter, recorder])
+        self.failUnlessEqual(counter.count, len(list(iter_nodes(self.ir, True))))
+        alone = RecordingStackWalker(skip=I.function)
+        alone.walk(self.ir)
+        self.failUnlessEqual(recorder.entered, alone.entered)
+        self.failUnlessEqual(recorder.left, alone.left)
+
+    def testdeepnesting(self):
+        depth = 2 * sys.getrecursionlimit()
+        ir = node = I.make_constant(1)
+        for i in xrange(depth):
+            ir = I.make_progn([ir])
+        self.failUnlessRaises(RuntimeError, RecordingWalker().visit, ir)
+        stack_walker = RecordingStackWalker()
+        stack_walker.walk(ir)
+        self.failUnlessEqual(len(stack_walker.entered), depth + 1)
+        self.failUnless(stack_walker.entered[-1] is node)
+        self.failUnless(stack_walker.left[0] is node)
+        self.failUnless(stack_walker.left[-1] is ir)
+        self.failUnlessEqual(len(list(iter_nodes(ir))), depth + 1)
+        fused = [RecordingStackWalker(), RecordingStackWalker(skip=I.constant)]
+        walk_fused(ir, fused)
+        for walker in fused:
+            self.failUnlessEqual(walker.entered, stack_walker.entered)
+        self.failUnlessEqual(fused[0].left, stack_walker.left)
+        self.failUnlessEqual(fused[1].left, stack_walker.left[1:])
+
+
+__name__ == '__main__' and unittest.main()
@@ -0,0 +1,80 @@
+
+from __future__ import with_statement
+
+import shutil
+import tempfile
+import unittest
+
+from jamenson.runtime.filepath import DirPath
+from jamenson.core.build import (BuildError, find_requires, scan_modules, build_order,
+                                 calculate_hashes, find_stale, get_source_path,
+                                 get_compiled_path)
+
+class TestBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = DirPath(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, path, source):
+        with open(path, 'w') as fp:
+            fp.write(source)
+
+    def write_modules(self, sources):
+        for name,source in sources.iteritems():
+            self.write(get_source_path(name, self.directory), source)
+
+    def testfindrequires(self):
+        self.failUnlessEqual(find_requires("(b:require 'a 'b.c)\n(b:require 'a 'd/e)"),
+                             ['a', 'b.c', 'd.e'])
+        self.failUnlessEqual(find_requires("( b:require\n  'a )"), ['a'])
+        self.failUnlessEqual(find_requires("; (b:require 'a)\n(f 'b)"), [])
+        self.failUnlessEqual(find_requires("(b:require a)"), [])
+
+    def testbuildorder(self):
+        graph = {'a': ['b', 'c'], 'b': ['c'], 'c': [], 'd': ['a']}
+        order = build_order(graph)
+        self.failUnlessEqual(sorted(order), sorted(graph))
+        for name,deps in graph.iteritems():
+            for dep in deps:
+                self.failUnless(order.index(dep) < order.index(name))
+
+    def testbuildordercycle(self):
+        self.failUnlessRaises(BuildError, build_order, {'a': ['b'], 'b': ['c'], 'c': ['a']})
+        self.failUnlessRaises(BuildError, build_order, {'a': ['a']})
+
+    def testscanmodules(self):
+        self.write_modules({'a': "(b:require 'b 'sys)",
+                            'b': "(b:require 'b)",
+                            'c': ""})
+        self.failUnlessEqual(scan_modules(['a'], self.directory), {'a': ['b'], 'b': []})
+        self.failUnlessRaises(BuildError, scan_modules, ['x'], self.directory)
+
+    def testhashes(self):
+        self.write_modules({'a': "(b:require 'b)", 'b': "1", 'c': "2"})
+        graph = scan_modules(['a', 'c'], self.directory)
+        hashes = calculate_hashes(graph, self.directory)
+        self.failUnlessEqual(calculate_hashes(graph, self.directory), hashes)
+        self.write_modules({'b': "3"})
+        changed = calculate_hashes(graph, self.directory)
+        self.failIfEqual(changed['b'], hashes['b'])
+        #changes propagate to the modules requiring the changed module
+        self.failIfEqual(changed['a'], hashes['a'])
+        self.failUnlessEqual(changed['c'], hashes['c'])
+
+    def testfindstale(self):
+        self.write_modules({'a': "(b:require 'b)", 'b': "1"})
+        graph = scan_modules(['a'], self.directory)
+        hashes = calculate_hashes(graph, self.directory)
+        self.failUnlessEqual(find_stale(graph, hashes, {}, self.directory), set(['a', 'b']))
+        self.failUnlessEqual(find_stale(graph, hashes, hashes, self.directory), set(['a', 'b']))
+        for name in graph:
+            self.write(get_compiled_path(name, self.directory), '')
+        self.failUnlessEqual(find_stale(graph, hashes, hashes, self.directory), set())
+        self.failUnlessEqual(find_stale(graph, hashes, dict(hashes, b='x'), self.directory),
+                             set(['b']))
+
+
+__name__ == '__main__' and unittest.main()
@@ -2,7 +2,9 @@
 import unittest
 
 from jamenson.runtime.atypes import *
-from jamenson.runtime.atypes import (_AnyType, _NotAnyType, Invert, JoinBase, OneOf, AllOf)
+from jamenson.runtime.atypes import (_AnyType, _NotAnyType, Invert, JoinBase, OneOf, AllOf,
+                                     Seq, TypeBase, Predicate, compile_type)
+from jamenson.runtime.multimethod import defmethod
 
 
 class TestAtypes(unittest.TestCase):
@@ -137,6 +139,86 @@ class TestAtypes(unittest.TestCase):
         testn(intersection(IsType(1), EqType(1L)), EqType(1L))
         test(intersection(IsType(1), IsType(2)), notanytype)
         test(intersection(EqType(1), EqType(2)), notanytype)
+        test(intersection([1,2,3], EqType(2)), [2])
+        test(intersection((int,str,float), (int,float), (float,long,int)), (float,int))
+        test(intersection(int, str), notanytype)
+
+    def testoptimizelarge(self):
+        classes = [type('C%d' % i, (object,), {}) for i in xrange(200)]
+        pred = lambda x: x is None
+        inners = []
+        for i,cls in enumerate(classes):
+            inners.extend([cls, EqType(i), Predicate(pred)])
+        tp = as_optimized_type(tuple(inners))
+        self.failUnless(isinstance(tp, OneOf))
+        self.failUnlessEqual(list(tp.inners),
+                             [IsInstanceType(*classes), MemberType(range(200)), Predicate(pred)])
+        #memoized for equal types
+        self.failUnless(optimize_type(as_type(tuple(inners))) is tp)
+
+    def testintern(self):
+        def test(a, b):
+            self.failUnless(a is b, '%r is not %r' % (a, b))
+        test(as_type(int), IsInstanceType(int))
+        test(IsInstanceType(int, str), IsInstanceType(str, int))
+        test(as_type((int, 1, [2, 3])), as_type((int, 1, [3, 2])))
+        test(as_optimized_type((int, long)), as_optimized_type((long, int)))
+        test(Invert(as_type(int)), Invert(as_type(int)))
+        self.failIf(as_type((int, str)) is as_type((str, int)))
+        #values equal through == but of different types
+        self.failUnless(EqType(1).op is 1)
+        self.failUnless(EqType(True).op is True)
+        self.failIf(EqType(1.0) is EqType(1))
+        self.failUnless(MemberType([1, 2]) is MemberType([2, 1]))
+        self.failIf(MemberType([1.0]) is MemberType([True]))
+        self.failUnless(iter(MemberType([True]).elements).next() is True)
+        #nor are they memoized as the same when optimized
+        self.failUnless(optimize_type(EqType(1)).op is 1)
+        self.failUnless(optimize_type(EqType(True)).op is True)
+        for element in (1, True, 1.0):
+            self.failUnless(optimize_type(MemberType([element])).op is element)
+            tp = optimize_type(MemberType([element, 'a']))
+            self.failUnless(type(element) in set(map(type, tp.elements)))
+        class Unhashable(object):
+            __hash__ = None
+            def __call__(self, op):
+                return True
+        tp = Predicate(Unhashable())
+        self.failUnless(typep(1, tp))
+
+    def testcompiletype(self):
+        tp = as_optimized_type(union(int, lambda x: x == 'a', [None, 1.5]))
+        pred = compile_type(tp)
+        self.failUnless(compile_type(tp) is pred)
+        for op,expect in [(1, True), ('a', True), (None, True), (1.5, True),
+                          ('b', False), (2.5, False)]:
+            self.failUnlessEqual(pred(op), expect)
+            self.failUnlessEqual(typep(op, tp), expect)
+            self.failUnlessEqual(typep.call_methods(op, tp), expect)
+        inv = Invert(as_type(int))
+        self.failUnlessEqual(typep(1, inv), False)
+        self.failUnlessEqual(typep.call_methods('a', inv), True)
+        seq = Seq(int)
+        self.failUnless(typep([1, 2], seq))
+        self.failIf(typep([1, 'a'], seq))
+        self.failIf(typep(1, seq))
+
+    def testcompiletypeextension(self):
+        class Even(TypeBase):
+            pass
+        even = Even()
+        tp = union(str, even)
+        @defmethod(typep, [object, Even], ns=locals())
+        def meth(op, tp):
+            return op % 2 == 0
+        self.failUnless(typep(2, tp))
+        self.failIf(typep(3, tp))
+        self.failUnless(typep('a', tp))
+        #new methods are seen by compiled predicates
+        @defmethod(typep, [object, Even], ns=locals())
+        def meth(op, tp):
+            return op % 2 == 1
+        self.failUnless(typep(3, tp))
 
 
 
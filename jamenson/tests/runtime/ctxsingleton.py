@@ -2,6 +2,7 @@
 from __future__ import with_statement
 
 import unittest
+from threading import Thread
 
 from jamenson.runtime.ctxsingleton import CtxSingleton
 
@@ -90,5 +91,65 @@ class TestCtxSingleton(unittest.TestCase):
         with state(a=0):
             rec(100)
 
+    def testresume(self):
+        state = self.state
+        eq = self.assertEqual
+        st = state.top(a=1)
+        eq(state.depth, 1)
+        for i in xrange(3):
+            with st._cxs_resume():
+                eq(state.depth, 2)
+                eq(state.a, 1+i)
+                state.a += 1
+            eq(state.depth, 1)
+            eq(state.a, 5)
+        eq(st.a, 4)
+
+    def testforwarding(self):
+        state = self.state
+        other = TestState()
+        eq = self.assertEqual
+        #first read forwards through the class, later reads see each top
+        for i in xrange(2):
+            eq(state.a, 5)
+            with state(a=i):
+                eq(state.a, i)
+                state.a += 1
+                eq(state.top.a, i+1)
+            eq(state.a, 5)
+            eq(other.a, 5)
+        state.d = 'd'
+        eq(state.d, 'd')
+        self.failIf(hasattr(other, 'd'))
+        with state:
+            eq(state.depth, 2)
+            self.failIf(hasattr(state, 'd'))
+            self.failUnless(state._cxs_get_child(state.bottom) is state.top)
+        eq(state.depth, 1)
+        eq(state.d, 'd')
+
+    def testthreads(self):
+        state = self.state
+        eq = self.assertEqual
+        state.b = 20
+        seen = []
+        def run():
+            #starts from a copy of the root state
+            seen.append((state.depth, state.a, state.b))
+            with state(a=1):
+                state.c = 'thread'
+                seen.append((state.depth, state.a, state.c))
+            state.b = 30
+            seen.append((state.depth, state.b))
+        with state.top(a=100, c='main'):
+            thread = Thread(target=run)
+            thread.start()
+            thread.join()
+            eq(state.depth, 2)
+            eq(state.a, 100)
+            eq(state.c, 'main')
+        eq(seen, [(1, 5, 20), (2, 1, 'thread'), (1, 30)])
+        eq(state.b, 20)
+
 
 __name__ == '__main__' and unittest.main()
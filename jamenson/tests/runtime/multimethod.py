@@ -6,7 +6,12 @@ from jamenson.runtime.multimethod import (MultiMethodError, only, before, after,
                                           InconsistenCallSignature, InvalidMethodArguments,
                                           NoSuchMethod, MultiMethod, InvalidCallArguments,
                                           MethodSignature, TypeSignature, Method,
-                                          defmethod, current_method)
+                                          defmethod, current_method,
+                                          start_dispatch_profiling, stop_dispatch_profiling,
+                                          report_dispatch_profile,
+                                          collect_dispatch_snapshot,
+                                          save_dispatch_snapshot, load_dispatch_snapshot)
+from jamenson.runtime.tempfile import temporary_file
 from jamenson.runtime.atypes import *
 
 
@@ -382,6 +387,267 @@ class TestMultiMethod(unittest.TestCase):
                              [-1,-2,-3,2,5,-1.5,2.3])
         self.failUnlessRaises(NoSuchMethod, mm, [1,2,3.2,"st"])
 
+    def testcompileddispatch(self):
+        mm = MultiMethod('compiled')
+        @defmethod(mm, 'int,int')
+        def meth(a, b):
+            return 'int'
+        self.failUnlessEqual(mm.dispatch, None)
+        self.failUnlessEqual(mm(1, 2), 'int')
+        self.failIfEqual(mm.dispatch, None)
+        self.failUnlessEqual(mm(3, 4), 'int')
+        self.failUnlessRaises(NoSuchMethod, mm, 1, 2.0)
+        self.failUnlessRaises(InvalidMethodArguments, mm, 1)
+        self.failUnlessRaises(InvalidMethodArguments, mm, 1, 2, 3)
+        @defmethod(mm, 'int,float')
+        def meth(a, b):
+            return 'float'
+        self.failUnlessEqual(mm.dispatch, None)
+        self.failUnlessEqual(mm(1, 2.0), 'float')
+
+    def testsingledispatch(self):
+        mm = MultiMethod('single')
+        @defmethod(mm, 'int')
+        def meth(op):
+            return 'int'
+        @defmethod(mm, 'object')
+        def meth(op):
+            return 'object'
+        class subint(int):
+            pass
+        self.failUnlessEqual(mm(1), 'int')
+        self.failUnlessEqual(mm(subint(1)), 'int')
+        self.failUnlessEqual(mm(1.0), 'object')
+        self.failUnlessEqual(set(mm.callcache), set([int, subint, float]))
+        @defmethod(mm, 'subint', ns=locals())
+        def meth(op):
+            return 'subint'
+        int_meth = mm.callcache[int]
+        self.failUnlessEqual(mm(subint(1)), 'subint')
+        self.failUnlessEqual(mm(1), 'int')
+        #only cached calls the new method applies to are dropped
+        self.failUnless(mm.callcache[int] is int_meth)
+        self.failUnlessEqual(mm.cache_info()['misses'], 4)
+
+    def testcachepolicy(self):
+        mm = MultiMethod('bounded', cache_size=4)
+        @defmethod(mm, 'object')
+        def meth(op):
+            return 'object'
+        classes = [type('c%d' % i, (object,), {}) for i in xrange(10)]
+        instances = [cls() for cls in classes]
+        for op in instances[:4]:
+            mm(op)
+        mm(instances[0])
+        mm(instances[4])
+        info = mm.cache_info()
+        self.failUnlessEqual(info['hits'], 1)
+        self.failUnlessEqual(info['misses'], 5)
+        self.failUnlessEqual(info['evictions'], 1)
+        self.failUnlessEqual(set(mm.callcache), set([classes[0]] + classes[2:5]))
+        for op in instances:
+            mm(op)
+        self.failUnless(len(mm.callcache) <= 4)
+        mm.set_cache_policy(stats=True)
+        self.failUnlessEqual(mm.cache_info()['maxsize'], None)
+        mm(1)
+        mm(1)
+        mm(1)
+        mm(1.5)
+        self.failUnlessEqual(mm.cache_info()['hits'], 2)
+        self.failUnlessEqual(mm.cache_info()['misses'], 2)
+        mm.set_cache_policy(cache=False)
+        self.failUnlessEqual(mm.cache_info(), None)
+        self.failUnlessEqual(mm(1), 'object')
+
+    def testflatcombination(self):
+        mm = MultiMethod('flat')
+        acc = []
+        @defmethod(mm, 'object,object')
+        def meth(a, b):
+            acc.append('only')
+            return a + b
+        @defmethod(mm, 'int,object', combination=before)
+        def meth(a, b):
+            acc.append('before object')
+        @defmethod(mm, 'int,int', combination=before)
+        def meth(a, b):
+            acc.append('before int')
+        @defmethod(mm, 'int,object', combination=after)
+        def meth(a, b):
+            acc.append('after object')
+        @defmethod(mm, 'int,int', combination=after)
+        def meth(a, b):
+            acc.append('after int')
+        self.failUnlessEqual(mm(1, 2), 3)
+        self.failUnlessEqual(acc, ['before int', 'before object', 'only',
+                                   'after object', 'after int'])
+        func = mm.callcache[(int, int)]
+        self.failUnlessEqual(func.func_name, 'flat')
+        self.failUnless(func.func_code.co_filename.startswith('<combination'))
+        self.failUnlessEqual(func.func_code.co_argcount, 2)
+        @defmethod(mm, 'int,int', combination=around)
+        def meth(callnext, a, b):
+            return -callnext(a, b)
+        del acc[:]
+        self.failUnlessEqual(mm(1, 2), -3)
+        self.failUnlessEqual(len(acc), 5)
+
+    def testprofiledispatch(self):
+        from StringIO import StringIO
+        mm = MultiMethod('profiled')
+        @defmethod(mm, 'int')
+        def meth(op):
+            self.failUnlessEqual(current_method(), mm)
+            return op and mm(op-1) + 1
+        self.failUnlessEqual(mm(1), 1)
+        self.failIfEqual(mm.dispatch, None)
+        profiler = start_dispatch_profiling()
+        try:
+            self.failUnlessEqual(mm.dispatch, None)
+            self.failUnlessEqual(mm(3), 3)
+            self.failUnlessEqual(mm(2), 2)
+            self.failUnlessEqual(mm.dispatch, None)
+        finally:
+            self.failUnless(stop_dispatch_profiling() is profiler)
+        stats = profiler.stats[mm]
+        self.failUnlessEqual(stats.calls, 7)
+        self.failUnlessEqual(stats.hits + stats.misses, 7)
+        self.failUnlessEqual(stats.active, 0)
+        self.failUnlessEqual(sum(calls for calls,tm in stats.methods.itervalues()), 7)
+        self.failUnlessEqual(mm(4), 4)
+        self.failUnlessEqual(profiler.stats[mm].calls, 7)
+        fp = StringIO()
+        report_dispatch_profile(fp)
+        self.failUnless('profiled' in fp.getvalue())
+
+    def testinheritinvalidation(self):
+        parent = MultiMethod('parent')
+        @defmethod(parent, 'int')
+        def meth(op):
+            return 'parent int'
+        child = MultiMethod('child', inherit_from=[parent])
+        @defmethod(child, 'float')
+        def meth(op):
+            return 'child float'
+        self.failUnlessEqual(child(1), 'parent int')
+        self.failUnlessEqual(child(1.0), 'child float')
+        self.failUnlessRaises(NoSuchMethod, child, 'a')
+        @defmethod(parent, 'str')
+        def meth(op):
+            return 'parent str'
+        self.failUnlessEqual(child('a'), 'parent str')
+        self.failUnlessEqual(child(1), 'parent int')
+        self.failUnlessEqual(child.cache_info()['misses'], 4)
+
+    def testcompileddispatchunhashable(self):
+        for compiled in True, False:
+            mm = MultiMethod()
+            mm.compiled_dispatch = compiled
+            @defmethod(mm, 'lambda x: len(x) == 1')
+            def meth(x):
+                return "single"
+            @defmethod(mm, 'anytype')
+            def meth(x):
+                return "other"
+            self.failUnlessEqual(mm((1,)), "single")
+            self.failUnlessEqual(mm([1]), "single")
+            self.failUnlessEqual(mm([1,2]), "other")
+            self.failUnlessEqual(mm((1,2)), "other")
+            self.failUnlessEqual(mm.dispatch is not None, compiled)
+
+    def testdispatchsnapshot(self):
+        def make(extra=False):
+            single = MultiMethod('snapshot_single')
+            @defmethod(single, 'int')
+            def meth(op):
+                return 'int'
+            @defmethod(single, 'object')
+            def meth(op):
+                return 'object'
+            if extra:
+                @defmethod(single, 'bool')
+                def meth(op):
+                    return 'bool'
+            double = MultiMethod('snapshot_double')
+            @defmethod(double, 'int,object,c=object')
+            def meth(a, b, c=None):
+                return 'int'
+            @defmethod(double, 'object,object,c=object')
+            def meth(a, b, c=None):
+                return 'object'
+            @defmethod(double, 'object,str,c=object', combination=before)
+            def meth(a, b, c=None):
+                pass
+            return single, double
+        def calls(single, double):
+            return [single(1), single(True), single('a'),
+                    double(1, 'a'), double('a', 1), double(1, 2, c=3)]
+        single, double = make()
+        expected = calls(single, double)
+        with temporary_file() as path:
+            self.failUnlessEqual(load_dispatch_snapshot(path), 0)
+            self.failUnlessEqual(save_dispatch_snapshot(path, [single, double]), 6)
+            single, double = make()
+            self.failUnlessEqual(load_dispatch_snapshot(path, [single, double]), 6)
+            self.failUnlessEqual(calls(single, double), expected)
+            self.failUnlessEqual(single.cache_info()['misses'], 0)
+            self.failUnlessEqual(double.cache_info()['misses'], 0)
+            #changed method set isn't restored
+            single, double = make(extra=True)
+            self.failUnlessEqual(load_dispatch_snapshot(path, [single, double]), 3)
+            self.failUnlessEqual(single(True), 'bool')
+
+    def testdispatchsnapshotkeys(self):
+        from jamenson.runtime.symbol import make_symbol
+        sym = make_symbol('snapshot_sym')
+        def make():
+            mm = MultiMethod('snapshot_keys')
+            @defmethod(mm, [MemberType([1, sym])])
+            def meth(op):
+                return 'member'
+            @defmethod(mm, 'object')
+            def meth(op):
+                return 'object'
+            return mm
+        mm = make()
+        self.failUnlessEqual([mm(1), mm(sym), mm(2)], ['member', 'member', 'object'])
+        with temporary_file() as path:
+            #keys of objects other than classes and literals aren't saved
+            self.failUnlessEqual(save_dispatch_snapshot(path, [mm]), 2)
+            mm = make()
+            self.failUnlessEqual(load_dispatch_snapshot(path, [mm]), 2)
+            self.failUnlessEqual([mm(1), mm(sym), mm(2)], ['member', 'member', 'object'])
+            self.failUnlessEqual(mm.cache_info()['misses'], 1)
+
+    def testdispatchsnapshotmerge(self):
+        def make():
+            mm = MultiMethod('snapshot_merge')
+            @defmethod(mm, 'int')
+            def meth(op):
+                return 'int'
+            @defmethod(mm, 'object')
+            def meth(op):
+                return 'object'
+            return mm
+        mm = make()
+        mm(1)
+        mm('a')
+        other = collect_dispatch_snapshot([mm])
+        mm = make()
+        mm(1)
+        mm(1.5)
+        with temporary_file() as path:
+            self.failUnlessEqual(save_dispatch_snapshot(path, [mm], merge=[other]), 3)
+            mm = make()
+            self.failUnlessEqual(load_dispatch_snapshot(path, [mm]), 3)
+            #only multimethods named in the snapshot are considered
+            unnamed = MultiMethod('snapshot_unnamed')
+            @defmethod(unnamed, 'object')
+            def meth(op):
+                return 'object'
+            self.failUnlessEqual(load_dispatch_snapshot(path, [unnamed]), 0)
+
 
 
 
@@ -4,6 +4,7 @@ from __future__ import with_statement
 import cPickle as pickle
 import unittest
 
+from jamenson.runtime.multimethod import defmethod
 from jamenson.runtime.ports import *
 
 class TestSymbol(unittest.TestCase):
@@ -98,5 +99,43 @@ class TestSymbol(unittest.TestCase):
         self.failUnlessRaises(DanglingPort, get_cell, pl)
         self.failUnlessEqual(get_cells(pl), [])
 
+    def testmethods(self):
+        a = Port(1)
+        pl = PortList(2)
+        a.connect(pl)
+        self.failUnlessEqual(a.get_cell(), 2)
+        self.failUnlessEqual(pl.get_cells(), [1])
+        self.failUnlessEqual(pl.count_connections(), 1)
+        b = Port(3)
+        b.connect(pl)
+        self.failUnlessEqual(pl.get_cells(), [1, 3])
+        a.disconnect(pl)
+        self.failUnlessEqual(pl.get_cells(), [3])
+        self.failUnlessRaises(DanglingPort, a.get_cell)
+        pl.disconnect_all()
+        self.failUnlessEqual(b.count_connections(), 0)
+
+    def testremoveorder(self):
+        seq = range(50)
+        singles = map(Port, seq)
+        pl = PortList(None)
+        for p in singles:
+            p.connect(pl)
+        for p in singles[::3]:
+            disconnect(p, pl)
+        self.failUnlessEqual(get_cells(pl), [i for i in seq if i % 3])
+        self.failUnlessRaises(BreakNonExisting, disconnect, singles[0], pl)
+        self.failUnlessEqual([p.cell for p in pickle.loads(pickle.dumps(pl.ports, 2))],
+                             get_cells(pl))
+
+    def testsubclassfallback(self):
+        class CountedPort(Port):
+            pass
+        @defmethod(count_connections, [CountedPort])
+        def meth(p):
+            return -1
+        self.failUnlessEqual(CountedPort(1).count_connections(), -1)
+        self.failUnlessEqual(Port(2).count_connections(), 0)
+
 
 __name__ == '__main__' and unittest.main()
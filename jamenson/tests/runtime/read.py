@@ -1,8 +1,11 @@
 
 from __future__ import with_statement
 
+import os
 import unittest
 import tempfile
+from threading import Thread
+from StringIO import StringIO
 from decimal import Decimal
 
 from jamenson.runtime import state
@@ -27,7 +30,9 @@ from jamenson.runtime.symbol import (make_symbol, symbolp, boundp,
                                      resolve_full_symbol_print_form)
 from jamenson.runtime.builtins import get_builtin_symbol, bltn_pkg
 from jamenson.runtime.symbol import reset_packages
-from jamenson.runtime.read import readone, readstate
+from jamenson.runtime.read import (readone, readstate, read, pull_char,
+                                   Stream, BufferedStream, FormLocations, iter_forms,
+                                   register_reader_aux, default_read_table)
 from jamenson.runtime.cons import Cons, clist, nil
 from jamenson.runtime.as_string import as_string
 from jamenson.runtime.delete import delete, delete_obj
@@ -287,4 +292,222 @@ class TestRead(unittest.TestCase):
         def test(a,b):
             self.failUnlessEqual(readone(a), readone(b))
 
+    def read_locations(self, stream):
+        eof = object()
+        acc = []
+        while True:
+            with readstate.top(stream=stream, record_forms=True):
+                form = read(eofp=eof)
+                if form is eof:
+                    return acc
+                acc.append((as_string(form),
+                            sorted(readstate.form_locations.values()),
+                            stream.lineno, stream.colno))
+
+    source = '''
+;; comment
+(a b
+  ;; inner comment
+  (c 0x1f -12.5e3 "str\\"ing") ; trailing
+  '(d . e))
+
+   (f.g .h ..i) 42d
+'''
+
+    def testbufferedstream(self):
+        expected = self.read_locations(Stream(self.source))
+        self.failUnlessEqual(len(expected), 3)
+        for block_size in [1,2,3,7,1<<16]:
+            stream = BufferedStream(self.source)
+            stream.read_a_block = iter([self.source[i:i+block_size]
+                                        for i in xrange(0, len(self.source), block_size)]).next
+            self.failUnlessEqual(self.read_locations(stream), expected)
+
+    def testtokenizer(self):
+        source = self.source + '''
+        (a . (b . c)) (1 2 . 3) (0b101 -0o17 1.5e2 1d "\\x41\\t" \\;sym #:g) (. .) ()
+        '''
+        hash_table = {':': lambda : make_symbol(pull_char() + pull_char())}
+        with readstate(tokenize=False, hash_table=hash_table):
+            expected = self.read_locations(Stream(source))
+        self.failUnlessEqual(len(expected), 8)
+        for block_size in [1,3,1<<16]:
+            stream = BufferedStream(source)
+            stream.read_a_block = iter([source[i:i+block_size]
+                                        for i in xrange(0, len(source), block_size)]).next
+            with readstate(tokenize=True, hash_table=hash_table):
+                self.failUnlessEqual(self.read_locations(stream), expected)
+
+    def testtokenizerreadermacro(self):
+        bq = get_builtin_symbol('backquote')
+        def read_backquote():
+            pull_char()
+            return clist(bq, read())
+        table = readstate.table.copy()
+        table['`'] = read_backquote
+        with readstate(table=table):
+            self.failUnlessEqual(readone("`(a `b '(c `3))"),
+                                 clist(bq, clist(readone('a'),
+                                                 clist(bq, readone('b')),
+                                                 clist(get_sys_symbol('quote'),
+                                                       clist(readone('c'), clist(bq, 3))))))
+        self.failUnlessEqual(readone('`a').print_form, '`a')
+
+    def testtokenizererrors(self):
+        for source in ['(a b', '(a . b c)', '"abc', '(1 (2 "3']:
+            with readstate(tokenize=False):
+                expected = self.read_error(source)
+            self.failUnlessEqual(self.read_error(source), expected)
+
+    def read_error(self, source):
+        try:
+            readone(source)
+        except SyntaxError,e:
+            return e.args
+        self.fail('no SyntaxError for %r' % (source,))
+
+    def testbufferedpush(self):
+        stream = BufferedStream('ab\ncd')
+        chars = [stream.pull_char() for i in xrange(4)]
+        self.failUnlessEqual(chars, list('ab\nc'))
+        self.failUnlessEqual((stream.lineno, stream.colno), (2, 2))
+        for c in chars[:1:-1]:
+            stream.push_char(c)
+        self.failUnlessEqual((stream.lineno, stream.colno), (1, 3))
+        self.failUnlessEqual(stream.get_last_loc(), (1, 2))
+        stream.push_char('x')
+        self.failUnlessEqual(stream.collect('[^\n]'), 'x')
+        self.failUnlessEqual(stream.collect('\s'), '\n')
+        self.failUnlessEqual(stream.collect('[a-z]'), 'cd')
+        self.failUnlessEqual(stream.pull_char(), '')
+
+    def testbufferedsyntaxerror(self):
+        try:
+            readone('\n  (a b\n   "c')
+        except SyntaxError,e:
+            self.failUnlessEqual(e.lineno, 3)
+            self.failUnlessEqual(e.offset, 6)
+        else:
+            self.fail('no SyntaxError')
+
+    def testiterforms(self):
+        forms = iter_forms(self.source)
+        self.failUnlessEqual(as_string(forms.next()),
+                             '(a b (c 31 -12500.0 "str\\"ing") \'(d . e))')
+        self.failUnlessEqual(map(as_string, forms), ['(f.g .h ..i)', '42'])
+        self.failUnlessEqual(readstate.depth, 1)
+        expected = [(form, locs) for form,locs,lineno,colno in
+                    self.read_locations(Stream(self.source))]
+        self.failUnlessEqual([(as_string(form), sorted(locs.values()))
+                              for form,locs in iter_forms(StringIO(self.source),
+                                                          record_forms=True)],
+                             expected)
+
+    def testformlocations(self):
+        with readstate(stream='(a (b a) "c")', record_forms=True):
+            form = read()
+            locs = readstate.form_locations
+        a = form.car
+        b_a = form.cdr.car
+        self.failUnlessEqual(locs.get(form), (1, 1))
+        self.failUnlessEqual(locs.get(b_a), (1, 3))
+        self.failUnlessEqual(locs.get(form.cdr.cdr.car), (1, 9))
+        self.failUnless(a in locs)
+        self.failUnlessEqual(locs.get(a, 'missing'), None)
+        self.failIf(object() in locs)
+        self.failUnlessEqual(locs.get(object(), 'missing'), 'missing')
+        self.failUnlessEqual(len(locs), len(locs.values()))
+        empty = FormLocations()
+        self.failIf(empty)
+        self.failUnlessEqual(empty.get(form), None)
+
+    def testreadonerepeated(self):
+        t = tempfile.TemporaryFile()
+        t.write('1 (a b)\n3')
+        t.seek(0)
+        self.failUnlessEqual(readone(t), 1)
+        self.failUnlessEqual(as_string(readone(t)), '(a b)')
+        self.failUnlessEqual(readone(t), 3)
+        self.failUnlessEqual(readone(t, eofp=None), None)
+        fp = StringIO('1 2 3')
+        self.failUnlessEqual([readone(fp) for i in xrange(3)], [1, 2, 3])
+
+    def testiterformslazy(self):
+        class Source(object):
+            def __init__(self):
+                self.n = 0
+            def read(self, size):
+                self.n += 1
+                return '(a %d)\n' % self.n
+        source = Source()
+        forms = iter_forms(source)
+        for i in xrange(1, 100):
+            self.failUnlessEqual(as_string(forms.next()), '(a %d)' % i)
+        self.failUnless(source.n < 110)
+
+    def testiterformsreadermacro(self):
+        table = default_read_table.copy()
+        def read_bang():
+            pull_char()
+            return 'bang'
+        try:
+            forms = iter_forms('a !', inherit_state=False)
+            self.failUnlessEqual(as_string(forms.next()), 'a')
+            register_reader_aux('!', read_bang)
+            self.failUnlessEqual(list(forms), ['bang'])
+        finally:
+            default_read_table.clear()
+            default_read_table.update(table)
+
+    def testparallelread(self):
+        #reader and runtime state are per thread, such that files can be
+        #read concurrently, each within its own package
+        n_threads = 8
+        n_files = 16
+        packages = [get_package('parallelread%d' % i) for i in xrange(n_files)]
+        paths = []
+        for i in xrange(n_files):
+            fd, path = tempfile.mkstemp(suffix='.jms')
+            paths.append(path)
+            os.write(fd, ''.join('(defun f%d-%d (x &optional (y %d.5))\n'
+                                 '  "doc" (+ x y \'stuff :key)) ; comment\n'
+                                 % (i, j, j) for j in xrange(20)))
+            os.close(fd)
+        def read_file(i):
+            with state(package=packages[i]):
+                fp = open(paths[i])
+                try:
+                    acc = []
+                    for form,locs in iter_forms(fp, filename=paths[i], record_forms=True):
+                        acc.append((as_string(form), locs.get(form)))
+                    acc.append(get_symbol_package(readone('stuff')) is packages[i])
+                    return acc
+                finally:
+                    fp.close()
+        try:
+            expected = map(read_file, xrange(n_files))
+            results = {}
+            def run(k):
+                try:
+                    for repeat in xrange(2):
+                        for i in xrange(k, n_files, n_threads):
+                            results[repeat, i] = read_file(i)
+                except Exception, e:
+                    results[k] = e
+                    raise
+            threads = [Thread(target=run, args=(k,)) for k in xrange(n_threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            for path in paths:
+                os.remove(path)
+        self.failUnlessEqual(len(results), 2 * n_files)
+        for (repeat, i),result in results.iteritems():
+            self.failUnlessEqual(result, expected[i])
+            self.failUnless(result[-1])
+        self.failUnlessEqual(readstate.depth, 1)
+
+
 __name__ == '__main__' and unittest.main()
@@ -15,7 +15,8 @@ from jamenson.runtime.symbol import (make_symbol, symbolp, boundp,
                                      import_symbol, unimport_symbol,
                                      shadowing_import,
                                      intern_symbol, unintern_symbol,
-                                     export_symbol, unexport_symbol,
+                                     export_symbol, unexport_symbol, export_lazy_symbol,
+                                     iter_exported_symbols,
                                      use_package, unuse_package,
                                      resolve_print_form,
                                      get_sys_symbol, syssymbolp,
@@ -193,6 +194,129 @@ class TestSymbol(unittest.TestCase):
             self.failUnlessEqual(sym, res(sym, self.testpkg, ':'))
             self.failUnlessEqual(sym, res(sym, self.testpkg, '::'))
 
+    def testresolutioncache(self):
+        sym = make_symbol('stuff')
+        res = self.doresolve
+        with state(package=self.testpkg):
+            intern_symbol(sym)
+            export_symbol(sym)
+        use_package(self.testpkg, self.testpkg2)
+        use_package(self.testpkg2, self.testpkg3)
+        with state(package=self.testpkg3):
+            self.failUnlessEqual(sym, res(sym))
+            self.failUnlessEqual(sym, res(sym))
+            self.failUnlessEqual(sym, res(sym, self.testpkg2, ':'))
+            unexport_symbol(sym, self.testpkg)
+            self.failUnlessRaises(InternalSymbolError, res, sym, self.testpkg2, ':')
+            local = res(sym)
+            self.failIfEqual(sym, local)
+            self.failUnlessEqual(get_symbol_package(local), self.testpkg3)
+            unintern_symbol(local)
+            export_symbol(sym, self.testpkg)
+            self.failUnlessEqual(sym, res(sym))
+            self.failUnlessEqual(sym, res(sym, self.testpkg2, ':'))
+            unuse_package(self.testpkg2)
+            self.failIfEqual(sym, res(sym))
+
+    def testshadowresolutioncache(self):
+        sym = make_symbol('stuff')
+        res = self.doresolve
+        with state(package=self.testpkg):
+            intern_symbol(sym)
+            export_symbol(sym)
+        use_package(self.testpkg2, self.testpkg3)
+        with state(package=self.testpkg2):
+            shadowing_import(sym)
+            self.failUnlessEqual(sym, res(sym))
+        with state(package=self.testpkg3):
+            self.failUnlessEqual(sym, res(sym, self.testpkg2, '::'))
+        unexport_symbol(sym, self.testpkg)
+        with state(package=self.testpkg2):
+            local = res(sym)
+            self.failIfEqual(sym, local)
+            self.failUnlessEqual(get_symbol_package(local), self.testpkg2)
+        do_deletion(self.testpkg2)
+        self.failIf(self.testpkg.shadowed_by.get(sym.print_form))
+        self.testpkg2 = get_package('testpkg2')
+
+    def testhomepackage(self):
+        sym = make_symbol('stuff')
+        self.failUnlessEqual(get_symbol_package(sym), None)
+        self.failIf(internedp(sym))
+        self.failUnlessEqual(get_symbol_package('stuff'), None)
+        intern_symbol(sym, self.testpkg)
+        self.failUnlessEqual(get_symbol_package(sym), self.testpkg)
+        unintern_symbol(sym)
+        self.failUnlessEqual(get_symbol_package(sym), None)
+        pkg = get_package('testhomepkg')
+        intern_symbol(sym, pkg)
+        self.failUnlessEqual(get_symbol_package(sym), pkg)
+        do_deletion(pkg)
+        self.failUnlessEqual(get_symbol_package(sym), None)
+        self.failIf(internedp(sym))
+
+    def testlazyexport(self):
+        pkg = get_package('testlazypkg')
+        calls = []
+        def get_value():
+            calls.append(None)
+            return 'value'
+        export_lazy_symbol('lazy', get_value, pkg)
+        export_lazy_symbol('conflict', get_value, pkg)
+        self.failIf(pkg.imports)
+        use_package(pkg, self.testpkg)
+        sym = resolve_print_form('lazy', self.testpkg)
+        self.failUnlessEqual(get_symbol_package(sym), pkg)
+        self.failUnless(sym in pkg.exports)
+        self.failUnlessEqual(get_symbol_cell(sym), 'value')
+        self.failUnlessEqual(len(calls), 1)
+        self.failUnless(resolve_full_symbol_print_form('testlazypkg:lazy') is sym)
+        self.failUnlessEqual(len(calls), 1)
+        conflict = intern_symbol(make_symbol('conflict'), self.testpkg2)
+        self.failUnlessRaises(SymbolConflict, use_package, pkg, self.testpkg2)
+        unintern_symbol(conflict)
+        #already interned print forms are bound immediately
+        export_lazy_symbol('lazy', lambda : 'other', pkg)
+        self.failUnlessEqual(get_symbol_cell(sym), 'other')
+        unuse_package(pkg, self.testpkg)
+        do_deletion(pkg)
+
+    def testexportedsymbols(self):
+        pkg = get_package('testlazypkg')
+        export_lazy_symbol('lazy', lambda : 'value', pkg)
+        sym = intern_symbol(make_symbol('eager'), pkg)
+        export_symbol(sym, pkg)
+        syms = list(iter_exported_symbols(pkg))
+        self.failUnlessEqual(sorted(sym.print_form for sym in syms), ['eager', 'lazy'])
+        self.failIf(pkg.lazy_exports)
+        [lazy] = [sym for sym in syms if sym.print_form == 'lazy']
+        self.failUnlessEqual(get_symbol_cell(lazy), 'value')
+        do_deletion(pkg)
+
+    def testproxydir(self):
+        from jamenson.runtime.pkgproxy import PackageProxy
+        pkg = get_package('testlazypkg')
+        export_lazy_symbol('lazy', lambda : 'value', pkg)
+        sym = intern_symbol(make_symbol('eager'), pkg)
+        proxy = PackageProxy(pkg)
+        names = dir(proxy)
+        self.failUnless('eager' in names)
+        self.failUnless('lazy' in names)
+        self.failUnless('lazy' in pkg.lazy_exports)
+        self.failUnlessEqual(proxy.lazy, 'value')
+        self.failUnless('lazy' in dir(proxy))
+        do_deletion(pkg)
+
+    def testbuiltinexports(self):
+        import __builtin__
+        from jamenson.runtime.builtins import bltn_pkg
+        exports = dict((sym.print_form, sym) for sym in iter_exported_symbols(bltn_pkg))
+        self.failIf(bltn_pkg.lazy_exports)
+        for name in dir(__builtin__):
+            self.failUnless(name in exports, name)
+        for name in ['len', 'map', 'open']:
+            self.failUnless(get_symbol_cell(exports[name]) is getattr(__builtin__, name))
+
     def testkeyword(self):
         key = resolve_full_symbol_print_form(':symbol')
         self.failUnless(keywordp(key))
@@ -14,6 +14,16 @@ basepath = basepath()
 
 loader = unittest.TestLoader()
 
+def shim_jump_opcodes():
+    '''codegen targets the conditional jumps of python 2.6, which were replaced
+       in 2.7.  these are shimmed to import the compiler for tests that don't
+       assemble code
+    '''
+    import byteplay
+    for name in ('JUMP_IF_FALSE', 'JUMP_IF_TRUE'):
+        if not hasattr(byteplay, name):
+            setattr(byteplay, name, getattr(byteplay, 'POP_' + name))
+
 def load_file_tests(path):
     path = path.stripext()
     assert path.startswith(basepath)